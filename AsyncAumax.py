@@ -0,0 +1,363 @@
+import aiohttp
+import asyncio
+import datetime
+import logging
+from utils import AumaxCryptoContext, generateOperation, decodeJWT
+from consts import BASE_URL, API_KEY, CLIENT_SECRET, BASIC_AUTH_KEY, VERSION
+from exceptions import ConnectionError, SensibleOperationsDisabledError, ResponseError
+from codec import loads, dumps
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAumax():
+
+    def __init__(self, email: str, password: str, maxConnections: int = 20, baseUrl: str = BASE_URL):
+        """
+        Create an AsyncAumax object to interact with the Aumax API using asyncio (same methods as the Aumax class, but they must be awaited)
+
+        :param email: The email used to connect to your Aumax account
+        :type email: str
+        :param password: The password used to connect to your Aumax account
+        :type password: str
+        :param maxConnections: The maximum number of simultaneous connections to the Aumax API
+        :type maxConnections: int
+        :param baseUrl: The url of the Aumax API (it can be changed to use a local stand-in of the API, see AumaxServer.py)
+        :type baseUrl: str
+        """
+        self.__email = email
+        self.__password = password
+        self.__maxConnections = maxConnections
+        self.__baseUrl = baseUrl
+
+        # False by default, can be activated using enableSensibleOperations method
+        self.__sensibleOperationsEnabled = False
+        # False by default, True once you are connected using the connect method
+        self.__connected = False
+
+        self.__JwtData = {}  # This will be updated in the connect method (see decodeJWT)
+
+        # The aiohttp session needs a running event loop, so it is created in the connect method
+        self.__s = None
+
+        # The following will be initialized in the enableSensibleOperations method if needed
+
+        # See ReadMe to know how to get the following values
+        self.__deviceVendor = ""  # Example : "OnePlus"
+        self.__deviceModel = ""  # Example : "ONEPLUS A6013"
+        self.__deviceSerialNumber = ""  # Example : "38aa48613fd1536f"
+        # Key material derived from seedDevice and mCode, created in the enableSensibleOperations method
+        # (seedDevice and mCode themselves are not kept)
+        self.__crypto = None
+
+    async def __aenter__(self) -> "AsyncAumax":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def __initSession(self) -> None:
+        """
+        Create an aiohttp session and initialize it with basic headers needed for future requests
+        """
+        self.__s = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.__maxConnections),
+            headers={
+                'apikey': API_KEY,
+                'client_id': API_KEY,
+                'User-Agent': 'okhttp/3.12.1',
+            })
+
+    async def close(self) -> None:
+        """
+        Close the underlying aiohttp session (and all its connections)
+        """
+        if self.__s is not None:
+            await self.__s.close()
+            self.__s = None
+        self.__connected = False
+
+    def __setAuthenticationAndAuthorization(self, authentication: str, authorization: str) -> None:
+        """
+        Method to add some authentication headers that are needed for future requests
+
+        :param authentication: Authentication headers that is in the response of the connection request
+        :type authentication: str
+        :param authorization: Authorization headers that is in the response of the connection request
+        :type authorization: str
+        """
+        self.__s.headers.update({
+            'authentication': f"Bearer {authentication}",
+            'authorization': f"Bearer {authorization}",
+        })
+
+    async def __request(self, method: str, url: str, replayable: bool = True, **kwargs):
+        """
+        Send a request and return the decoded JSON body
+        If the token is rejected (401), the client connects again and the request is sent once more (if it is replayable)
+
+        :raises ResponseError: If the API answers with an error
+        """
+        if not self.__connected:
+            raise ConnectionError
+
+        async with self.__s.request(method, url, **kwargs) as r:
+            status = r.status
+            body = await r.read()
+        if status == 401 and replayable and await self.connect():
+            return await self.__request(method, url, replayable=False, **kwargs)
+        if not 200 <= status < 300:
+            raise ResponseError(status, body.decode('utf-8', errors='replace'))
+        return loads(body)
+
+    async def __get(self, url: str):
+        """
+        Send a GET request and return the decoded JSON body
+
+        :param url: The url to request
+        :type url: str
+        :return: The JSON body of the response
+        :rtype: dict or list
+        :raises ResponseError: If the API answers with an error
+        """
+        return await self.__request("GET", url)
+
+    async def __post(self, url: str, data: dict, replayable: bool = True):
+        """
+        Send a POST request with a JSON body and return the decoded JSON body
+
+        :param url: The url to request
+        :type url: str
+        :param data: The body of the request that will be serialized in JSON
+        :type data: dict
+        :param replayable: False if the request must not be sent twice (it uses a one time password)
+        :type replayable: bool
+        :return: The JSON body of the response
+        :rtype: dict or list
+        :raises ResponseError: If the API answers with an error
+        """
+        headers = {
+            'Content-Type': 'application/json',
+        }
+
+        return await self.__request("POST", url, replayable=replayable, headers=headers, data=dumps(data))
+
+    def __accessInfos(self) -> dict:
+        return {
+            "accessCode": self.__JwtData["accessCode"],
+            "efs": self.__JwtData["efs"],
+            # Yes oauthToken is the same as accessCode
+            "oauthToken": self.__JwtData["accessCode"],
+            "si": self.__JwtData["si"]
+        }
+
+    def __device(self) -> dict:
+        return {
+            "biometryActivation": "N",  # For now we do not treat biometry
+            "model": self.__deviceModel,
+            "serialNumber": self.__deviceSerialNumber,
+            "vendor": self.__deviceVendor
+        }
+
+    async def __generateSeed(self, length: int, amount: float) -> str:
+        """
+        Generate a Seed (a string) based on current time when creating a new virtual credit card
+
+        :param length: The duration of the virtual credit card in months
+        :type length: int
+        :param amount: The amount in Euros contained in the virtual credit card
+        :type amount: float
+        :return: The Seed needed to generate a TOTP (Time One Time Password)
+        :rtype: str
+        """
+        if not self.__connected:
+            raise ConnectionError
+        if not self.__sensibleOperationsEnabled:
+            raise SensibleOperationsDisabledError
+
+        data = {
+            "operationInfos": {
+                "accessInfos": self.__accessInfos(),
+                "device": self.__device(),
+                "digest": self.__crypto.generateDigest(length, amount),
+                "encodeOperation": generateOperation(length, amount),
+                "secuChannel": "OATH_S",
+            }
+        }
+
+        res = await self.__post(f"{self.__baseUrl}/nvsecurityapi/rest/enrollments/operation/generateSeed", data)
+        return res["seedOperation"]
+
+    async def connect(self) -> bool:
+        """
+        Method to connect to the Aumax API
+
+        :return: True if the connection was successful, False otherwise
+        :rtype: bool
+        """
+        if self.__s is None:
+            self.__initSession()
+
+        headers = {
+            'authorization': f"Basic {BASIC_AUTH_KEY}",
+        }
+
+        data = {
+            'username': self.__email,
+            'password': self.__password,
+            'grant_type': 'password',
+            'deviceVendor': self.__deviceVendor,
+            'client_id': CLIENT_SECRET,
+            'apikey': API_KEY,
+            'deviceSerialNumber': self.__deviceSerialNumber,
+            'deviceModel': self.__deviceModel,
+        }
+
+        async with self.__s.post(f"{self.__baseUrl}/oauth-validate-key-secret/token", headers=headers, data=data) as r:
+            if r.status != 200:
+                logger.warning("Connection refused by %s : %s %s", self.__baseUrl, r.status, await r.text())
+                return False
+
+            # No errors : we are connected
+            authentication = r.headers.get("Authentication")
+            authorization = r.headers.get("Authorization")
+
+        self.__setAuthenticationAndAuthorization(authentication, authorization)
+        self.__JwtData = decodeJWT(authentication)
+
+        self.__connected = True
+        return True
+
+    def enableSensibleOperations(self, deviceVendor: str, deviceModel: str, deviceSerialNumber: str, seedDevice: str, mCode: str) -> None:
+        """
+        Method to enable sensible operations (such as creating a new virtual credit card)
+        (See the ReadMe to know how to get the parameters, they are those of Aumax.enableSensibleOperations without the name and the id of the device, that the API does not use)
+
+        :param deviceVendor: The vendor of the device, example : "OnePlus"
+        :type deviceVendor: str
+        :param deviceModel: The model of the device, example : "ONEPLUS A6013"
+        :type deviceModel: str
+        :param deviceSerialNumber: The device serial number, example : "38aa48613fd1536f"
+        :type deviceSerialNumber: str
+        :param seedDevice: seedDevice is the code you receive by SMS when adding your phone as "the trusted phone" (the last one if you received severals)
+        :type seedDevice: str
+        :param mCode: mCode is the 6 digits code you set to protect sensible actions such as creating a virtual credit card
+        :type mCode: str
+        """
+        self.__sensibleOperationsEnabled = True
+
+        self.__deviceVendor = deviceVendor
+        self.__deviceModel = deviceModel
+        self.__deviceSerialNumber = deviceSerialNumber
+        self.__crypto = AumaxCryptoContext(seedDevice, mCode)
+
+    async def getUserInfo(self) -> dict:
+        return await self.__get(f"{self.__baseUrl}/user/{VERSION}person/me")
+
+    async def getCards(self) -> dict:
+        return await self.__get(f"{self.__baseUrl}/carte/{VERSION}cards/preview")
+
+    async def getMaxCard(self) -> dict:
+        return await self.__get(f"{self.__baseUrl}/carte/{VERSION}cards/max")
+
+    async def getAccouts(self) -> dict:
+        return await self.__get(f"{self.__baseUrl}/compte/{VERSION}accounts/preview")
+
+    async def getTransactions(self, accountId: str, count: int) -> dict:
+        return await self.__get(f"{self.__baseUrl}/compte/{VERSION}accounts/{accountId}/transactions?count={count}")
+
+    async def getVirtualCards(self) -> list:
+        return await self.__get(f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard")
+
+    async def getVirtualCardOperations(self, cardNum: str) -> list:
+        return await self.__get(f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard/{cardNum}/operation")
+
+    async def getAllVirtualCardOperations(self, cardNums: list = None, maxConcurrency: int = 10) -> dict:
+        """
+        Get the operations of several virtual credit cards concurrently (all the virtual cards of the account by default)
+
+        :param cardNums: The numbers of the virtual credit cards, if None the virtual cards are fetched using getVirtualCards
+        :type cardNums: list
+        :param maxConcurrency: The maximum number of requests sent at the same time
+        :type maxConcurrency: int
+        :return: A dictionnary associating each card number to the list of its operations, or to the exception raised if they could not be fetched
+            (a card that fails does not prevent getting the operations of the others)
+        :rtype: dict
+        """
+        if cardNums is None:
+            cardNums = [card["num"] for card in await self.getVirtualCards()]
+
+        semaphore = asyncio.Semaphore(maxConcurrency)
+
+        async def fetch(cardNum: str) -> list:
+            async with semaphore:
+                return await self.getVirtualCardOperations(cardNum)
+
+        operations = await asyncio.gather(*(fetch(cardNum) for cardNum in cardNums), return_exceptions=True)
+        return dict(zip(cardNums, operations))
+
+    async def getEnrollmentStatus(self) -> dict:
+        """
+        Check if device can be used for sensitive (deviceEnrolled) actions such as creating a new virtual card
+        Output example : {'enrolled': True, 'deviceEnrolled': True, 'biometryActivated': False}
+
+        :return: A dictionnary of booleans telling if the account is enrolled, if the device is enrolled and if biometry is enabled
+        :rtype: dict
+        """
+        if not self.__connected:
+            raise ConnectionError
+        if not self.__sensibleOperationsEnabled:
+            raise SensibleOperationsDisabledError
+
+        data = {
+            "device": {
+                "serialNumber": self.__deviceSerialNumber,
+                "model": self.__deviceModel,
+                "vendor": self.__deviceVendor,
+            }
+        }
+
+        return await self.__post(f"{self.__baseUrl}/nvsecurityapi/rest/enrollments/enrollmentStatus/getEnrollmentStatus", data)
+
+    async def getServerTimeForOTP(self) -> datetime.datetime:
+        """
+        Get the time of the server (using the "Date" header of the response)
+
+        :return: A datetime object giving the time of the server
+        :rtype: datetime.datetime
+        """
+        if not self.__connected:
+            raise ConnectionError
+
+        async with self.__s.get(f"{self.__baseUrl}/nvsecurityapi/rest/enrollments/time") as r:
+            httpTime = r.headers["Date"]
+        return datetime.datetime.strptime(httpTime, '%a, %d %b %Y %H:%M:%S GMT')
+
+    async def generateVirtualCard(self, length: int, amount: float) -> dict:
+        """
+        Generate a new virtual credit card (11 virtual credit cards per day maximum)
+        Output example : {'num': '5372040642164191000', 'dateCreation': '26/03/2021', 'duree': 0, 'dateEch': '09/21', 'mntSaisi': 14.3, 'mntRestant': 14.3, 'crypto': '812', 'devise': 'EUR'}
+
+        :param length: The duration of the virtual credit card in months
+        :type length: int
+        :param amount: The amount in Euros contained in the virtual credit card
+        :type amount: float
+        :return: A dictionnary containing the information of the card
+        :rtype: dict
+        """
+        if not self.__connected:
+            raise ConnectionError
+        if not self.__sensibleOperationsEnabled:
+            raise SensibleOperationsDisabledError
+
+        seedOperation = await self.__generateSeed(length, amount)
+        totp = self.__crypto.generateTOTP(seedOperation)
+
+        data = {
+            "accessInfos": self.__accessInfos(),
+            "device": self.__device(),
+            "totp": totp
+        }
+
+        # The TOTP can only be used once : the request is not sent again
+        return await self.__post(f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard", data, replayable=False)
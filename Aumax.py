@@ -1,15 +1,47 @@
 import requests
-import json
+import copy
 import datetime
-import base64
-from utils import generateDigest, generateOperation, generateTOTP, printResponse, addPaddingToBase64String
-from consts import BASE_URL, API_KEY, CLIENT_SECRET, BASIC_AUTH_KEY, VERSION
-from exceptions import ConnectionError, SensibleOperationsDisabledError
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils import AumaxCryptoContext, generateOperation, decodeJWT, extractItems, getItemDate
+from consts import BASE_URL, API_KEY, CLIENT_SECRET, BASIC_AUTH_KEY, VERSION, TOKEN_EXPIRY_MARGIN, REFRESH_RETRY_DELAY, REFRESH_RETRY_MAX_DELAY, MAX_VIRTUAL_CARDS_PER_DAY, DEFAULT_TIMEOUT, DEFAULT_TIMEOUTS, STREAM_CHUNK_SIZE
+from exceptions import ConnectionError, SensibleOperationsDisabledError, ClockCalibrationDisabledError, CircuitOpenError, SessionFileError, QuotaExceededError, ResponseError
+from cache import ResponseCache
+from clock import ServerClock
+from resilience import RetryPolicy, CircuitBreaker
+from models import Account, Transaction, VirtualCard, CardOperation
+from codec import loads, dumps, iterJsonArray
+from metrics import Metrics, RequestEvent, bodySize
+from transport import Transport, RequestsTransport
+from sessionfile import SessionKeys, readSessionFile, writeSessionFile, requireCryptography
+from singleflight import SingleFlight
+from quota import QuotaManager
+from cassette import RecordingTransport
+
+logger = logging.getLogger(__name__)
+
+
+class AuthState():
+    """
+    The authentication of an Aumax object : the headers of the requests, the data of the JWT and the expiry of the token
+    It is never modified, a new one replaces it at each connection (so a thread reading it never sees half of an update)
+    """
+    __slots__ = ("headers", "jwtData", "tokenExpiry", "generation")
+
+    def __init__(self, headers: dict, jwtData: dict, tokenExpiry: float, generation: int):
+        self.headers = headers
+        self.jwtData = jwtData
+        self.tokenExpiry = tokenExpiry  # Timestamp of the expiry of the token ("exp" of the JWT)
+        # Incremented at each connection, so concurrent callers that saw the same expired token only reconnect once
+        self.generation = generation
 
 
 class Aumax():
 
-    def __init__(self, email: str, password: str):
+    def __init__(self, email: str, password: str, session: requests.Session = None, useModels: bool = False, baseUrl: str = BASE_URL,
+                 transport: Transport = None):
         """
         Create an Aumax object to interact with the Aumax API
 
@@ -17,18 +49,53 @@ class Aumax():
         :type email: str
         :param password: The password used to connect to your Aumax account
         :type password: str
+        :param session: A requests session that can be shared between several Aumax objects (to share its connection pool), a new one is created if None
+        :type session: requests.Session
+        :param useModels: If True, accounts, transactions, virtual cards and their operations are returned as models (see models.py) instead of dictionnaries
+        :type useModels: bool
+        :param baseUrl: The url of the Aumax API (it can be changed to use a local stand-in of the API, see AumaxServer.py)
+        :type baseUrl: str
+        :param transport: The HTTP transport (see transport.py : RequestsTransport to tune the connection pool, HttpxTransport for HTTP/2), it can be shared between several Aumax objects, a RequestsTransport using the session is created if None
+        :type transport: Transport
         """
         self.__email = email
         self.__password = password
+        self.__useModels = useModels
+        self.__baseUrl = baseUrl
 
         # False by default, can be activated using enableSensibleOperations method
         self.__sensibleOperationsEnabled = False
         # False by default, True once you are connected using the connect method
         self.__connected = False
+        # False by default, can be activated using enableAutoConnect method
+        self.__autoConnect = False
 
-        self.__JwtData = {}  # This will be updated in __extractDataFromJWT method
+        # Headers, data of the JWT and expiry of the token, replaced at once by __setAuthenticationAndAuthorization (see AuthState)
+        self.__auth = None  # Initialized in __initSession method
+        # Connections (and restored sessions) are made while holding this lock, it is reentrant because __reconnect calls connect
+        self.__authLock = threading.RLock()
+        self.__singleFlight = None  # Disabled by default, can be enabled using enableRequestCoalescing method
+        self.__refreshTimer = None
+        self.__refreshMargin = None  # None while the background refresh is disabled, see enableAutoRefresh method
 
-        self.__initSession()
+        self.__cache = None  # Disabled by default, can be enabled using enableCache method
+        self.__clock = None  # Disabled by default, can be enabled using enableClockCalibration method
+        self.__clockGuard = 0
+
+        # Timeouts, retries and circuit breaker of the requests, see configureResilience method
+        self.__timeouts = DEFAULT_TIMEOUTS
+        self.__retryPolicy = RetryPolicy()
+        self.__circuitBreaker = CircuitBreaker()
+
+        self.__metrics = None  # Disabled by default, can be enabled using enableMetrics method
+        self.__quota = None  # Disabled by default, can be enabled using enableQuota method
+
+        # Session file updated at each connection, see resumeSession method
+        self.__sessionPath = None
+        self.__sessionPassphrase = None
+        self.__sessionKeys = SessionKeys()  # The keys of the session files, derived once
+
+        self.__initSession(session, transport)
 
         # The following will be initialized in the enableSensibleOperations method if needed
 
@@ -42,46 +109,454 @@ class Aumax():
         self.__seedDevice = ""  # Example : xfu3rbzqb47njp5y
         # mCode is the 6 digits code you set to protect sensible actions such as creating a virtual credit card
         self.__mCode = ""  # Example : 012345
+        # Key material derived from seedDevice and mCode, created in the enableSensibleOperations method
+        self.__crypto = None
 
-    def __initSession(self) -> None:
+    def __initSession(self, session: requests.Session = None, transport: Transport = None) -> None:
         """
-        Create a request session and initialize it with basic headers needed for future requests
+        Create the transport (if none is given) and initialize the basic headers needed for future requests
+        The headers are kept in this object and not in the transport, so the transport can be shared between several accounts
+
+        :param session: A requests session to use if no transport is given, a new one is created if None
+        :type session: requests.Session
+        :param transport: The transport to use, a RequestsTransport is created if None
+        :type transport: Transport
         """
-        self.__s = requests.Session()
-        self.__s.headers.update({
+        self.__transport = transport if transport is not None else RequestsTransport(session)
+        self.__auth = AuthState({
             'apikey': API_KEY,
             'client_id': API_KEY,
             'User-Agent': 'okhttp/3.12.1',
-        })
+        }, {}, None, 0)
+
+    def __request(self, endpoint: str, method: str, url: str, headers: dict = None, authenticated: bool = True, replayable: bool = True, **kwargs) -> requests.Response:
+        """
+        Send a request using the session, with the headers of this account
+        If the token is expired it is refreshed before sending the request, and if the request is rejected with a 401 the client reconnects once and sends it again
+
+        :param endpoint: The name of the endpoint, example : "virtualCards" (used to choose the timeout of the request)
+        :type endpoint: str
+        :param method: The HTTP method ("GET", "POST", ...)
+        :type method: str
+        :param url: The url to request
+        :type url: str
+        :param headers: Headers specific to this request, they are added to (or override) the headers of this account
+        :type headers: dict
+        :param authenticated: False for the connection request itself (the token is not checked)
+        :type authenticated: bool
+        :param replayable: False if the body of the request contains data of the token (it can not be sent again after reconnecting)
+        :type replayable: bool
+        :return: The response of the request
+        :rtype: requests.Response
+        """
+        if not authenticated or not self.__connected:
+            return self.__send(endpoint, method, url, headers, **kwargs)
+
+        auth = self.__auth
+        if auth.tokenExpiry is not None and time.time() >= auth.tokenExpiry - TOKEN_EXPIRY_MARGIN:
+            self.__reconnect(auth.generation)
+            auth = self.__auth
+        generation = auth.generation
+
+        r = self.__send(endpoint, method, url, headers, **kwargs)
+        if r.status_code == 401 and replayable:
+            # The rejection is read and closed before reconnecting : a streamed response keeps its connection (and its slot of an AumaxPool) until then
+            r.content
+            r.close()
+            if self.__reconnect(generation):
+                r = self.__send(endpoint, method, url, headers, **kwargs)
+        return r
+
+    def __send(self, endpoint: str, method: str, url: str, headers: dict = None, **kwargs) -> requests.Response:
+        """
+        Send a request with a timeout, retrying the idempotent requests (GET) that fail because of the network or of the server
+        The requests are not sent while the circuit breaker is open (too many failures in a row), and wait for the quota if it is enabled
+        """
+        if headers:
+            headers = {**self.__auth.headers, **headers}
+        else:
+            headers = self.__auth.headers
+        kwargs.setdefault("timeout", self.__timeouts.get(endpoint, DEFAULT_TIMEOUT))
+
+        breaker = self.__circuitBreaker
+        quota = self.__quota
+        retryPolicy = self.__retryPolicy
+        retries = retryPolicy.retries if method == "GET" else 0
+        attempt = 0
+        while True:
+            # The quota is taken first : if it raises, the breaker has not let this request test the API
+            if quota is not None:
+                quota.acquire(self.__email)
+            testing = False
+            if breaker is not None:
+                try:
+                    testing = breaker.allow()
+                except CircuitOpenError:
+                    if quota is not None:
+                        quota.refund(self.__email)
+                    raise
+            try:
+                if self.__metrics is None:
+                    r = self.__transport.request(method, url, headers=headers, **kwargs)
+                else:
+                    r = self.__instrumentedRequest(endpoint, method, url, headers, attempt, **kwargs)
+            except self.__transport.transientErrors:
+                if breaker is not None:
+                    breaker.recordFailure()
+                if attempt >= retries:
+                    raise
+            except BaseException:
+                # The request failed locally (it was not sent, or the API did not answer it) : it does not count as a failure of the API nor in the quota
+                if testing:
+                    breaker.release()
+                if quota is not None:
+                    quota.refund(self.__email)
+                raise
+            else:
+                if breaker is not None:
+                    if r.status_code >= 500:
+                        breaker.recordFailure()
+                    else:
+                        breaker.recordSuccess()
+                if attempt >= retries or r.status_code not in retryPolicy.statuses:
+                    return r
+                r.close()
+            time.sleep(retryPolicy.delay(attempt))
+            attempt += 1
+
+    def __instrumentedRequest(self, endpoint: str, method: str, url: str, headers: dict, attempt: int, **kwargs) -> requests.Response:
+        """
+        Send a request and record it in the metrics (see enableMetrics)
+        """
+        connections = self.__transport.connectionCount()
+        start = time.perf_counter()
+        try:
+            r = self.__transport.request(method, url, headers=headers, **kwargs)
+        except Exception as e:
+            self.__metrics.record(RequestEvent(endpoint, method, None, time.perf_counter() - start, bodySize(kwargs.get("data")), None,
+                                               attempt, None, type(e).__name__))
+            raise
+        latency = time.perf_counter() - start
+
+        after = self.__transport.connectionCount()
+        reused = after == connections if connections is not None and after is not None else None
+        if kwargs.get("stream"):
+            # The body is not read yet
+            length = r.headers.get("Content-Length")
+            responseBytes = int(length) if length is not None and length.isdigit() else None
+        else:
+            responseBytes = len(r.content)
+        self.__metrics.record(RequestEvent(endpoint, method, r.status_code, latency, bodySize(r.request.body), responseBytes,
+                                           attempt, reused, None))
+        return r
+
+    def enableMetrics(self, metrics: Metrics = None) -> Metrics:
+        """
+        Record each request sent to the API (endpoint, status code, latency, sizes, retries and connection reuse)
+        When the metrics are disabled (by default) the requests are not slowed down
+
+        :param metrics: The Metrics object receiving the requests (it can be shared between several Aumax objects), a new one with an InMemorySink is created if None
+        :type metrics: Metrics
+        :return: The Metrics object, use its snapshot method or its sinks to read the metrics
+        :rtype: Metrics
+        """
+        self.__metrics = metrics if metrics is not None else Metrics()
+        return self.__metrics
+
+    def disableMetrics(self) -> None:
+        self.__metrics = None
+
+    def getMetrics(self) -> Metrics:
+        """
+        :return: The Metrics object given to (or created by) enableMetrics, None if the metrics are disabled
+        :rtype: Metrics
+        """
+        return self.__metrics
+
+    def enableQuota(self, quota: QuotaManager = None) -> QuotaManager:
+        """
+        Check the quota of the account before sending each request and creating each virtual card :
+        the requests wait to stay under the rate allowed, and a QuotaExceededError is raised instead of requesting a card beyond the daily limit
+        The quota is kept in a SQLite database, so it is shared by all the processes of the host using the account
+
+        :param quota: The QuotaManager (it can be shared between several Aumax objects, each account has its own quota), one using defaultQuotaPath is created if None
+        :type quota: QuotaManager
+        :return: The QuotaManager, use its remaining method to know the remaining quota
+        :rtype: QuotaManager
+        """
+        self.__quota = quota if quota is not None else QuotaManager()
+        return self.__quota
+
+    def disableQuota(self) -> None:
+        self.__quota = None
+
+    def getQuota(self) -> QuotaManager:
+        """
+        :return: The QuotaManager given to (or created by) enableQuota, None if the quota is disabled
+        :rtype: QuotaManager
+        """
+        return self.__quota
+
+    def getRemainingQuota(self) -> dict:
+        """
+        :return: The requests that can be sent at once and the cards that can still be created today, example : {"requests": 7.5, "cards": 9} (None if the quota is disabled)
+        :rtype: dict
+        """
+        quota = self.__quota
+        return quota.remaining(self.__email) if quota is not None else None
+
+    def enableRecording(self, path: str) -> RecordingTransport:
+        """
+        Record the requests sent by this object and their responses (with their latencies) in a cassette, to replay them offline with ReplayTransport :
+        Aumax(email, password, transport=ReplayTransport(path))
+        The password, the email, the serial number of the device, the tokens, the one time passwords, the CVV and the expiry dates of the cards are not written in the cassette,
+        and the card numbers are replaced with pseudonyms (see RecordingTransport)
+
+        :param path: The path of the cassette (the requests are appended if it exists)
+        :type path: str
+        :return: The RecordingTransport now used by this object
+        :rtype: RecordingTransport
+        """
+        self.disableRecording()
+        self.__transport = RecordingTransport(self.__transport, path)
+        return self.__transport
+
+    def disableRecording(self) -> None:
+        """
+        Close the cassette and send the requests with the previous transport again
+        """
+        transport = self.__transport
+        if isinstance(transport, RecordingTransport):
+            transport.stop()
+            self.__transport = transport.transport
 
-    def __setAuthenticationAndAuthorization(self, authentication: str, authorization: str) -> None:
+    def configureResilience(self, timeouts: dict = None, retryPolicy: RetryPolicy = None, circuitBreaker: CircuitBreaker = None) -> None:
         """
-        Method to add some authentication headers that are needed for future requests
+        Configure the timeouts, the retries and the circuit breaker of the requests
+        Only the idempotent requests (GET) are retried : a request creating a virtual card is never sent twice
+
+        :param timeouts: The (connect, read) timeouts in seconds of each endpoint, example : {"transactions": (3.05, 60)}, see DEFAULT_TIMEOUTS in consts.py for the default values
+        :type timeouts: dict
+        :param retryPolicy: How the requests are retried, RetryPolicy(retries=0) disables the retries
+        :type retryPolicy: RetryPolicy
+        :param circuitBreaker: The circuit breaker (it can be shared between several Aumax objects)
+        :type circuitBreaker: CircuitBreaker
+        """
+        if timeouts is not None:
+            self.__timeouts = {**DEFAULT_TIMEOUTS, **timeouts}
+        if retryPolicy is not None:
+            self.__retryPolicy = retryPolicy
+        if circuitBreaker is not None:
+            self.__circuitBreaker = circuitBreaker
+
+    def __coalesce(self, key, function, *args):
+        """
+        Call function, sharing its result with the identical calls made at the same time if the coalescing is enabled (see enableRequestCoalescing)
+
+        :param key: The key identifying identical calls (the url of the request for example)
+        :param function: The function sending the request and decoding its response
+        :type function: function
+        :return: The result of the function (a copy for the threads that did not send the request, so no thread modifies the result of another one)
+        """
+        singleFlight = self.__singleFlight
+        if singleFlight is None:
+            return function(*args)
+        value, leader = singleFlight.do(key, lambda: function(*args))
+        return value if leader else copy.deepcopy(value)
+
+    def enableRequestCoalescing(self) -> None:
+        """
+        Thread-safe mode for an Aumax object shared between threads (the threads of a web server for example) :
+        identical read calls (getUserInfo, getCards, getMaxCard, getAccouts, getTransactions, getVirtualCards, getVirtualCardOperations, getEnrollmentStatus)
+        made at the same time share one request, and each thread receives its own copy of the result
 
-        :param authentication: Authentication headers that is in the response of the connection request
+        The other methods are thread-safe without it : the headers and the data of the token are replaced at once, connections are made one at a time,
+        and an expired token is refreshed once even if many threads see it at the same time
+        """
+        self.__singleFlight = SingleFlight()
+
+    def disableRequestCoalescing(self) -> None:
+        self.__singleFlight = None
+
+    @staticmethod
+    def __checkStatus(r: requests.Response) -> None:
+        """
+        Raise a ResponseError if the API answered with an error
+        """
+        if r.status_code != 200:
+            raise ResponseError(r.status_code, r.text)
+
+    def __decode(self, r: requests.Response, strict: bool = False):
+        if strict:
+            self.__checkStatus(r)
+        return loads(r.content)
+
+    def __get(self, endpoint: str, url: str, strict: bool = False):
+        """
+        Send a GET request and decode its response, the identical calls made at the same time share it (if the coalescing is enabled)
+        If strict is True, a ResponseError is raised if the API answers with an error (otherwise the error sent by the API is returned)
+        """
+        return self.__coalesce(("GET", url, strict), lambda: self.__decode(self.__request(endpoint, "GET", url), strict))
+
+    def __cachedGet(self, endpoint: str, url: str, strict: bool = False):
+        """
+        Send a GET request to a read-only endpoint, using the cache if it is enabled
+        An expired response is revalidated with the ETag / Last-Modified headers sent by the server (if any)
+        The identical calls made at the same time share one request (if the coalescing is enabled)
+
+        :param endpoint: The name of the endpoint (see DEFAULT_CACHE_TTLS in consts.py)
+        :type endpoint: str
+        :param url: The url to request
+        :type url: str
+        :param strict: If True, a ResponseError is raised if the API answers with an error (otherwise the error sent by the API is returned)
+        :type strict: bool
+        :return: The decoded JSON of the response
+        :rtype: dict or list
+        """
+        return self.__coalesce(("GET", url, strict), self.__cachedGetNow, endpoint, url, strict)
+
+    def __cachedGetNow(self, endpoint: str, url: str, strict: bool = False):
+        cache = self.__cache
+        if cache is None or not cache.isCached(endpoint):
+            return self.__decode(self.__request(endpoint, "GET", url), strict)
+
+        entry = cache.get(endpoint, url)
+        if cache.isFresh(entry):
+            return cache.getValue(entry)
+
+        generation = cache.generation(endpoint)
+        r = self.__request(endpoint, "GET", url, headers=cache.validationHeaders(entry))
+        if r.status_code == 304 and entry is not None:
+            cache.refresh(endpoint, url)
+            return cache.getValue(entry)
+
+        value = self.__decode(r, strict)
+        if r.status_code == 200:
+            cache.put(endpoint, url, value, r.headers, generation)
+        return value
+
+    def enableCache(self, ttls: dict = None, maxEntries: int = 128) -> None:
+        """
+        Enable the cache of the responses of the read-only endpoints (getUserInfo, getCards, getMaxCard, getAccouts and getVirtualCards)
+
+        :param ttls: The TTL in seconds of each endpoint, example : {"accounts": 30, "virtualCards": 0} (0 disables the cache of an endpoint), see DEFAULT_CACHE_TTLS in consts.py for the default values
+        :type ttls: dict
+        :param maxEntries: The maximum number of responses kept in the cache
+        :type maxEntries: int
+        """
+        self.__cache = ResponseCache(ttls, maxEntries)
+
+    def disableCache(self) -> None:
+        self.__cache = None
+
+    def clearCache(self) -> None:
+        if self.__cache is not None:
+            self.__cache.invalidate()
+
+    def __reconnect(self, generation: int) -> bool:
+        """
+        Connect again, unless another thread already did it since the given generation (then we just use its new token)
+
+        :param generation: The generation of the AuthState in which the caller saw the expired token
+        :type generation: int
+        :return: True if the client has a new token
+        :rtype: bool
+        """
+        with self.__authLock:
+            if self.__auth.generation != generation:
+                return True
+            return self.connect()
+
+    def __scheduleRefresh(self) -> None:
+        """
+        Start a timer that refreshes the token shortly before it expires (if the background refresh is enabled)
+        """
+        if self.__refreshTimer is not None:
+            self.__refreshTimer.cancel()
+            self.__refreshTimer = None
+        auth = self.__auth
+        if self.__refreshMargin is None or auth.tokenExpiry is None:
+            return
+
+        margin = self.__refreshMargin
+        issuedAt = auth.jwtData.get("iat")
+        if issuedAt is not None:
+            # Do not refresh a short-lived token in a loop
+            margin = min(margin, (auth.tokenExpiry - issuedAt) / 2)
+
+        self.__startRefreshTimer(max(auth.tokenExpiry - margin - time.time(), 0), auth.generation, 0)
+
+    def __startRefreshTimer(self, delay: float, generation: int, attempt: int) -> None:
+        self.__refreshTimer = threading.Timer(delay, self.__refresh, (generation, attempt))
+        self.__refreshTimer.daemon = True
+        self.__refreshTimer.start()
+
+    def __refresh(self, generation: int, attempt: int) -> None:
+        """
+        Refresh the token from the timer thread, and try again later (with an exponential backoff) if the connection fails
+        """
+        try:
+            if self.__reconnect(generation):
+                return
+        except Exception:
+            logger.warning("Unable to refresh the token of %s", self.__email, exc_info=True)
+        with self.__authLock:
+            # The refresh was disabled, or another thread connected meanwhile (and scheduled the next refresh)
+            if self.__refreshMargin is None or self.__auth.generation != generation:
+                return
+            delay = min(REFRESH_RETRY_DELAY * 2 ** attempt, REFRESH_RETRY_MAX_DELAY)
+            logger.warning("Refresh of the token of %s failed, next try in %s seconds", self.__email, delay)
+            self.__startRefreshTimer(delay, generation, attempt + 1)
+
+    def enableAutoRefresh(self, margin: float = 60) -> None:
+        """
+        Refresh the token in the background shortly before it expires (using the "exp" field of the JWT)
+        If the refresh fails (network or API down), it is tried again later with an increasing delay (see REFRESH_RETRY_DELAY in consts.py)
+
+        :param margin: The number of seconds before the expiry of the token at which it is refreshed
+        :type margin: float
+        """
+        with self.__authLock:
+            self.__refreshMargin = margin
+            self.__scheduleRefresh()
+
+    def disableAutoRefresh(self) -> None:
+        with self.__authLock:
+            self.__refreshMargin = None
+            self.__scheduleRefresh()
+
+    def getTokenExpiry(self) -> datetime.datetime:
+        """
+        :return: The expiry date of the token (None if not connected or if the token has no expiry)
+        :rtype: datetime.datetime
+        """
+        tokenExpiry = self.__auth.tokenExpiry
+        if tokenExpiry is None:
+            return None
+        return datetime.datetime.fromtimestamp(tokenExpiry)
+
+    def __setAuthenticationAndAuthorization(self, authentication: str, authorization: str, jwtData: dict = None) -> None:
+        """
+        Method to add some authentication headers that are needed for future requests, and extract the data contained in the JWT
+        The headers, the data of the JWT and the expiry of the token are replaced at once, so another thread never sees the headers of a token with the data of another one
+
+        :param authentication: Authentication headers that is in the response of the connection request (the JWT, base64 strings separated by a '.')
         :type authentication: str
         :param authorization: Authorization headers that is in the response of the connection request
         :type authorization: str
+        :param jwtData: The data of the JWT if it is already decoded (restored session)
+        :type jwtData: dict
         """
-        self.__s.headers.update({
+        if jwtData is None:
+            jwtData = decodeJWT(authentication)
+        auth = self.__auth
+        headers = {
+            **auth.headers,
             'authentication': f"Bearer {authentication}",
             'authorization': f"Bearer {authorization}",
-        })
-
-    def __extractDataFromJWT(self, jwt: str) -> None:
-        """
-        Extract data contained in the JWT in the response of the connection request
-
-        :param jwt: The JWT (base64 string separated by a '.')
-        :type jwt: str
-        """
-        self.__JwtData = {}
-        # Only the two first part of the JWT contains relevant data
-        for jsonBase64String in jwt.split('.')[:2]:
-            jsonBase64String = addPaddingToBase64String(jsonBase64String)
-            jsonStr = base64.b64decode(jsonBase64String).decode('utf-8')
-            jsonObj = json.loads(jsonStr)
-            self.__JwtData.update(jsonObj)
+        }
+        self.__auth = AuthState(headers, jwtData, jwtData.get("exp"), auth.generation + 1)
+        self.__connected = True
 
     def __generateSeed(self, length: int, amount: float) -> str:
         """
@@ -94,12 +569,12 @@ class Aumax():
         :return: The Seed needed to generate a TOTP (Time One Time Password)
         :rtype: str
         """
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
         if not self.__sensibleOperationsEnabled:
             raise SensibleOperationsDisabledError
 
         op = generateOperation(length, amount)
+        jwtData = self.__auth.jwtData
 
         headers = {
             'Content-Type': 'application/json',
@@ -108,11 +583,11 @@ class Aumax():
         data = {
             "operationInfos": {
                 "accessInfos": {
-                    "accessCode": self.__JwtData["accessCode"],
-                    "efs": self.__JwtData["efs"],
+                    "accessCode": jwtData["accessCode"],
+                    "efs": jwtData["efs"],
                     # Yes oauthToken is the same as accessCode
-                    "oauthToken": self.__JwtData["accessCode"],
-                    "si": self.__JwtData["si"]
+                    "oauthToken": jwtData["accessCode"],
+                    "si": jwtData["si"]
                 },
                 "device": {
                     "biometryActivation": "N",
@@ -120,7 +595,7 @@ class Aumax():
                     "serialNumber": self.__deviceSerialNumber,
                     "vendor": self.__deviceVendor
                 },
-                "digest": generateDigest(self.__seedDevice, self.__mCode, length, amount),
+                "digest": self.__crypto.generateDigest(length, amount),
                 "encodeOperation": op,
                 "secuChannel": "OATH_S",
                 # The signature with the private key seems to be useless ( nice, we don't need to extract the private key :) )
@@ -128,12 +603,11 @@ class Aumax():
             }
         }
 
-        data = json.dumps(data)
+        data = dumps(data)
 
-        r = self.__s.post(
-            f"{BASE_URL}/nvsecurityapi/rest/enrollments/operation/generateSeed", headers=headers, data=data)
+        r = self.__request("generateSeed", "POST", f"{self.__baseUrl}/nvsecurityapi/rest/enrollments/operation/generateSeed", headers=headers, data=data, replayable=False)
 
-        return r.json()["seedOperation"]
+        return loads(r.content)["seedOperation"]
 
     def connect(self) -> bool:
         """
@@ -142,41 +616,130 @@ class Aumax():
         :return: True if the connection was successful, False otherwise
         :rtype: bool
         """
+        # Only one connection at a time : the headers and the data of the JWT must come from the same token
+        with self.__authLock:
+            headers = {
+                'authorization': f"Basic {BASIC_AUTH_KEY}",
+            }
 
-        headers = {
-            'authorization': f"Basic {BASIC_AUTH_KEY}",
-        }
+            data = {
+                'username': self.__email,
+                'password': self.__password,
+                'grant_type': 'password',
+                'deviceVendor': self.__deviceVendor,
+                'client_id': CLIENT_SECRET,
+                'apikey': API_KEY,
+                'deviceSerialNumber': self.__deviceSerialNumber,
+                'deviceModel': self.__deviceModel,
+            }
 
-        data = {
-            'username': self.__email,
-            'password': self.__password,
-            'grant_type': 'password',
-            'deviceVendor': self.__deviceVendor,
-            'client_id': CLIENT_SECRET,
-            'apikey': API_KEY,
-            'deviceSerialNumber': self.__deviceSerialNumber,
-            'deviceModel': self.__deviceModel,
-        }
+            r = self.__request("token", "POST", f"{self.__baseUrl}/oauth-validate-key-secret/token", headers=headers, data=data, authenticated=False)
 
-        r = self.__s.post(
-            f"{BASE_URL}/oauth-validate-key-secret/token", headers=headers, data=data)
+            if r.status_code != 200:
+                logger.warning("Connection refused by %s : %s %s", self.__baseUrl, r.status_code, r.text)
+                return False
 
-        if r.status_code != 200:
-            printResponse(r)
-            return False
+            # No errors : we are connected
+            headers = r.headers
 
-        # No errors : we are connected
-        headers = r.headers
+            authentication = headers.get("Authentication")
+            authorization = headers.get("Authorization")
+            self.__setAuthenticationAndAuthorization(authentication, authorization)
+            self.__scheduleRefresh()
 
-        authentication = headers.get("Authentication")
-        authorization = headers.get("Authorization")
-        self.__setAuthenticationAndAuthorization(authentication, authorization)
+            if self.__sessionPath is not None:
+                try:
+                    self.saveSession()
+                except OSError:
+                    # We are connected anyway, the next process will just connect again
+                    logger.warning("Unable to save the session in %s", self.__sessionPath, exc_info=True)
+            return True
 
-        self.__extractDataFromJWT(authentication)
+    def saveSession(self, path: str = None, passphrase: str = None) -> None:
+        """
+        Save the authenticated state (tokens and data of the JWT) in an encrypted file, so another process can use it with resumeSession instead of connecting again
 
-        self.__connected = True
+        :param path: The path of the file, by default the one given to resumeSession
+        :type path: str
+        :param passphrase: The passphrase used to encrypt the file, by default the password of the account
+        :type passphrase: str
+        """
+        if not self.__connected:
+            raise ConnectionError
+        auth = self.__auth
+        state = {
+            "email": self.__email,
+            "baseUrl": self.__baseUrl,
+            "authentication": auth.headers["authentication"][len("Bearer "):],
+            "authorization": auth.headers["authorization"][len("Bearer "):],
+            "jwtData": auth.jwtData,
+            "tokenExpiry": auth.tokenExpiry,
+        }
+        path = path if path is not None else self.__sessionPath
+        passphrase = passphrase if passphrase is not None else (self.__sessionPassphrase or self.__password)
+        writeSessionFile(path, state, passphrase, self.__sessionKeys)
+
+    def resumeSession(self, path: str, passphrase: str = None, connect: bool = True) -> bool:
+        """
+        Use the authenticated state saved in a file (see saveSession) instead of connecting, or connect if it is missing, expired or for another account
+        The file is then updated each time the client connects (for example when the saved token is rejected by the API and the client connects again)
+
+        :param path: The path of the session file
+        :type path: str
+        :param passphrase: The passphrase used to encrypt the file, by default the password of the account
+        :type passphrase: str
+        :param connect: If False, the client does not connect when the saved state can not be used : it connects on first use instead (see enableAutoConnect)
+        :type connect: bool
+        :return: True if the client is connected (with the saved state or with a new connection), False otherwise
+        :rtype: bool
+        :raises ImportError: If cryptography is not installed (the session files are encrypted with it)
+        """
+        requireCryptography()
+        self.__sessionPath = path
+        self.__sessionPassphrase = passphrase
+        try:
+            state = readSessionFile(path, passphrase if passphrase is not None else self.__password, self.__sessionKeys)
+        except (OSError, SessionFileError, ValueError):
+            return self.connect() if connect else False
+
+        tokenExpiry = state.get("tokenExpiry")
+        if state.get("email") != self.__email or state.get("baseUrl") != self.__baseUrl or \
+                (tokenExpiry is not None and time.time() >= tokenExpiry - TOKEN_EXPIRY_MARGIN):
+            return self.connect() if connect else False
+
+        with self.__authLock:
+            self.__setAuthenticationAndAuthorization(state["authentication"], state["authorization"], state["jwtData"])
+            self.__scheduleRefresh()
         return True
 
+    def enableAutoConnect(self) -> None:
+        """
+        Connect on first use : the methods needing a connection call connect (once for all the threads) instead of raising ConnectionError (see AumaxPool)
+        """
+        self.__autoConnect = True
+
+    def disableAutoConnect(self) -> None:
+        self.__autoConnect = False
+
+    def __requireConnection(self) -> None:
+        """
+        :raises ConnectionError: If the client is not connected (and could not connect if enableAutoConnect was called)
+        """
+        if self.__connected:
+            return
+        if self.__autoConnect:
+            with self.__authLock:
+                if self.__connected or self.connect():
+                    return
+        raise ConnectionError
+
+    def isConnected(self) -> bool:
+        """
+        :return: True if the connect method was called successfully, False otherwise
+        :rtype: bool
+        """
+        return self.__connected
+
     def enableSensibleOperations(self, deviceName: str, deviceVendor: str, deviceModel: str, deviceSerialNumber: str, deviceId: str, seedDevice: str, mCode: str) -> None:
         """
         Method to enable sensible operations (such as creating a new virtual credit card)
@@ -211,75 +774,242 @@ class Aumax():
         self.__seedDevice = seedDevice  # Example : xfu3rbzqb47njp5y
         # mCode is the 6 digits code you set to protect sensible actions such as creating a virtual credit card
         self.__mCode = mCode  # Example : 012345
+        self.__crypto = AumaxCryptoContext(seedDevice, mCode)
 
     def getUserInfo(self) -> dict:
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
 
-        r = self.__s.get(f"{BASE_URL}/user/{VERSION}person/me")
-        return r.json()
+        return self.__cachedGet("userInfo", f"{self.__baseUrl}/user/{VERSION}person/me")
 
     def getCards(self) -> dict:
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
 
         # We can remove the /preview at the end
-        r = self.__s.get(f"{BASE_URL}/carte/{VERSION}cards/preview")
-        return r.json()
+        return self.__cachedGet("cards", f"{self.__baseUrl}/carte/{VERSION}cards/preview")
 
     def getMaxCard(self) -> dict:
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
 
-        r = self.__s.get(f"{BASE_URL}/carte/{VERSION}cards/max")
-        return r.json()
+        return self.__cachedGet("maxCard", f"{self.__baseUrl}/carte/{VERSION}cards/max")
 
-    def getAccouts(self) -> dict:
+    def getAccouts(self, strict: bool = False) -> dict:
+        """
+        :param strict: If True, a ResponseError is raised if the API answers with an error (otherwise the error sent by the API is returned)
+        :type strict: bool
+        :return: The accounts, as sent by the API (a list of Account models if useModels is True)
+        :rtype: dict
+        """
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
 
-        r = self.__s.get(
-            f"{BASE_URL}/compte/{VERSION}accounts/preview")
-        return r.json()
+        accounts = self.__cachedGet("accounts", f"{self.__baseUrl}/compte/{VERSION}accounts/preview", strict)
+        if self.__useModels:
+            return [Account.fromDict(tile.get("account", tile)) for tile in extractItems(accounts, ("tiles",))]
+        return accounts
 
-    def getTransactions(self, accountId: str, count: int) -> dict:
+    def getTransactions(self, accountId: str, count: int, strict: bool = False) -> dict:
+        """
+        :param accountId: The id of the account
+        :type accountId: str
+        :param count: The number of transactions (the most recent ones)
+        :type count: int
+        :param strict: If True, a ResponseError is raised if the API answers with an error (otherwise the error sent by the API is returned)
+        :type strict: bool
+        :return: The transactions, as sent by the API (a list of Transaction models if useModels is True)
+        :rtype: dict
+        """
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
 
-        r = self.__s.get(
-            f"{BASE_URL}/compte/{VERSION}accounts/{accountId}/transactions?count={count}")
-        return r.json()
+        transactions = self.__getTransactions(accountId, count, strict)
+        if self.__useModels:
+            return [Transaction.fromDict(transaction) for transaction in extractItems(transactions)]
+        return transactions
 
-    def getVirtualCards(self) -> list:
+    def __getTransactions(self, accountId: str, count: int, strict: bool = False) -> dict:
+        return self.__get("transactions", f"{self.__baseUrl}/compte/{VERSION}accounts/{accountId}/transactions?count={count}", strict)
 
-        if not self.__connected:
-            raise ConnectionError
+    def iterTransactions(self, accountId: str, pageSize: int = 50, until=None):
+        """
+        Iterate over the transactions of an account, from the most recent to the oldest, fetching them page by page
+        The API only has a "count" parameter, so each page asks for twice as many transactions as the previous one and only the new ones are yielded :
+        you can stop iterating whenever you want, and as the pages are decoded while they are received, only one transaction is kept in memory at a time
+
+        :param accountId: The id of the account
+        :type accountId: str
+        :param pageSize: The number of transactions asked in the first page
+        :type pageSize: int
+        :param until: Stop when reaching this watermark : a date/datetime (transactions older than it are not yielded) or the id of a transaction (this transaction and the older ones are not yielded)
+        :type until: datetime.date or str
+        :return: A generator of transactions (dictionnaries, or Transaction models if useModels is True)
+        :rtype: generator
+        :raises ResponseError: If the API answers with an error (an error is not an empty list of transactions)
+        """
+        self.__requireConnection()
+        if isinstance(until, datetime.datetime):
+            until = until.date()
+
+        count = pageSize
+        seen = 0
+        while True:
+            received = 0
+            with self.__request("transactions", "GET", f"{self.__baseUrl}/compte/{VERSION}accounts/{accountId}/transactions?count={count}", stream=True) as r:
+                self.__checkStatus(r)
+                for transaction in iterJsonArray(r.iter_content(STREAM_CHUNK_SIZE)):
+                    received += 1
+                    if received <= seen:
+                        # Already yielded with the previous page
+                        continue
+                    if isinstance(until, datetime.date):
+                        date = getItemDate(transaction)
+                        if date is not None and date.date() < until:
+                            return
+                    elif until is not None and str(transaction.get("id")) == str(until):
+                        return
+                    yield Transaction.fromDict(transaction) if self.__useModels else transaction
+
+            if received < count:
+                # There is no more transactions
+                return
+            seen = received
+            count *= 2
+
+    def getVirtualCards(self, strict: bool = False) -> list:
+        """
+        :param strict: If True, a ResponseError is raised if the API answers with an error (otherwise the error sent by the API is returned)
+        :type strict: bool
+        :return: The virtual credit cards (VirtualCard models if useModels is True)
+        :rtype: list
+        """
 
-        r = self.__s.get(
-            f"{BASE_URL}/nvvirtualisapi/rest/virtualcard")
-        return r.json()
+        self.__requireConnection()
 
-    def getVirtualCardOperations(self, cardNum: str) -> list:
+        cards = self.__cachedGet("virtualCards", f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard", strict)
+        if self.__useModels:
+            return [VirtualCard.fromDict(card) for card in extractItems(cards)]
+        return cards
+
+    def getVirtualCardOperations(self, cardNum: str, strict: bool = False) -> list:
         """
-        [summary]
+        Get all the operations made with a virtual credit card
 
-        :param cardNum: [description]
+        :param cardNum: The number of the virtual credit card ("num")
         :type cardNum: str
-        :return: [description]
+        :param strict: If True, a ResponseError is raised if the API answers with an error (otherwise the error sent by the API is returned)
+        :type strict: bool
+        :return: The operations (CardOperation models if useModels is True)
         :rtype: list
         """
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
+
+        operations = self.__get("virtualCardOperations", f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard/{cardNum}/operation", strict)
+        if self.__useModels:
+            return [CardOperation.fromDict(operation) for operation in extractItems(operations)]
+        return operations
+
+    def iterVirtualCardOperations(self, cardNum: str):
+        """
+        Iterate over the operations made with a virtual credit card, decoding them while the response is received (for cards with a lot of operations)
+
+        :param cardNum: The number of the virtual credit card ("num")
+        :type cardNum: str
+        :return: A generator of operations (dictionnaries, or CardOperation models if useModels is True)
+        :rtype: generator
+        :raises ResponseError: If the API answers with an error (an error is not an empty list of operations)
+        """
+        self.__requireConnection()
 
-        r = self.__s.get(
-            f"{BASE_URL}/nvvirtualisapi/rest/virtualcard/{cardNum}/operation")
-        return r.json()
+        with self.__request("virtualCardOperations", "GET", f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard/{cardNum}/operation", stream=True) as r:
+            self.__checkStatus(r)
+            for operation in iterJsonArray(r.iter_content(STREAM_CHUNK_SIZE)):
+                yield CardOperation.fromDict(operation) if self.__useModels else operation
+
+    def getSnapshot(self, deadline: float = 5, transactionCount: int = 0, maxWorkers: int = 8) -> dict:
+        """
+        Get the data of a dashboard at once : user info, cards, max card, accounts, virtual cards and the operations of each virtual card (and the last transactions of each account if transactionCount is given)
+        The requests are sent concurrently, and when the deadline is reached the parts already received are returned
+
+        :param deadline: The maximum time in seconds spent in this method
+        :type deadline: float
+        :param transactionCount: The number of transactions to get for each account (0 to not get them)
+        :type transactionCount: int
+        :param maxWorkers: The maximum number of requests sent at the same time
+        :type maxWorkers: int
+        :return: The parts of the snapshot, example :
+            {"userInfo": {...}, "cards": {...}, "maxCard": {...}, "accounts": {...}, "virtualCards": [...],
+             "virtualCardOperations": {cardNum: [...]}, "transactions": {accountId: {...}},
+             "status": {"userInfo": "ok", "virtualCardOperations:5372...": "timeout", "cards": "error", ...},
+             "errors": {"cards": "CircuitOpenError: ..."}, "complete": False, "elapsed": 1.2}
+            A part that failed or timed out is None (or missing from virtualCardOperations / transactions)
+        :rtype: dict
+        """
+        self.__requireConnection()
+
+        start = time.monotonic()
+        end = start + deadline
+        snapshot = {"userInfo": None, "cards": None, "maxCard": None, "accounts": None, "virtualCards": None,
+                    "virtualCardOperations": {}, "transactions": {}, "status": {}, "errors": {}}
+        # Future -> (name of the part in the status, function saving the result)
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=maxWorkers)
+
+        def submit(name: str, save, method, *args) -> None:
+            pending[executor.submit(method, *args)] = (name, save)
+
+        def saveTo(key: str):
+            return lambda value: snapshot.__setitem__(key, value)
+
+        def saveAccounts(accounts) -> None:
+            snapshot["accounts"] = accounts
+            if transactionCount > 0:
+                for account in extractItems(accounts, ("tiles",)):
+                    account = account.get("account", account) if isinstance(account, dict) else account
+                    accountId = str(account["id"])
+                    submit(f"transactions:{accountId}", lambda value, accountId=accountId: snapshot["transactions"].__setitem__(accountId, value),
+                           self.getTransactions, accountId, transactionCount)
+
+        def saveVirtualCards(virtualCards) -> None:
+            snapshot["virtualCards"] = virtualCards
+            for card in extractItems(virtualCards):
+                cardNum = str(card["num"])
+                submit(f"virtualCardOperations:{cardNum}", lambda value, cardNum=cardNum: snapshot["virtualCardOperations"].__setitem__(cardNum, value),
+                       self.getVirtualCardOperations, cardNum)
+
+        try:
+            submit("userInfo", saveTo("userInfo"), self.getUserInfo)
+            submit("cards", saveTo("cards"), self.getCards)
+            submit("maxCard", saveTo("maxCard"), self.getMaxCard)
+            submit("accounts", saveAccounts, self.getAccouts)
+            submit("virtualCards", saveVirtualCards, self.getVirtualCards)
+
+            while pending:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, save = pending.pop(future)
+                    try:
+                        save(future.result())
+                        snapshot["status"][name] = "ok"
+                    except Exception as e:
+                        snapshot["status"][name] = "error"
+                        snapshot["errors"][name] = f"{type(e).__name__}: {e}"
+
+            for future, (name, _) in pending.items():
+                future.cancel()
+                snapshot["status"][name] = "timeout"
+        finally:
+            # The requests still running are not waited for, their results are ignored
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        snapshot["complete"] = all(status == "ok" for status in snapshot["status"].values())
+        snapshot["elapsed"] = time.monotonic() - start
+        return snapshot
 
     def getEnrollmentStatus(self) -> dict:
         """
@@ -289,8 +1019,7 @@ class Aumax():
         :return: A dictionnary of booleans telling if the account is enrolled, if the device is enrolled and if biometry is enabled
         :rtype: dict
         """
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
         if not self.__sensibleOperationsEnabled:
             raise SensibleOperationsDisabledError
 
@@ -309,31 +1038,59 @@ class Aumax():
             }
         }
 
-        data = json.dumps(data)
+        data = dumps(data)
 
-        r = self.__s.post(
-            f"{BASE_URL}/nvsecurityapi/rest/enrollments/enrollmentStatus/getEnrollmentStatus", headers=headers, data=data)
-
-        return r.json()
+        url = f"{self.__baseUrl}/nvsecurityapi/rest/enrollments/enrollmentStatus/getEnrollmentStatus"
+        return self.__coalesce(("POST", url, data), lambda: loads(self.__request("enrollmentStatus", "POST", url, headers=headers, data=data).content))
 
     def getServerTimeForOTP(self) -> datetime.datetime:
         """
-        This method can be used to synchronize time with the server, but it seems it is useless for now.
+        This method can be used to synchronize time with the server (it is used by enableClockCalibration)
 
-        :return: A datetime object giving the time of the server
+        :return: A datetime object giving the time of the server (UTC)
         :rtype: datetime.datetime
         """
-        # This method seems to be useless to generate the OTP(One Time Password), but I leave it there
 
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
 
-        r = self.__s.get(f"{BASE_URL}/nvsecurityapi/rest/enrollments/time")
+        r = self.__request("serverTime", "GET", f"{self.__baseUrl}/nvsecurityapi/rest/enrollments/time")
         httpTime = r.headers["Date"]
         time = datetime.datetime.strptime(
             httpTime, '%a, %d %b %Y %H:%M:%S GMT')
         return time
 
+    def enableClockCalibration(self, samples: int = 5, recalibrationInterval: float = 3600, guard: float = 2) -> None:
+        """
+        Generate the TOTPs with the time of the server instead of the local time (useful if the local clock drifts)
+        The offset between the local clock and the server is estimated using getServerTimeForOTP (the first time a card is created, then every recalibrationInterval seconds)
+        If the current TOTP time step ends in less than guard seconds, the creation of a card waits for the next time step
+
+        :param samples: The number of requests sent to estimate the offset
+        :type samples: int
+        :param recalibrationInterval: The number of seconds after which the offset is estimated again
+        :type recalibrationInterval: float
+        :param guard: The minimum number of seconds the TOTP must still be valid when it reaches the server
+        :type guard: float
+        """
+        self.__clock = ServerClock(self.getServerTimeForOTP, samples, recalibrationInterval)
+        self.__clockGuard = guard
+
+    def disableClockCalibration(self) -> None:
+        self.__clock = None
+
+    def calibrateClock(self) -> float:
+        """
+        Estimate now the offset between the local clock and the server (enableClockCalibration must have been called)
+
+        :return: The number of seconds to add to the local time to get the time of the server
+        :rtype: float
+        """
+        clock = self.__clock
+        if clock is None:
+            raise ClockCalibrationDisabledError
+        clock.calibrate()
+        return clock.getOffset()
+
     def generateVirtualCard(self, length: int, amount: float) -> dict:
         """
         Generate a new virtual credit card (11 virtual credit cards per day maximum)
@@ -343,18 +1100,48 @@ class Aumax():
         :type length: int
         :param amount: The amount in Euros contained in the virtual credit card
         :type amount: float
-        :return: A dictionnary containing the information of the card
+        :return: A dictionnary containing the information of the card (a VirtualCard model if useModels is True)
         :rtype: dict
         """
-        if not self.__connected:
-            raise ConnectionError
+        self.__requireConnection()
         if not self.__sensibleOperationsEnabled:
             raise SensibleOperationsDisabledError
 
-        # We request a seed to create the OTP(One Time Password)
-        seedOperation = self.__generateSeed(length, amount)
+        # The card is counted before requesting the seed : a card beyond the daily limit does not cost a seed and a TOTP
+        quota = self.__quota
+        if quota is not None:
+            quota.reserveCard(self.__email)
+        try:
+            # We request a seed to create the OTP(One Time Password)
+            seedOperation = self.__generateSeed(length, amount)
+            r = self.__createVirtualCard(seedOperation)
+        except Exception:
+            if quota is not None:
+                quota.releaseCard(self.__email)
+            raise
+        if r.status_code != 200 and quota is not None:
+            quota.releaseCard(self.__email)
+        card = loads(r.content)
+        if self.__useModels and r.status_code == 200:
+            return VirtualCard.fromDict(card)
+        return card
+
+    def __createVirtualCard(self, seedOperation: str) -> requests.Response:
+        """
+        Create a virtual credit card using a seed returned by __generateSeed (a seed can only be used once)
+
+        :param seedOperation: The seed returned by __generateSeed
+        :type seedOperation: str
+        :return: The response of the request
+        :rtype: requests.Response
+        """
         # We generate the One Time Password (it is "totp" and not "otp" because it is a Time One Time Password...)
-        totp = generateTOTP(self.__seedDevice, self.__mCode, seedOperation)
+        timestamp = None
+        clock = self.__clock
+        if clock is not None:
+            timestamp = clock.waitForSafeStep(self.__clockGuard)
+        totp = self.__crypto.generateTOTP(seedOperation, timestamp)
+        jwtData = self.__auth.jwtData
 
         headers = {
             'Content-Type': 'application/json',
@@ -362,11 +1149,11 @@ class Aumax():
 
         data = {
             "accessInfos": {
-                "accessCode": self.__JwtData["accessCode"],
-                "efs": self.__JwtData["efs"],
+                "accessCode": jwtData["accessCode"],
+                "efs": jwtData["efs"],
                 # Yes oauthToken is the same as accessCode
-                "oauthToken": self.__JwtData["accessCode"],
-                "si": self.__JwtData["si"]
+                "oauthToken": jwtData["accessCode"],
+                "si": jwtData["si"]
             },
             "device": {
                 "biometryActivation": "N",  # For now we do not treat biometry
@@ -377,9 +1164,87 @@ class Aumax():
             "totp": totp
         }
 
-        data = json.dumps(data)
+        data = dumps(data)
+
+        try:
+            return self.__request("createVirtualCard", "POST", f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard", headers=headers, data=data, replayable=False)
+        finally:
+            cache = self.__cache
+            if cache is not None:
+                # The list of virtual cards (and the balance of the accounts) changed, or may have changed if the request failed
+                cache.invalidate("virtualCards")
+                cache.invalidate("accounts")
 
-        r = self.__s.post(
-            f"{BASE_URL}/nvvirtualisapi/rest/virtualcard", headers=headers, data=data)
+    def countVirtualCardsCreatedToday(self) -> int:
+        """
+        The virtual cards are requested to the API even if the cache is enabled : the cards created by other processes or applications must be counted
+
+        :return: The number of virtual credit cards created today (11 virtual credit cards per day maximum)
+        :rtype: int
+        :raises ResponseError: If the API answers with an error (the cards created today are unknown)
+        """
+        self.__requireConnection()
+
+        today = datetime.date.today().strftime("%d/%m/%Y")
+        cards = self.__get("virtualCards", f"{self.__baseUrl}/nvvirtualisapi/rest/virtualcard", strict=True)
+        return sum(1 for card in extractItems(cards) if card.get("dateCreation") == today)
+
+    def generateVirtualCards(self, specs: list, maxPerDay: int = MAX_VIRTUAL_CARDS_PER_DAY) -> list:
+        """
+        Generate several virtual credit cards : the seed of the next card is requested while the current card is created
+        The cards that would exceed the daily limit are not requested
+
+        Output example : [{'length': 6, 'amount': 3.0, 'card': {'num': '5372040132406814000', ...}, 'error': None}, {'length': 6, 'amount': 5.0, 'card': None, 'error': 'Daily limit of 11 virtual cards reached'}]
+
+        :param specs: A list of (length, amount) tuples, length is the duration of the card in months and amount the amount in Euros contained in the card
+        :type specs: list
+        :param maxPerDay: The maximum number of virtual credit cards that can be created per day
+        :type maxPerDay: int
+        :return: A list with the result of each card, in the same order as specs ("card" is None and "error" tells why when the card was not created)
+        :rtype: list
+        """
+        self.__requireConnection()
+        if not self.__sensibleOperationsEnabled:
+            raise SensibleOperationsDisabledError
 
-        return r.json()
+        results = [{"length": length, "amount": amount, "card": None, "error": None} for length, amount in specs]
+        created = self.countVirtualCardsCreatedToday()
+        remaining = max(maxPerDay - created, 0)
+        for result in results[remaining:]:
+            result["error"] = f"Daily limit of {maxPerDay} virtual cards reached"
+        todo = results[:remaining]
+
+        quota = self.__quota
+        if quota is not None and todo:
+            # The other processes using the account may be creating cards too
+            quota.syncCards(self.__email, created)
+            reserved = []
+            for result in todo:
+                try:
+                    quota.reserveCard(self.__email)
+                    reserved.append(result)
+                except QuotaExceededError as e:
+                    result["error"] = str(e)
+            todo = reserved
+        if not todo:
+            return results
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            nextSeed = executor.submit(self.__generateSeed, todo[0]["length"], todo[0]["amount"])
+            for i, result in enumerate(todo):
+                seed = nextSeed
+                if i + 1 < len(todo):
+                    nextSeed = executor.submit(self.__generateSeed, todo[i + 1]["length"], todo[i + 1]["amount"])
+                try:
+                    r = self.__createVirtualCard(seed.result())
+                    if r.status_code == 200:
+                        card = loads(r.content)
+                        result["card"] = VirtualCard.fromDict(card) if self.__useModels else card
+                    else:
+                        result["error"] = f"{r.status_code} : {r.text}"
+                except Exception as e:
+                    result["error"] = repr(e)
+                if result["card"] is None and quota is not None:
+                    quota.releaseCard(self.__email)
+
+        return results
@@ -0,0 +1,98 @@
+import threading
+from Aumax import Aumax
+from resilience import CircuitBreaker
+from metrics import Metrics
+from transport import Transport, RequestsTransport, LimitedTransport
+from consts import BASE_URL
+
+
+class AumaxPool():
+
+    def __init__(self, maxConnections: int = 10, maxConcurrency: int = 10, maxConcurrencyPerAccount: int = 2, circuitBreaker: CircuitBreaker = None, baseUrl: str = BASE_URL,
+                 metrics: Metrics = None, transport: Transport = None):
+        """
+        Create a pool of Aumax accounts sharing the same HTTP connection pool
+        Each account keeps its own authentication headers and JWT data, and is connected on first use
+        The concurrency limits apply to each request (including the ones sent by the threads of getSnapshot), a streamed response holds its slot until it is read
+        (so an account with maxConcurrencyPerAccount=1 can not send another request while one of its iterators is not finished)
+
+        :param maxConnections: The maximum number of HTTP connections kept open to the Aumax API (shared by all the accounts), used if no transport is given
+        :type maxConnections: int
+        :param maxConcurrency: The maximum number of requests sent at the same time by all the accounts
+        :type maxConcurrency: int
+        :param maxConcurrencyPerAccount: The maximum number of requests sent at the same time by one account
+        :type maxConcurrencyPerAccount: int
+        :param circuitBreaker: The circuit breaker shared by all the accounts (all the accounts use the same API), a new one is created if None
+        :type circuitBreaker: CircuitBreaker
+        :param baseUrl: The url of the Aumax API
+        :type baseUrl: str
+        :param metrics: If given, the requests of all the accounts are recorded in these metrics (see Aumax.enableMetrics)
+        :type metrics: Metrics
+        :param transport: The transport shared by all the accounts (see transport.py), a RequestsTransport with maxConnections connections is created if None
+        :type transport: Transport
+        """
+        self.__baseUrl = baseUrl
+        self.__metrics = metrics
+        self.__circuitBreaker = circuitBreaker if circuitBreaker is not None else CircuitBreaker()
+        self.__maxConcurrencyPerAccount = maxConcurrencyPerAccount
+        self.__semaphore = threading.BoundedSemaphore(maxConcurrency)
+        self.__accounts = {}
+        self.__lock = threading.Lock()
+
+        # poolBlock=True : when all the connections are used, a request waits for one instead of opening a new connection
+        self.__transport = transport if transport is not None else RequestsTransport(poolSize=maxConnections, poolBlock=True)
+
+    def addAccount(self, name: str, email: str, password: str) -> Aumax:
+        """
+        Add an account to the pool (the account is not connected until it is used)
+
+        :param name: The name used to get the account from the pool
+        :type name: str
+        :param email: The email used to connect to the Aumax account
+        :type email: str
+        :param password: The password used to connect to the Aumax account
+        :type password: str
+        :return: The account
+        :rtype: Aumax
+        """
+        # The slot of the account is taken first so a request does not hold a global slot while waiting for its account
+        transport = LimitedTransport(self.__transport, threading.BoundedSemaphore(self.__maxConcurrencyPerAccount), self.__semaphore)
+        account = Aumax(email, password, baseUrl=self.__baseUrl, transport=transport)
+        account.enableAutoConnect()
+        account.configureResilience(circuitBreaker=self.__circuitBreaker)
+        if self.__metrics is not None:
+            account.enableMetrics(self.__metrics)
+        with self.__lock:
+            self.__accounts[name] = account
+        return account
+
+    def removeAccount(self, name: str) -> None:
+        with self.__lock:
+            del self.__accounts[name]
+
+    def account(self, name: str) -> Aumax:
+        """
+        :param name: The name given to the account in addAccount
+        :type name: str
+        :return: The account
+        :rtype: Aumax
+        """
+        return self.__accounts[name]
+
+    def __getitem__(self, name: str) -> Aumax:
+        return self.account(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__accounts
+
+    def __len__(self) -> int:
+        return len(self.__accounts)
+
+    def names(self) -> list:
+        return list(self.__accounts)
+
+    def close(self) -> None:
+        """
+        Close all the HTTP connections of the pool
+        """
+        self.__transport.close()
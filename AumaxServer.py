@@ -0,0 +1,419 @@
+import argparse
+import base64
+import datetime
+import hashlib
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from utils import AumaxCryptoContext, getHMACSHA1AuthCode, getTOTPTimeStep
+from consts import BASIC_AUTH_KEY, VERSION, MAX_VIRTUAL_CARDS_PER_DAY
+
+MERCHANTS = ["CARREFOUR", "AMAZON", "SNCF", "UBER", "FNAC", "LECLERC", "DECATHLON", "SPOTIFY", "NETFLIX", "BOULANGERIE"]
+
+
+def base64UrlJson(obj: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode('utf-8')).decode('utf-8').rstrip("=")
+
+
+class AumaxUser():
+
+    def __init__(self, email: str, password: str, seedDevice: str, mCode: str, deviceSerialNumber: str, rng: random.Random,
+                 transactionCount: int, virtualCardCount: int, operationsPerCard: int):
+        """
+        The data of an account of the stand-in server (generated randomly)
+        """
+        self.email = email
+        self.password = password
+        self.deviceSerialNumber = deviceSerialNumber
+        self.crypto = AumaxCryptoContext(seedDevice, mCode) if seedDevice and mCode else None
+        self.seedDevice = seedDevice
+        self.mCode = mCode
+        self.lock = threading.Lock()
+        self.pendingSeeds = {}  # seedOperation -> (length, amount)
+        self.cardsCreated = {}  # date -> number of cards created that day
+        self.rng = rng
+
+        today = datetime.date.today()
+        self.accounts = []
+        self.transactions = {}
+        for i in range(2):
+            accountId = f"{rng.randrange(10 ** 10, 10 ** 11)}"
+            self.accounts.append({"id": accountId, "libelle": f"Compte {i + 1}", "numero": accountId[-6:],
+                                  "solde": round(rng.uniform(-500, 5000), 2), "devise": "EUR"})
+            self.transactions[accountId] = [{
+                "id": f"{accountId}-{transactionCount - n}",
+                "date": (today - datetime.timedelta(days=n // 3)).strftime("%d/%m/%Y"),
+                "montant": round(rng.uniform(-150, 50), 2),
+                "libelle": f"CB {rng.choice(MERCHANTS)} {rng.randrange(1000, 9999)}",
+                "type": rng.choice(["CB", "VIR", "PRLV"]),
+            } for n in range(transactionCount)]
+
+        self.virtualCards = []
+        self.operations = {}
+        for n in range(virtualCardCount):
+            self.__addCard(rng.choice([1, 3, 6, 12]), round(rng.uniform(5, 200), 2), today - datetime.timedelta(days=n * 7),
+                           operationsPerCard)
+
+    def __addCard(self, length: int, amount: float, created: datetime.date, operationCount: int) -> dict:
+        expiry = created + datetime.timedelta(days=31 * max(length, 1))
+        operations = []
+        remaining = amount
+        for n in range(operationCount):
+            spent = round(self.rng.uniform(0, remaining / 2), 2)
+            remaining = round(remaining - spent, 2)
+            operations.append({"date": (created + datetime.timedelta(days=n)).strftime("%d/%m/%Y"), "montant": -spent,
+                               "libelle": f"PAIEMENT {self.rng.choice(MERCHANTS)}", "commercant": self.rng.choice(MERCHANTS)})
+        card = {"num": str(self.rng.randrange(5372040000000000000, 5372049999999999999)), "dateCreation": created.strftime("%d/%m/%Y"),
+                "duree": length, "dateEch": expiry.strftime("%m/%y"), "mntSaisi": amount, "mntRestant": remaining,
+                "crypto": f"{self.rng.randrange(1000):03d}", "devise": "EUR"}
+        self.virtualCards.insert(0, card)
+        self.operations[card["num"]] = operations[::-1]
+        return card
+
+    def createCard(self, length: int, amount: float) -> dict:
+        return self.__addCard(length, amount, datetime.date.today(), 0)
+
+
+class AumaxRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are written separately, with Nagle's algorithm each response would wait for the delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("POST", r"/oauth-validate-key-secret/token", "token"),
+        ("GET", rf"/user/{VERSION}person/me", "userInfo"),
+        ("GET", rf"/carte/{VERSION}cards/preview", "cards"),
+        ("GET", rf"/carte/{VERSION}cards/max", "maxCard"),
+        ("GET", rf"/compte/{VERSION}accounts/preview", "accounts"),
+        ("GET", rf"/compte/{VERSION}accounts/(?P<accountId>[^/]+)/transactions", "transactions"),
+        ("GET", r"/nvvirtualisapi/rest/virtualcard", "virtualCards"),
+        ("GET", r"/nvvirtualisapi/rest/virtualcard/(?P<cardNum>[^/]+)/operation", "virtualCardOperations"),
+        ("POST", r"/nvvirtualisapi/rest/virtualcard", "createVirtualCard"),
+        ("POST", r"/nvsecurityapi/rest/enrollments/enrollmentStatus/getEnrollmentStatus", "enrollmentStatus"),
+        ("POST", r"/nvsecurityapi/rest/enrollments/operation/generateSeed", "generateSeed"),
+        ("GET", r"/nvsecurityapi/rest/enrollments/time", "serverTime"),
+    ]
+
+    def log_message(self, format, *args) -> None:
+        if self.server.aumax.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:
+        self.__handle("GET")
+
+    def do_POST(self) -> None:
+        self.__handle("POST")
+
+    def __send(self, status: int, body=None, headers: dict = None) -> None:
+        data = json.dumps(body).encode('utf-8') if body is not None else b""
+        headers = headers or {}
+        if self.command == "GET" and status == 200:
+            etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, data = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def __body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def __handle(self, method: str) -> None:
+        server = self.server.aumax
+        url = urlsplit(self.path)
+        for routeMethod, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if routeMethod == method and match:
+                break
+        else:
+            self.__body()
+            return self.__send(404, {"code": "NOT_FOUND"})
+
+        body = self.__body()
+        server.simulateLatency()
+        if server.shouldFail():
+            return self.__send(503, {"code": "SERVICE_UNAVAILABLE"})
+
+        if name == "token":
+            return self.__token(body)
+        user = server.authenticate(self.headers.get("authorization", ""))
+        if user is None:
+            return self.__send(401, {"code": "UNAUTHORIZED"})
+        getattr(self, "_AumaxRequestHandler__" + name)(user, body, parse_qs(url.query), **match.groupdict())
+
+    def __token(self, body: bytes) -> None:
+        if self.headers.get("authorization") != f"Basic {BASIC_AUTH_KEY}":
+            return self.__send(401, {"code": "INVALID_CLIENT"})
+        form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+        tokens = self.server.aumax.login(form.get("username"), form.get("password"))
+        if tokens is None:
+            return self.__send(400, {"error": "invalid_grant"})
+        authentication, authorization = tokens
+        self.__send(200, {}, {"Authentication": authentication, "Authorization": authorization})
+
+    def __userInfo(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        self.__send(200, {"email": user.email, "firstName": "Jean", "lastName": "Dupont"})
+
+    def __cards(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        self.__send(200, {"cards": [{"id": "1", "type": "MAX", "status": "ACTIVE"}]})
+
+    def __maxCard(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        self.__send(200, {"id": "1", "type": "MAX", "status": "ACTIVE", "plafond": 3000})
+
+    def __accounts(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        self.__send(200, {"tiles": [{"account": account} for account in user.accounts]})
+
+    def __transactions(self, user: AumaxUser, body: bytes, query: dict, accountId: str) -> None:
+        if accountId not in user.transactions:
+            return self.__send(404, {"code": "ACCOUNT_NOT_FOUND"})
+        count = int(query.get("count", ["10"])[0])
+        self.__send(200, {"transactions": user.transactions[accountId][:count]})
+
+    def __virtualCards(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        self.__send(200, user.virtualCards)
+
+    def __virtualCardOperations(self, user: AumaxUser, body: bytes, query: dict, cardNum: str) -> None:
+        if cardNum not in user.operations:
+            return self.__send(404, {"code": "CARD_NOT_FOUND"})
+        self.__send(200, user.operations[cardNum])
+
+    def __enrollmentStatus(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        device = json.loads(body).get("device", {})
+        enrolled = user.crypto is not None and device.get("serialNumber") == user.deviceSerialNumber
+        self.__send(200, {"enrolled": user.crypto is not None, "deviceEnrolled": enrolled, "biometryActivated": False})
+
+    def __serverTime(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        # The time is in the "Date" header added by send_response
+        self.__send(200, {})
+
+    def __generateSeed(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        if user.crypto is None:
+            return self.__send(403, {"code": "DEVICE_NOT_ENROLLED"})
+        infos = json.loads(body)["operationInfos"]
+        operation = infos["encodeOperation"]
+        # Same algorithm as utils.generateDigest
+        expected = getHMACSHA1AuthCode(user.seedDevice, user.mCode, operation.encode('utf-8')).decode('utf-8')
+        if infos.get("digest") != expected:
+            return self.__send(400, {"code": "INVALID_DIGEST"})
+        operation = json.loads(operation)
+        seedOperation = base64.b32encode(secrets.token_bytes(10)).decode('utf-8').lower()
+        with user.lock:
+            user.pendingSeeds[seedOperation] = (operation["duree"], operation["mntSaisi"])
+        self.__send(200, {"seedOperation": seedOperation})
+
+    def __createVirtualCard(self, user: AumaxUser, body: bytes, query: dict) -> None:
+        if user.crypto is None:
+            return self.__send(403, {"code": "DEVICE_NOT_ENROLLED"})
+        totp = json.loads(body).get("totp")
+        server = self.server.aumax
+        step = getTOTPTimeStep()
+        today = datetime.date.today()
+        with user.lock:
+            # A seed can only be used once
+            for seedOperation in list(user.pendingSeeds):
+                validTotps = user.crypto.generateTOTPs(seedOperation, range(step - server.totpWindow, step + server.totpWindow + 1))
+                if totp in validTotps:
+                    length, amount = user.pendingSeeds.pop(seedOperation)
+                    break
+            else:
+                return self.__send(400, {"code": "INVALID_TOTP"})
+            if user.cardsCreated.get(today, 0) >= server.maxCardsPerDay:
+                return self.__send(400, {"code": "DAILY_LIMIT_REACHED"})
+            user.cardsCreated[today] = user.cardsCreated.get(today, 0) + 1
+            card = user.createCard(length, amount)
+        self.__send(200, card)
+
+
+class AumaxServer():
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0, latencyJitter: float = 0, errorRate: float = 0,
+                 transactionCount: int = 500, virtualCardCount: int = 10, operationsPerCard: int = 20, tokenLifetime: float = 3600,
+                 maxCardsPerDay: int = MAX_VIRTUAL_CARDS_PER_DAY, totpWindow: int = 1, seed: int = 0, verbose: bool = False):
+        """
+        A local stand-in of the Aumax API, implementing the endpoints used by the Aumax class with random data
+        Digests and TOTPs are verified with the algorithms of utils.py
+
+        :param host: The host the server listens on
+        :type host: str
+        :param port: The port the server listens on (0 to use a free port)
+        :type port: int
+        :param latency: The time in seconds the server waits before answering a request
+        :type latency: float
+        :param latencyJitter: A random time in seconds (between 0 and latencyJitter) added to the latency
+        :type latencyJitter: float
+        :param errorRate: The probability for a request to fail with a 503 error
+        :type errorRate: float
+        :param transactionCount: The number of transactions of each account
+        :type transactionCount: int
+        :param virtualCardCount: The number of virtual cards of each user
+        :type virtualCardCount: int
+        :param operationsPerCard: The number of operations of each virtual card
+        :type operationsPerCard: int
+        :param tokenLifetime: The lifetime of the tokens in seconds
+        :type tokenLifetime: float
+        :param maxCardsPerDay: The maximum number of virtual cards created per day by a user
+        :type maxCardsPerDay: int
+        :param totpWindow: The number of time steps before and after the current one during which a TOTP is accepted
+        :type totpWindow: int
+        :param seed: The seed of the random data
+        :type seed: int
+        :param verbose: If True, the requests are logged
+        :type verbose: bool
+        """
+        self.latency = latency
+        self.latencyJitter = latencyJitter
+        self.errorRate = errorRate
+        self.transactionCount = transactionCount
+        self.virtualCardCount = virtualCardCount
+        self.operationsPerCard = operationsPerCard
+        self.tokenLifetime = tokenLifetime
+        self.maxCardsPerDay = maxCardsPerDay
+        self.totpWindow = totpWindow
+        self.verbose = verbose
+        self.__rng = random.Random(seed)
+        self.__users = {}
+        self.__tokens = {}  # authorization token -> (user, expiry)
+        self.__lock = threading.Lock()
+
+        self.__httpServer = ThreadingHTTPServer((host, port), AumaxRequestHandler)
+        self.__httpServer.daemon_threads = True
+        self.__httpServer.aumax = self
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        :return: The url to give to Aumax(..., baseUrl=url)
+        :rtype: str
+        """
+        host, port = self.__httpServer.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def addUser(self, email: str, password: str, seedDevice: str = "", mCode: str = "", deviceSerialNumber: str = "") -> None:
+        """
+        Add a user to the server (sensible operations are only possible if seedDevice and mCode are given)
+        """
+        self.__users[email] = AumaxUser(email, password, seedDevice, mCode, deviceSerialNumber, random.Random(self.__rng.random()),
+                                        self.transactionCount, self.virtualCardCount, self.operationsPerCard)
+
+    def user(self, email: str) -> AumaxUser:
+        """
+        :return: The user added with addUser (its accounts, transactions and virtual cards can be modified to simulate new data)
+        :rtype: AumaxUser
+        """
+        return self.__users[email]
+
+    def login(self, email: str, password: str) -> tuple:
+        """
+        :return: The (authentication, authorization) tokens, None if the credentials are wrong
+        :rtype: tuple
+        """
+        user = self.__users.get(email)
+        if user is None or user.password != password:
+            return None
+        now = int(time.time())
+        expiry = now + self.tokenLifetime
+        authentication = ".".join([
+            base64UrlJson({"alg": "HS256", "typ": "JWT"}),
+            base64UrlJson({"sub": email, "accessCode": secrets.token_hex(16), "efs": "13807", "si": "AUMAX",
+                           "iat": now, "exp": int(expiry)}),
+            base64.urlsafe_b64encode(secrets.token_bytes(32)).decode('utf-8').rstrip("="),
+        ])
+        authorization = secrets.token_urlsafe(32)
+        with self.__lock:
+            self.__tokens[authorization] = (user, expiry)
+        return authentication, authorization
+
+    def authenticate(self, header: str) -> AumaxUser:
+        """
+        :param header: The "authorization" header of a request
+        :type header: str
+        :return: The user of the token, None if the token is unknown or expired
+        :rtype: AumaxUser
+        """
+        user, expiry = self.__tokens.get(header[len("Bearer "):], (None, 0))
+        if expiry < time.time():
+            return None
+        return user
+
+    def expireTokens(self) -> None:
+        """
+        Make all the current tokens expired (to test the reconnection of the client)
+        """
+        with self.__lock:
+            self.__tokens.clear()
+
+    def simulateLatency(self) -> None:
+        delay = self.latency + (random.uniform(0, self.latencyJitter) if self.latencyJitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def shouldFail(self) -> bool:
+        return self.errorRate > 0 and random.random() < self.errorRate
+
+    def start(self) -> str:
+        """
+        Start the server in a background thread
+
+        :return: The url of the server
+        :rtype: str
+        """
+        self.__thread = threading.Thread(target=self.__httpServer.serve_forever, daemon=True)
+        self.__thread.start()
+        return self.url
+
+    def serveForever(self) -> None:
+        self.__httpServer.serve_forever()
+
+    def stop(self) -> None:
+        self.__httpServer.shutdown()
+        self.__httpServer.server_close()
+
+    def __enter__(self) -> "AumaxServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in of the Aumax API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="Latency of each request in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0, help="Random latency added to each request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Probability of a 503 error")
+    parser.add_argument("--transactions", type=int, default=500, help="Number of transactions of each account")
+    parser.add_argument("--virtual-cards", type=int, default=10, help="Number of virtual cards of each user")
+    parser.add_argument("--operations", type=int, default=20, help="Number of operations of each virtual card")
+    parser.add_argument("--email", default="user@example.com")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--seed-device", default="xfu3rbzqb47njp5y")
+    parser.add_argument("--mcode", default="012345")
+    parser.add_argument("--device-serial-number", default="38aa48613fd1536f")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = AumaxServer(args.host, args.port, args.latency, args.latency_jitter, args.error_rate, args.transactions,
+                         args.virtual_cards, args.operations, verbose=args.verbose)
+    server.addUser(args.email, args.password, args.seed_device, args.mcode, args.device_serial_number)
+    print(f"Aumax stand-in server listening on {server.url}")
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import sqlite3
+import json
+import datetime
+from Aumax import Aumax
+from utils import extractItems, getItemDate, itemIds
+from models import toDict
+from codec import loads
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    accountId TEXT NOT NULL,
+    date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactionsAccountDate ON transactions (accountId, date);
+CREATE TABLE IF NOT EXISTS virtualCards (
+    num TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS virtualCardOperations (
+    id TEXT PRIMARY KEY,
+    cardNum TEXT NOT NULL,
+    date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS virtualCardOperationsCardDate ON virtualCardOperations (cardNum, date);
+CREATE TABLE IF NOT EXISTS watermarks (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    date TEXT,
+    state TEXT,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+
+def isoDate(item: dict) -> str:
+    date = getItemDate(item)
+    return date.date().isoformat() if date is not None else None
+
+
+class AumaxStore():
+
+    def __init__(self, path: str = "aumax.db"):
+        """
+        Create (or open) a local SQLite store of the accounts, transactions, virtual credit cards and their operations
+        Use the sync method to update it : only what changed since the last sync is fetched
+
+        :param path: The path of the SQLite database
+        :type path: str
+        """
+        self.__db = sqlite3.connect(path)
+        self.__db.row_factory = sqlite3.Row
+        self.__db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.__db.close()
+
+    def __getWatermark(self, kind: str, key: str) -> sqlite3.Row:
+        return self.__db.execute("SELECT date, state FROM watermarks WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+
+    def __setWatermark(self, kind: str, key: str, date: str, state: str = None) -> None:
+        self.__db.execute("""
+            INSERT INTO watermarks (kind, key, date, state) VALUES (?, ?, ?, ?)
+            ON CONFLICT (kind, key) DO UPDATE SET date = excluded.date, state = excluded.state
+        """, (kind, key, date, state))
+
+    def sync(self, api: Aumax) -> dict:
+        """
+        Fetch what changed since the last sync and save it in the store
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :return: The number of new or updated rows for each kind of data, example : {'accounts': 2, 'transactions': 13, 'virtualCards': 5, 'virtualCardOperations': 1}
+        :rtype: dict
+        """
+        stats = {"accounts": 0, "transactions": 0, "virtualCards": 0, "virtualCardOperations": 0}
+
+        accountIds = self.syncAccounts(api)
+        stats["accounts"] = len(accountIds)
+        for accountId in accountIds:
+            stats["transactions"] += self.syncTransactions(api, accountId)
+
+        changedCards = self.syncVirtualCards(api)
+        stats["virtualCards"] = len(changedCards)
+        for cardNum in changedCards:
+            stats["virtualCardOperations"] += self.syncVirtualCardOperations(api, cardNum)
+
+        return stats
+
+    def syncAccounts(self, api: Aumax) -> list:
+        """
+        Save the accounts returned by getAccouts
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :return: The ids of the accounts
+        :rtype: list
+        """
+        now = datetime.datetime.now().isoformat()
+        accountIds = []
+        with self.__db:
+            for tile in extractItems(api.getAccouts(strict=True), ("tiles",)):
+                tile = toDict(tile)
+                account = tile.get("account", tile)
+                accountId = str(account["id"])
+                self.__db.execute("""
+                    INSERT INTO accounts (id, data, updated) VALUES (?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET data = excluded.data, updated = excluded.updated
+                """, (accountId, json.dumps(account), now))
+                accountIds.append(accountId)
+        return accountIds
+
+    def syncTransactions(self, api: Aumax, accountId: str, pageSize: int = 50) -> int:
+        """
+        Save the transactions of an account made since the last sync (the transactions of the day of the last sync are fetched again and deduplicated)
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :param accountId: The id of the account
+        :type accountId: str
+        :param pageSize: The number of transactions asked in the first page (see Aumax.iterTransactions)
+        :type pageSize: int
+        :return: The number of new or updated transactions
+        :rtype: int
+        """
+        watermark = self.__getWatermark("account", accountId)
+        until = None
+        if watermark is not None and watermark["date"] is not None:
+            until = datetime.date.fromisoformat(watermark["date"])
+        elif watermark is not None:
+            until = watermark["state"]
+
+        count = 0
+        newestDate = newestId = None
+        with self.__db:
+            transactions = (toDict(transaction) for transaction in api.iterTransactions(accountId, pageSize=pageSize, until=until))
+            for transactionId, transaction in itemIds(transactions, accountId):
+                date = isoDate(transaction)
+                if newestId is None:
+                    # Transactions are sorted from the most recent to the oldest
+                    newestDate, newestId = date, transactionId
+                cursor = self.__db.execute("""
+                    INSERT INTO transactions (id, accountId, date, data) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET data = excluded.data, date = excluded.date WHERE data != excluded.data
+                """, (transactionId, accountId, date, json.dumps(transaction)))
+                count += cursor.rowcount
+            if newestId is not None:
+                self.__setWatermark("account", accountId, newestDate, newestId)
+        return count
+
+    def syncVirtualCards(self, api: Aumax) -> list:
+        """
+        Save the virtual credit cards returned by getVirtualCards
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :return: The numbers of the cards that are new or that changed (their operations need to be synced)
+        :rtype: list
+        """
+        now = datetime.datetime.now().isoformat()
+        changedCards = []
+        with self.__db:
+            for card in extractItems(api.getVirtualCards(strict=True)):
+                card = toDict(card)
+                cardNum = str(card["num"])
+                data = json.dumps(card, sort_keys=True)
+                cursor = self.__db.execute("""
+                    INSERT INTO virtualCards (num, data, updated) VALUES (?, ?, ?)
+                    ON CONFLICT (num) DO UPDATE SET data = excluded.data, updated = excluded.updated WHERE data != excluded.data
+                """, (cardNum, data, now))
+                if cursor.rowcount or self.__getWatermark("card", cardNum) is None:
+                    changedCards.append(cardNum)
+        return changedCards
+
+    def syncVirtualCardOperations(self, api: Aumax, cardNum: str) -> int:
+        """
+        Save the operations of a virtual credit card made since the last sync
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :param cardNum: The number of the virtual credit card
+        :type cardNum: str
+        :return: The number of new or updated operations
+        :rtype: int
+        """
+        watermark = self.__getWatermark("card", cardNum)
+        since = watermark["date"] if watermark is not None else None
+
+        count = 0
+        newestDate = since
+        with self.__db:
+            operations = (toDict(operation) for operation in extractItems(api.getVirtualCardOperations(cardNum, strict=True)))
+            for operationId, operation in itemIds(operations, cardNum):
+                date = isoDate(operation)
+                if since is not None and date is not None and date < since:
+                    continue
+                cursor = self.__db.execute("""
+                    INSERT INTO virtualCardOperations (id, cardNum, date, data) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET data = excluded.data, date = excluded.date WHERE data != excluded.data
+                """, (operationId, cardNum, date, json.dumps(operation)))
+                count += cursor.rowcount
+                if date is not None and (newestDate is None or date > newestDate):
+                    newestDate = date
+            self.__setWatermark("card", cardNum, newestDate)
+        return count
+
+    def getAccounts(self) -> list:
+        return [loads(row["data"]) for row in self.__db.execute("SELECT data FROM accounts ORDER BY id")]
+
+    def getTransactions(self, accountId: str, since: datetime.date = None) -> list:
+        """
+        :param accountId: The id of the account
+        :type accountId: str
+        :param since: If given, only the transactions made since this date are returned
+        :type since: datetime.date
+        :return: The stored transactions of the account, from the most recent to the oldest
+        :rtype: list
+        """
+        rows = self.__db.execute(
+            "SELECT data FROM transactions WHERE accountId = ? AND (? IS NULL OR date >= ?) ORDER BY date DESC",
+            (accountId, since and since.isoformat(), since and since.isoformat()))
+        return [loads(row["data"]) for row in rows]
+
+    def getVirtualCards(self) -> list:
+        return [loads(row["data"]) for row in self.__db.execute("SELECT data FROM virtualCards ORDER BY num")]
+
+    def getVirtualCardOperations(self, cardNum: str) -> list:
+        rows = self.__db.execute("SELECT data FROM virtualCardOperations WHERE cardNum = ? ORDER BY date DESC", (cardNum,))
+        return [loads(row["data"]) for row in rows]
@@ -0,0 +1,375 @@
+import datetime
+import re
+import numpy as np
+from models import parseAmount, parseDay, parseExpiry, toDict, DATE_KEYS, AMOUNT_KEYS, LABEL_KEYS
+
+# Name of a period -> unit of numpy.datetime64
+PERIODS = {"day": "D", "week": "W", "month": "M", "year": "Y"}
+
+MERCHANT_KEYS = ("commercant", "merchant", "enseigne")
+
+# Prefixes and suffixes of the labels of the bank that are not part of the name of the counterparty ("CB AMAZON 1234", "PRLV SEPA FREE MOBILE 12/03")
+LABEL_PREFIX = re.compile(r"^(?:(?:CB|CARTE|PAIEMENT|PRLV|PRELEVEMENT|VIR|VIREMENT|SEPA|RETRAIT|DAB|ACHAT)\b[\s*:]*)+", re.IGNORECASE)
+LABEL_SUFFIX = re.compile(r"(?:[\s*]+(?:\d[\d/.:-]*|X+\d+))+$", re.IGNORECASE)
+
+
+def counterparty(label: str) -> str:
+    """
+    Extract the name of the counterparty from the label of a transaction ("CB AMAZON 1234" -> "AMAZON")
+
+    :param label: The label of the transaction
+    :type label: str
+    :return: The name of the counterparty in uppercase ("" if there is no label)
+    :rtype: str
+    """
+    if not label:
+        return ""
+    name = LABEL_SUFFIX.sub("", LABEL_PREFIX.sub("", label.strip()))
+    return " ".join(name.upper().split()) or label.strip().upper()
+
+
+def firstValue(item: dict, keys: tuple):
+    for key in keys:
+        if key in item:
+            return item[key]
+    return None
+
+
+def encode(values: list) -> tuple:
+    """
+    Dictionnary-encode a column of strings
+
+    :return: The (codes, categories) : values == categories[codes]
+    :rtype: tuple
+    """
+    categories, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return codes.astype(np.int32), categories
+
+
+def parseDays(values: list) -> np.ndarray:
+    """
+    Parse the dates of a history into an array of numpy.datetime64[D] (NaT if a date can not be parsed)
+    Each distinct date is parsed once (a history usually has a few transactions per day)
+    """
+    parsed = {}
+    days = []
+    for value in values:
+        key = value if isinstance(value, (str, int, float)) else None
+        if key not in parsed:
+            date = parseDay(value) if key is not None else None
+            parsed[key] = np.datetime64(date, "D") if date is not None else np.datetime64("NaT", "D")
+        days.append(parsed[key])
+    return np.array(days, dtype="datetime64[D]")
+
+
+def parseAmounts(values: list) -> np.ndarray:
+    amounts = [parseAmount(value) for value in values]
+    return np.array([amount if amount is not None else np.nan for amount in amounts], dtype=np.float64)
+
+
+def toPeriods(days: np.ndarray, period: str) -> np.ndarray:
+    """
+    :param days: Dates (numpy.datetime64[D])
+    :type days: numpy.ndarray
+    :param period: "day", "week" (starting on monday), "month" or "year"
+    :type period: str
+    :return: The first day of the period of each date
+    :rtype: numpy.ndarray
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period}, expected one of {', '.join(PERIODS)}")
+    if period == "week":
+        # numpy weeks start on thursday (1970-01-01), so we go back to the previous monday instead
+        return days - ((days.astype("datetime64[D]").astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    return days.astype(f"datetime64[{PERIODS[period]}]").astype("datetime64[D]")
+
+
+def groupSum(keys: np.ndarray, values: np.ndarray) -> tuple:
+    """
+    Sum values by key (rows whose key is NaT or whose value is NaN are ignored)
+
+    :param keys: The key of each row
+    :type keys: numpy.ndarray
+    :param values: The value of each row
+    :type values: numpy.ndarray
+    :return: The (keys, sums, counts), sorted by key
+    :rtype: tuple
+    """
+    valid = ~np.isnan(values)
+    if np.issubdtype(keys.dtype, np.datetime64):
+        valid &= ~np.isnat(keys)
+    unique, inverse = np.unique(keys[valid], return_inverse=True)
+    sums = np.bincount(inverse, weights=values[valid], minlength=len(unique))
+    counts = np.bincount(inverse, minlength=len(unique))
+    return unique, sums, counts
+
+
+class History():
+    """
+    Columns shared by the histories (transactions of accounts, operations of virtual cards) : a date, an amount and a counterparty per row
+    The rows are stored in numpy arrays, so the aggregations are vectorized
+    """
+    COLUMNS = ("dates", "amounts", "counterpartyCodes", "labels")
+
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray, counterpartyCodes: np.ndarray, counterparties: np.ndarray, labels: np.ndarray):
+        self.dates = dates
+        self.amounts = amounts
+        self.counterpartyCodes = counterpartyCodes
+        self.counterparties = counterparties
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def select(self, mask: np.ndarray) -> "History":
+        """
+        :param mask: A boolean array (or an array of indexes) selecting the rows
+        :type mask: numpy.ndarray
+        :return: A history with the selected rows only
+        :rtype: History
+        """
+        obj = self.__class__.__new__(self.__class__)
+        obj.__dict__.update(self.__dict__)
+        for column in self.COLUMNS:
+            setattr(obj, column, getattr(self, column)[mask])
+        return obj
+
+    def between(self, start: datetime.date = None, end: datetime.date = None) -> "History":
+        """
+        :return: The rows made between start and end (both included)
+        :rtype: History
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.dates >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= self.dates <= np.datetime64(end, "D")
+        return self.select(mask)
+
+    def debits(self) -> "History":
+        return self.select(self.amounts < 0)
+
+    def credits(self) -> "History":
+        return self.select(self.amounts > 0)
+
+    def sumByPeriod(self, period: str = "month") -> tuple:
+        """
+        :param period: "day", "week", "month" or "year"
+        :type period: str
+        :return: The (first days of the periods, sums of the amounts, numbers of rows), sorted by period
+        :rtype: tuple
+        """
+        return groupSum(toPeriods(self.dates, period), self.amounts)
+
+    def sumByCounterparty(self, top: int = None) -> tuple:
+        """
+        :param top: If given, only the top counterparties (by absolute sum) are returned
+        :type top: int
+        :return: The (counterparties, sums of the amounts, numbers of rows), sorted by decreasing absolute sum
+        :rtype: tuple
+        """
+        codes, sums, counts = groupSum(self.counterpartyCodes, self.amounts)
+        order = np.argsort(-np.abs(sums), kind="stable")[:top]
+        return self.counterparties[codes[order]], sums[order], counts[order]
+
+    def rollingSum(self, days: int = 30) -> tuple:
+        """
+        Sum of the amounts over a sliding window, for each day from the first to the last date of the history
+
+        :param days: The length of the window in days
+        :type days: int
+        :return: The (days, sums of the amounts of the window ending on each day)
+        :rtype: tuple
+        """
+        if days < 1:
+            raise ValueError("The window must be at least 1 day long")
+        valid = ~np.isnat(self.dates) & ~np.isnan(self.amounts)
+        if not valid.any():
+            return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.float64)
+        dates = self.dates[valid]
+        first = dates.min()
+        offsets = (dates - first).astype(np.int64)
+        daily = np.bincount(offsets, weights=self.amounts[valid])
+        cumulative = np.cumsum(daily)
+        window = cumulative.copy()
+        window[days:] -= cumulative[:-days]
+        return first + np.arange(len(daily)).astype("timedelta64[D]"), window
+
+
+class TransactionTable(History):
+    COLUMNS = History.COLUMNS + ("accountCodes",)
+
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray, counterpartyCodes: np.ndarray, counterparties: np.ndarray, labels: np.ndarray,
+                 accountCodes: np.ndarray, accountIds: np.ndarray):
+        """
+        The transactions of one or several accounts as numpy columns (use fromTransactions or fromAccounts to create it)
+
+        :param accountCodes: The index in accountIds of the account of each transaction
+        :type accountCodes: numpy.ndarray
+        :param accountIds: The ids of the accounts
+        :type accountIds: numpy.ndarray
+        """
+        super().__init__(dates, amounts, counterpartyCodes, counterparties, labels)
+        self.accountCodes = accountCodes
+        self.accountIds = accountIds
+
+    @classmethod
+    def fromAccounts(cls, histories: dict) -> "TransactionTable":
+        """
+        :param histories: The transactions of each account : {accountId: transactions} (the transactions can be dictionnaries or models, see Aumax.getTransactions, Aumax.iterTransactions or AumaxStore.getTransactions)
+        :type histories: dict
+        :return: The table of all the transactions
+        :rtype: TransactionTable
+        """
+        dates, amounts, labels, accounts = [], [], [], []
+        for accountId, transactions in histories.items():
+            for transaction in transactions:
+                transaction = toDict(transaction)
+                dates.append(firstValue(transaction, DATE_KEYS))
+                amounts.append(firstValue(transaction, AMOUNT_KEYS))
+                labels.append(firstValue(transaction, LABEL_KEYS) or "")
+                accounts.append(str(accountId))
+        counterpartyCodes, counterparties = encode([counterparty(label) for label in labels])
+        accountCodes, accountIds = encode(accounts)
+        return cls(parseDays(dates), parseAmounts(amounts), counterpartyCodes, counterparties, np.array(labels, dtype=object),
+                   accountCodes, accountIds)
+
+    @classmethod
+    def fromTransactions(cls, transactions, accountId: str = "") -> "TransactionTable":
+        """
+        :param transactions: The transactions of an account (a list, an iterator, or the response of Aumax.getTransactions)
+        :param accountId: The id of the account
+        :type accountId: str
+        :return: The table of the transactions
+        :rtype: TransactionTable
+        """
+        if isinstance(transactions, dict):
+            transactions = transactions.get("transactions", [])
+        return cls.fromAccounts({accountId: transactions})
+
+    def account(self, accountId: str) -> "TransactionTable":
+        """
+        :return: The transactions of one account
+        :rtype: TransactionTable
+        """
+        index = np.searchsorted(self.accountIds, accountId)
+        if index >= len(self.accountIds) or self.accountIds[index] != accountId:
+            return self.select(np.zeros(len(self), dtype=bool))
+        return self.select(self.accountCodes == index)
+
+    def sumByAccount(self) -> tuple:
+        """
+        :return: The (account ids, sums of the amounts, numbers of transactions)
+        :rtype: tuple
+        """
+        codes, sums, counts = groupSum(self.accountCodes, self.amounts)
+        return self.accountIds[codes], sums, counts
+
+    def runningBalance(self, currentBalances: dict) -> tuple:
+        """
+        Compute the balance of the account after each transaction, going back from the current balances
+
+        :param currentBalances: The current balance of each account : {accountId: balance} (the "solde" of Aumax.getAccouts), the accounts that are not given start at 0
+        :type currentBalances: dict
+        :return: The (order, balances) : order are the indexes of the transactions sorted by account then date, balances[i] is the balance after the transaction order[i]
+        :rtype: tuple
+        """
+        amounts = np.nan_to_num(self.amounts)
+        # NaT dates are sorted first, as the oldest transactions
+        order = np.lexsort((self.dates.astype(np.int64), self.accountCodes))
+        accounts = self.accountCodes[order]
+        cumulative = np.cumsum(amounts[order])
+        # Total of the transactions of each account, to start the cumulative sum at 0 for each account
+        totals = np.bincount(accounts, weights=amounts[order], minlength=len(self.accountIds))
+        ends = np.cumsum(totals)
+        current = np.array([parseAmount(currentBalances.get(accountId, 0)) or 0 for accountId in self.accountIds], dtype=np.float64)
+        # balance after a transaction = current balance - sum of the transactions made after it
+        balances = current[accounts] - (ends[accounts] - cumulative)
+        return order, balances
+
+
+class CardTable(History):
+    COLUMNS = History.COLUMNS + ("cardCodes",)
+
+    def __init__(self, dates: np.ndarray, amounts: np.ndarray, counterpartyCodes: np.ndarray, counterparties: np.ndarray, labels: np.ndarray,
+                 cardCodes: np.ndarray, cards: dict):
+        """
+        The virtual credit cards and their operations as numpy columns (use fromCards to create it)
+        The rows of the history are the operations, the columns of the cards are in the cards attribute
+
+        :param cardCodes: The index in cards["num"] of the card of each operation
+        :type cardCodes: numpy.ndarray
+        :param cards: The columns of the cards : num, mntSaisi, mntRestant, duree, dateCreation, dateEch
+        :type cards: dict
+        """
+        super().__init__(dates, amounts, counterpartyCodes, counterparties, labels)
+        self.cardCodes = cardCodes
+        self.cards = cards
+
+    @classmethod
+    def fromCards(cls, virtualCards: list, operations: dict = None) -> "CardTable":
+        """
+        :param virtualCards: The virtual cards (see Aumax.getVirtualCards or AumaxStore.getVirtualCards)
+        :type virtualCards: list
+        :param operations: The operations of each card : {cardNum: operations} (see Aumax.getVirtualCardOperations)
+        :type operations: dict
+        :return: The table of the cards and their operations
+        :rtype: CardTable
+        """
+        virtualCards = [toDict(card) for card in virtualCards]
+        nums = np.array([str(card.get("num")) for card in virtualCards], dtype=str)
+        expiries = [parseExpiry(card.get("dateEch")) for card in virtualCards]
+        cards = {
+            "num": nums,
+            "mntSaisi": parseAmounts([card.get("mntSaisi") for card in virtualCards]),
+            "mntRestant": parseAmounts([card.get("mntRestant") for card in virtualCards]),
+            "duree": np.array([card.get("duree") or 0 for card in virtualCards], dtype=np.int32),
+            "dateCreation": parseDays([card.get("dateCreation") for card in virtualCards]),
+            "dateEch": np.array([expiry if expiry is not None else "NaT" for expiry in expiries], dtype="datetime64[D]"),
+        }
+
+        index = {num: i for i, num in enumerate(nums)}
+        dates, amounts, labels, names, cardCodes = [], [], [], [], []
+        for cardNum, cardOperations in (operations or {}).items():
+            if str(cardNum) not in index:
+                continue
+            for operation in cardOperations:
+                operation = toDict(operation)
+                dates.append(firstValue(operation, DATE_KEYS))
+                amounts.append(firstValue(operation, AMOUNT_KEYS))
+                label = firstValue(operation, LABEL_KEYS) or ""
+                labels.append(label)
+                names.append(str(firstValue(operation, MERCHANT_KEYS) or "").upper() or counterparty(label))
+                cardCodes.append(index[str(cardNum)])
+        counterpartyCodes, counterparties = encode(names)
+        return cls(parseDays(dates), parseAmounts(amounts), counterpartyCodes, counterparties, np.array(labels, dtype=object),
+                   np.array(cardCodes, dtype=np.int32), cards)
+
+    def utilization(self) -> np.ndarray:
+        """
+        :return: The part of the amount of each card that was spent (1 - mntRestant / mntSaisi), NaN if the amount of the card is 0, in the order of cards["num"]
+        :rtype: numpy.ndarray
+        """
+        amounts = self.cards["mntSaisi"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(amounts > 0, 1 - self.cards["mntRestant"] / amounts, np.nan)
+
+    def spendByCard(self) -> tuple:
+        """
+        :return: The (card numbers, sums of the amounts of the operations, numbers of operations), in the order of cards["num"] (the cards without operations are included)
+        :rtype: tuple
+        """
+        amounts = np.nan_to_num(self.amounts)
+        count = len(self.cards["num"])
+        return self.cards["num"], np.bincount(self.cardCodes, weights=amounts, minlength=count), np.bincount(self.cardCodes, minlength=count)
+
+    def activeCards(self, on: datetime.date = None) -> np.ndarray:
+        """
+        :param on: The date, today if None
+        :type on: datetime.date
+        :return: A boolean array telling if each card is not expired and still has money on it, in the order of cards["num"]
+        :rtype: numpy.ndarray
+        """
+        day = np.datetime64(on if on is not None else datetime.date.today(), "D")
+        expiries = self.cards["dateEch"]
+        return (np.isnat(expiries) | (expiries >= day)) & (self.cards["mntRestant"] > 0)
@@ -0,0 +1,218 @@
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from Aumax import Aumax
+from AumaxServer import AumaxServer
+from AumaxStore import AumaxStore
+from transport import RequestsTransport, HttpxTransport
+from cassette import ReplayTransport
+
+EMAIL = "user@example.com"
+PASSWORD = "password"
+SEED_DEVICE = "xfu3rbzqb47njp5y"
+MCODE = "012345"
+DEVICE_SERIAL_NUMBER = "38aa48613fd1536f"
+
+
+def runServer(queue: multiprocessing.Queue, options: dict) -> None:
+    """
+    Run an AumaxServer in its own process (so it does not compete with the client for the GIL), its url is put in the queue
+    """
+    server = AumaxServer(**options)
+    server.addUser(EMAIL, PASSWORD, SEED_DEVICE, MCODE, DEVICE_SERIAL_NUMBER)
+    queue.put(server.url)
+    server.serveForever()
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def measure(name: str, function, iterations: int, concurrency: int) -> dict:
+    """
+    Call a function several times and measure it
+
+    :param name: The name of the benchmark
+    :type name: str
+    :param function: The function to measure (called without arguments)
+    :type function: function
+    :param iterations: The number of calls
+    :type iterations: int
+    :param concurrency: The number of calls made at the same time
+    :type concurrency: int
+    :return: The results : p50 and p99 latency in milliseconds, throughput in calls per second, peak memory in KiB and number of errors
+    :rtype: dict
+    """
+    def call() -> float:
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+    # Warm up (connections opened, caches filled...), its errors are counted below
+    try:
+        function()
+    except Exception:
+        pass
+
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(call) for _ in range(iterations)]:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows the code down, so the memory is measured on a separate call
+    tracemalloc.start()
+    try:
+        function()
+    except Exception:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "errors": errors,
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mean": statistics.mean(latencies) * 1000 if latencies else 0,
+        "throughput": len(latencies) / elapsed if elapsed else 0,
+        "peakMemory": peak / 1024,
+    }
+
+
+def dashboard(api: Aumax) -> None:
+    """
+    The sequence of requests of example.py
+    """
+    api.getUserInfo()
+    api.getCards()
+    api.getMaxCard()
+    accountId = api.getAccouts()["tiles"][0]["account"]["id"]
+    api.getTransactions(accountId, 10)
+    virtualCards = api.getVirtualCards()
+    api.getVirtualCardOperations(virtualCards[0]["num"])
+
+
+def sync(api: Aumax) -> None:
+    # A new store each time, so the whole history is fetched
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        store = AumaxStore(path)
+        store.sync(api)
+        store.close()
+    finally:
+        os.remove(path)
+
+
+def getBenchmarks(api: Aumax, transactionCount: int) -> dict:
+    accountId = api.getAccouts()["tiles"][0]["account"]["id"]
+    cardNum = api.getVirtualCards()[0]["num"]
+    return {
+        "userInfo": api.getUserInfo,
+        "cards": api.getCards,
+        "maxCard": api.getMaxCard,
+        "accounts": api.getAccouts,
+        "transactions": lambda: api.getTransactions(accountId, 10),
+        "transactionsAll": lambda: api.getTransactions(accountId, transactionCount),
+        "virtualCards": api.getVirtualCards,
+        "virtualCardOperations": lambda: api.getVirtualCardOperations(cardNum),
+        "enrollmentStatus": api.getEnrollmentStatus,
+        "serverTime": api.getServerTimeForOTP,
+        "connect": api.connect,
+        "flow:dashboard": lambda: dashboard(api),
+        "flow:snapshot": lambda: api.getSnapshot(transactionCount=10),
+        "flow:iterTransactions": lambda: sum(1 for _ in api.iterTransactions(accountId)),
+        "flow:sync": lambda: sync(api),
+        "flow:generateVirtualCard": lambda: api.generateVirtualCard(1, 1.0),
+    }
+
+
+def printResults(results: list) -> None:
+    print(f"{'benchmark':<28}{'p50 (ms)':>10}{'p99 (ms)':>10}{'req/s':>10}{'peak KiB':>10}{'errors':>8}")
+    for result in results:
+        print(f"{result['name']:<28}{result['p50']:>10.2f}{result['p99']:>10.2f}{result['throughput']:>10.1f}"
+              f"{result['peakMemory']:>10.1f}{result['errors']:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Aumax client against the local stand-in server (AumaxServer.py)")
+    parser.add_argument("--url", help="Url of an already running server (see AumaxServer.py), a new one is started if not given")
+    parser.add_argument("--iterations", type=int, default=100, help="Number of calls of each benchmark")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of calls made at the same time")
+    parser.add_argument("--latency", type=float, default=0, help="Latency of the server in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0, help="Random latency added by the server in seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="Probability of a 503 error on the server")
+    parser.add_argument("--transactions", type=int, default=500, help="Number of transactions of each account")
+    parser.add_argument("--virtual-cards", type=int, default=10, help="Number of virtual cards")
+    parser.add_argument("--operations", type=int, default=20, help="Number of operations of each virtual card")
+    parser.add_argument("--transport", choices=["requests", "httpx"], default="requests", help="HTTP transport of the client (see transport.py)")
+    parser.add_argument("--pool-size", type=int, default=10, help="Maximum number of connections of the transport")
+    parser.add_argument("--only", nargs="*", help="Names of the benchmarks to run (all by default)")
+    parser.add_argument("--json", help="Write the results in this JSON file (to compare two runs)")
+    parser.add_argument("--record", help="Record the traffic in this cassette (see cassette.py)")
+    parser.add_argument("--replay", help="Replay the traffic of this cassette instead of using a server (only the recorded requests succeed)")
+    parser.add_argument("--realtime", action="store_true", help="Replay the responses with their recorded latencies")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.replay:
+        url = url or "http://replay"
+    elif url is None:
+        queue = multiprocessing.Queue()
+        options = {"latency": args.latency, "latencyJitter": args.latency_jitter, "errorRate": args.error_rate,
+                   "transactionCount": args.transactions, "virtualCardCount": args.virtual_cards,
+                   "operationsPerCard": args.operations, "maxCardsPerDay": 10 ** 9}
+        process = multiprocessing.Process(target=runServer, args=(queue, options), daemon=True)
+        process.start()
+        url = queue.get(timeout=30)
+
+    try:
+        if args.replay:
+            transport = ReplayTransport(args.replay, realtime=args.realtime)
+        elif args.transport == "httpx":
+            transport = HttpxTransport(maxConnections=args.pool_size, maxKeepAliveConnections=args.pool_size)
+        else:
+            transport = RequestsTransport(poolSize=args.pool_size)
+        api = Aumax(EMAIL, PASSWORD, baseUrl=url, transport=transport)
+        if args.record:
+            api.enableRecording(args.record)
+        if not api.connect():
+            raise SystemExit(f"Unable to connect to {url}")
+        api.enableSensibleOperations("", "OnePlus", "ONEPLUS A6013", DEVICE_SERIAL_NUMBER, "", SEED_DEVICE, MCODE)
+
+        results = []
+        for name, function in getBenchmarks(api, args.transactions).items():
+            if args.only and name not in args.only:
+                continue
+            results.append(measure(name, function, args.iterations, args.concurrency))
+        printResults(results)
+        api.disableRecording()
+
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump({"url": url, "args": vars(args), "results": results}, file, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
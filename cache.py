@@ -0,0 +1,145 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from consts import DEFAULT_CACHE_TTLS
+
+
+class CacheEntry():
+    __slots__ = ("value", "expires", "etag", "lastModified")
+
+    def __init__(self, value, expires: float, etag: str = None, lastModified: str = None):
+        self.value = value
+        self.expires = expires
+        self.etag = etag
+        self.lastModified = lastModified
+
+
+class ResponseCache():
+
+    def __init__(self, ttls: dict = None, maxEntries: int = 128):
+        """
+        A LRU cache of the responses of the read-only endpoints, with a TTL (Time To Live) per endpoint
+        The responses are kept per url (the same endpoint can be requested with different parameters)
+
+        :param ttls: The TTL in seconds of each endpoint (see DEFAULT_CACHE_TTLS in consts.py), endpoints that are not in it are not cached
+        :type ttls: dict
+        :param maxEntries: The maximum number of responses kept in the cache, the least recently used ones are removed first
+        :type maxEntries: int
+        """
+        self.__ttls = {**DEFAULT_CACHE_TTLS, **(ttls or {})}
+        self.__maxEntries = maxEntries
+        self.__entries = OrderedDict()  # (endpoint, url) -> CacheEntry
+        # Incremented by invalidate : a response requested before an invalidation is not put in the cache (it may be older than the change)
+        self.__generation = 0
+        self.__generations = {}  # endpoint -> generation
+        self.__lock = threading.Lock()
+
+    def isCached(self, endpoint: str) -> bool:
+        """
+        :param endpoint: The name of the endpoint, example : "virtualCards"
+        :type endpoint: str
+        :return: True if the responses of this endpoint are cached
+        :rtype: bool
+        """
+        return self.__ttls.get(endpoint, 0) > 0
+
+    def generation(self, endpoint: str) -> tuple:
+        """
+        :param endpoint: The name of the endpoint
+        :type endpoint: str
+        :return: The generation of the endpoint, to give to put (read it before sending the request)
+        :rtype: tuple
+        """
+        with self.__lock:
+            return self.__generation, self.__generations.get(endpoint, 0)
+
+    def get(self, endpoint: str, url: str) -> CacheEntry:
+        """
+        :param endpoint: The name of the endpoint
+        :type endpoint: str
+        :param url: The url of the request
+        :type url: str
+        :return: The entry of the last response of the url (that can be expired), None if it is not in the cache
+        :rtype: CacheEntry
+        """
+        key = (endpoint, url)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                self.__entries.move_to_end(key)
+            return entry
+
+    def getValue(self, entry: CacheEntry):
+        """
+        :return: A copy of the cached value (so the caller can modify it without modifying the cache)
+        """
+        return copy.deepcopy(entry.value)
+
+    def isFresh(self, entry: CacheEntry) -> bool:
+        return entry is not None and entry.expires > time.monotonic()
+
+    def put(self, endpoint: str, url: str, value, headers: dict = None, generation: tuple = None) -> bool:
+        """
+        Add (or replace) the response of a url in the cache
+
+        :param endpoint: The name of the endpoint
+        :type endpoint: str
+        :param url: The url of the request
+        :type url: str
+        :param value: The decoded JSON of the response
+        :type value: dict or list
+        :param headers: The headers of the response, used to revalidate the response with ETag / Last-Modified once it expires
+        :type headers: dict
+        :param generation: The generation of the endpoint read before sending the request (see generation), the response is not cached if the endpoint was invalidated since
+        :type generation: tuple
+        :return: True if the response was put in the cache
+        :rtype: bool
+        """
+        headers = headers or {}
+        entry = CacheEntry(copy.deepcopy(value), time.monotonic() + self.__ttls[endpoint],
+                           headers.get("ETag"), headers.get("Last-Modified"))
+        key = (endpoint, url)
+        with self.__lock:
+            if generation is not None and generation != (self.__generation, self.__generations.get(endpoint, 0)):
+                return False
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__maxEntries:
+                self.__entries.popitem(last=False)
+            return True
+
+    def refresh(self, endpoint: str, url: str) -> None:
+        """
+        Extend the lifetime of the response of a url (when the server answered "304 Not Modified")
+        """
+        with self.__lock:
+            entry = self.__entries.get((endpoint, url))
+            if entry is not None:
+                entry.expires = time.monotonic() + self.__ttls[endpoint]
+
+    def validationHeaders(self, entry: CacheEntry) -> dict:
+        """
+        :return: The headers to send to revalidate an expired entry (empty if the server did not send an ETag or a Last-Modified header)
+        :rtype: dict
+        """
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.lastModified:
+            headers["If-Modified-Since"] = entry.lastModified
+        return headers
+
+    def invalidate(self, endpoint: str = None) -> None:
+        """
+        Remove the responses of an endpoint from the cache (all the responses if endpoint is None)
+        The responses requested before are not put in the cache when they arrive
+        """
+        with self.__lock:
+            if endpoint is None:
+                self.__generation += 1
+                self.__entries.clear()
+            else:
+                self.__generations[endpoint] = self.__generations.get(endpoint, 0) + 1
+                for key in [key for key in self.__entries if key[0] == endpoint]:
+                    del self.__entries[key]
@@ -0,0 +1,392 @@
+import base64
+import functools
+import gzip
+import threading
+import time
+from urllib.parse import urlsplit, urlencode, parse_qsl
+from requests.structures import CaseInsensitiveDict
+from codec import loads, dumps
+from exceptions import CassetteMissError
+from transport import Transport
+from utils import decodeJWT
+
+REDACTED = "<redacted>"
+# Fields whose value is replaced, wherever they are in the bodies and in the JWT : the credentials, the tokens and the one time passwords,
+# the email ("sub" in the JWT), the serial number of the device, and the CVV and the expiry date of the cards
+# (the mCode and the seedDevice are never sent, only the digests and the TOTP computed with them. The seeds of the operations are kept :
+# they are only used once, and a replayed card creation needs one to compute its TOTP)
+REDACTED_FIELDS = {"username", "password", "email", "sub", "accessCode", "oauthToken", "totp", "digest", "serialNumber", "deviceSerialNumber",
+                   "crypto", "dateEch"}
+# Fields containing the number of a card : it is replaced with a pseudonym, also used in the urls of the card, so its requests can still be replayed
+CARD_NUMBER_FIELDS = {"num"}
+# Path segment followed by the number of a card in the urls
+CARD_PATH = "virtualcard"
+# Headers containing tokens or cookies
+REDACTED_HEADERS = {"authentication", "authorization", "cookie", "set-cookie"}
+# The response of a recorded request is decoded, so these headers do not apply to the recorded body
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# Expiry of the JWT of a cassette, so a replayed connection is never considered expired (2100-01-01)
+REPLAY_TOKEN_EXPIRY = 4102444800
+
+
+def requestKey(method: str, url: str, params: dict = None) -> tuple:
+    """
+    :return: The key used to find the response of a request in a cassette : the method, the path and the sorted query string
+        (the host is ignored, so a cassette recorded against the API can be replayed with any baseUrl)
+    :rtype: tuple
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(str(key), str(value)) for key, value in params.items()]
+    return method.upper(), parts.path + ("?" + urlencode(sorted(query)) if query else "")
+
+
+def base64Json(data: dict) -> str:
+    return base64.b64encode(dumps(data).encode('utf-8')).decode('utf-8').rstrip("=")
+
+
+class Redactor():
+
+    def __init__(self, fields=()):
+        """
+        Remove the secrets from the recorded requests and responses : the values of the redacted fields of the JSON documents and of the forms,
+        and the values of the redacted headers (the strings are never searched for secrets, so the rest of the documents is recorded as received)
+        The account ids and numbers are kept : they are not enough to pay, and the requests of an account can not be replayed without them
+
+        :param fields: The names of other fields to redact
+        :type fields: iterable
+        """
+        self.__fields = REDACTED_FIELDS | set(fields)
+        self.__lock = threading.Lock()
+        self.__cardNumbers = {}  # card number -> pseudonym
+
+    def cardNumber(self, number) -> str:
+        """
+        :return: The pseudonym of a card number : the cards are numbered in the order they are found, and the last 4 digits are kept (like on a receipt)
+        :rtype: str
+        """
+        number = str(number)
+        with self.__lock:
+            if number not in self.__cardNumbers:
+                index = str(len(self.__cardNumbers) + 1)
+                self.__cardNumbers[number] = index.zfill(max(len(number) - 4, len(index))) + number[-4:]
+            return self.__cardNumbers[number]
+
+    def requestKey(self, method: str, url: str, params: dict = None) -> tuple:
+        """
+        :return: The key of a request (see requestKey), with the card number of its path replaced with its pseudonym
+        :rtype: tuple
+        """
+        method, path = requestKey(method, url, params)
+        path, separator, query = path.partition("?")
+        parts = path.split("/")
+        for index in range(1, len(parts)):
+            if parts[index - 1] == CARD_PATH and parts[index]:
+                parts[index] = self.cardNumber(parts[index])
+        return method, "/".join(parts) + separator + query
+
+    def field(self, key: str, value):
+        if key in self.__fields:
+            return REDACTED
+        if key in CARD_NUMBER_FIELDS and isinstance(value, (str, int)):
+            return self.cardNumber(value)
+        return self.value(value)
+
+    def value(self, value):
+        """
+        Redact a decoded JSON document (the document stays valid)
+        """
+        if isinstance(value, dict):
+            return {key: self.field(key, item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.value(item) for item in value]
+        return value
+
+    def body(self, body) -> str:
+        """
+        :param body: A body (bytes, a string, or a dictionnary sent as a form)
+        :return: The redacted body : a string, or {"base64": ...} if it is not text (a text that is neither JSON nor a form is kept as is)
+        """
+        if body is None:
+            return None
+        if isinstance(body, dict):
+            return urlencode({key: self.field(key, str(value)) for key, value in body.items()})
+        if isinstance(body, bytes):
+            try:
+                body = body.decode('utf-8')
+            except UnicodeDecodeError:
+                return {"base64": base64.b64encode(body).decode('ascii')}
+        try:
+            document = loads(body)
+        except ValueError:
+            if "=" in body and " " not in body:
+                # A form
+                return urlencode([(key, self.field(key, value)) for key, value in parse_qsl(body, keep_blank_values=True)])
+            return body
+        return dumps(self.value(document))
+
+    def jwt(self, token: str) -> str:
+        """
+        Replace a JWT with an unsigned one containing the redacted data, so a replayed connection still finds the data it needs (efs, si, exp...)
+        """
+        try:
+            data = decodeJWT(token)
+        except ValueError:
+            return REDACTED
+        header = {key: data.pop(key) for key in ("alg", "typ") if key in data}
+        payload = self.value(data)
+        if "exp" in payload:
+            payload["exp"] = REPLAY_TOKEN_EXPIRY
+        return ".".join([base64Json({**header, "alg": "none"}), base64Json(payload), ""])
+
+    def headers(self, headers, response: bool = False) -> dict:
+        redacted = {}
+        for key, value in (headers or {}).items():
+            lower = key.lower()
+            if response and lower in DROPPED_HEADERS:
+                continue
+            if lower in REDACTED_HEADERS:
+                if response and lower == "authentication":
+                    value = self.jwt(value)
+                else:
+                    value = f"Bearer {REDACTED}" if value.startswith("Bearer ") else REDACTED
+            redacted[key] = value
+        return redacted
+
+
+class RecordedStream():
+
+    def __init__(self, response, record):
+        """
+        A streamed response whose chunks are kept while they are read, to record its body once it is completely read or closed
+
+        :param response: The streamed response
+        :param record: The function recording the body (bytes)
+        :type record: function
+        """
+        self.__response = response
+        self.__record = record
+        self.__chunks = []
+        self.__iterator = None
+        self.__recorded = False
+
+    def iter_content(self, chunk_size: int = 1):
+        self.__iterator = iter(self.__response.iter_content(chunk_size))
+        for chunk in self.__iterator:
+            self.__chunks.append(chunk)
+            yield chunk
+        self.__finish()
+
+    @property
+    def content(self) -> bytes:
+        if self.__iterator is None and not self.__recorded:
+            self.__chunks.append(self.__response.content)
+            self.__finish()
+        return self.__response.content
+
+    @property
+    def text(self) -> str:
+        self.content
+        return self.__response.text
+
+    def json(self):
+        self.content
+        return self.__response.json()
+
+    def __finish(self) -> None:
+        if not self.__recorded:
+            self.__recorded = True
+            self.__record(b"".join(self.__chunks))
+
+    def close(self) -> None:
+        try:
+            if not self.__recorded and self.__iterator is not None:
+                # The reader stopped before the end : the rest is read, a truncated JSON document could not be redacted
+                self.__chunks.extend(self.__iterator)
+            self.__finish()
+        finally:
+            self.__response.close()
+
+    def __enter__(self) -> "RecordedStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self.__response, name)
+
+
+class RecordingTransport(Transport):
+
+    def __init__(self, transport: Transport, path: str, fields=()):
+        """
+        Send the requests with another transport and record them in a cassette (a gzipped JSON Lines file), to replay them with ReplayTransport
+        The values of the fields of REDACTED_FIELDS and of the headers of REDACTED_HEADERS are replaced with "<redacted>", the card numbers with pseudonyms
+        (the JWT is replaced with an unsigned one without the access code, that never expires)
+        A streamed response is recorded once it is completely read or closed (its recorded latency is the time to receive its headers)
+
+        :param transport: The transport sending the requests
+        :type transport: Transport
+        :param path: The path of the cassette (the requests are appended if it exists)
+        :type path: str
+        :param fields: The names of other fields to redact
+        :type fields: iterable
+        """
+        self.__transport = transport
+        self.transientErrors = transport.transientErrors
+        self.__redactor = Redactor(fields)
+        self.__lock = threading.Lock()
+        self.__file = gzip.open(path, "at", encoding="utf-8")
+        self.__start = time.monotonic()
+
+    @property
+    def transport(self) -> Transport:
+        return self.__transport
+
+    def request(self, method: str, url: str, headers: dict = None, data=None, params: dict = None, timeout=None, stream: bool = False):
+        start = time.monotonic()
+        r = self.__transport.request(method, url, headers=headers, data=data, params=params, timeout=timeout, stream=stream)
+        latency = time.monotonic() - start
+        record = functools.partial(self.__record, self.__redactor.requestKey(method, url, params), start, latency, headers, data, r)
+        if stream:
+            # The chunks are recorded while the caller reads them, the body is not read here
+            return RecordedStream(r, record)
+        record(r.content)
+        return r
+
+    def __record(self, key: tuple, start: float, latency: float, headers: dict, data, r, content: bytes) -> None:
+        redactor = self.__redactor
+        entry = {
+            "key": key,
+            "offset": round(start - self.__start, 6),
+            "latency": round(latency, 6),
+            "request": {"headers": redactor.headers(headers), "body": redactor.body(data)},
+            "headers": redactor.headers(r.headers, response=True),
+            "status": r.status_code,
+            "body": redactor.body(content),
+        }
+        line = dumps(entry) + "\n"
+        with self.__lock:
+            if not self.__file.closed:
+                self.__file.write(line)
+
+    def connectionCount(self) -> int:
+        return self.__transport.connectionCount()
+
+    def stop(self) -> None:
+        """
+        Close the cassette, without closing the transport sending the requests
+        """
+        with self.__lock:
+            self.__file.close()
+
+    def close(self) -> None:
+        self.stop()
+        self.__transport.close()
+
+
+class CassetteRequest():
+    __slots__ = ("body",)
+
+    def __init__(self, body):
+        self.body = body
+
+
+class CassetteResponse():
+
+    def __init__(self, status: int, headers: dict, content: bytes, requestBody=None):
+        """
+        A recorded response, used like a requests.Response
+        """
+        self.status_code = status
+        self.headers = CaseInsensitiveDict(headers)
+        self.headers["Content-Length"] = str(len(content))
+        self.content = content
+        self.request = CassetteRequest(requestBody)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1):
+        chunk_size = chunk_size or len(self.content) or 1
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "CassetteResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return f"<Response [{self.status_code}]>"
+
+
+class ReplayTransport(Transport):
+
+    def __init__(self, path: str, realtime: bool = False, speed: float = 1):
+        """
+        Answer the requests with the responses recorded in a cassette by RecordingTransport, without any network access
+        A request is matched by its method, path and query string : the responses recorded for it are returned in order, then the last one again
+
+        :param path: The path of the cassette
+        :type path: str
+        :param realtime: If True, each response is returned after its recorded latency (divided by speed), otherwise as fast as possible
+        :type realtime: bool
+        :param speed: The factor applied to the recorded latencies when realtime is True (2 replays twice as fast)
+        :type speed: float
+        """
+        self.__realtime = realtime
+        self.__speed = speed
+        self.__lock = threading.Lock()
+        self.__entries = {}  # key -> recorded responses
+        self.__served = {}  # key -> number of responses served
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    entry = loads(line)
+                    self.__entries.setdefault(tuple(entry["key"]), []).append(entry)
+
+    def keys(self) -> list:
+        """
+        :return: The (method, path) of the recorded requests
+        :rtype: list
+        """
+        return list(self.__entries)
+
+    def request(self, method: str, url: str, headers: dict = None, data=None, params: dict = None, timeout=None, stream: bool = False) -> CassetteResponse:
+        key = requestKey(method, url, params)
+        entries = self.__entries.get(key)
+        if not entries:
+            raise CassetteMissError(method, url)
+        with self.__lock:
+            index = self.__served.get(key, 0)
+            self.__served[key] = index + 1
+        entry = entries[min(index, len(entries) - 1)]
+
+        if self.__realtime and entry["latency"] > 0:
+            time.sleep(entry["latency"] / self.__speed)
+        body = entry["body"]
+        if body is None:
+            content = b""
+        elif isinstance(body, dict):
+            content = base64.b64decode(body["base64"])
+        else:
+            content = body.encode('utf-8')
+        return CassetteResponse(entry["status"], entry["headers"], content, data)
+
+    def rewind(self) -> None:
+        """
+        Serve the recorded responses from the first one again
+        """
+        with self.__lock:
+            self.__served.clear()
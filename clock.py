@@ -0,0 +1,101 @@
+import datetime
+import threading
+import time
+
+# Duration in seconds of a TOTP time step
+TOTP_PERIOD = 30
+
+
+class ServerClock():
+
+    def __init__(self, getServerTime, samples: int = 5, recalibrationInterval: float = 3600):
+        """
+        Estimate the offset between the local clock and the clock of the Aumax server, to generate TOTPs with the time of the server
+
+        :param getServerTime: A function returning the time of the server as a naive UTC datetime (Aumax.getServerTimeForOTP)
+        :type getServerTime: function
+        :param samples: The number of requests sent to estimate the offset
+        :type samples: int
+        :param recalibrationInterval: The number of seconds after which the offset is estimated again
+        :type recalibrationInterval: float
+        """
+        self.__getServerTime = getServerTime
+        self.__samples = samples
+        self.__recalibrationInterval = recalibrationInterval
+        self.__offset = None
+        self.__rtt = None
+        self.__calibratedAt = None
+        self.__lock = threading.Lock()
+
+    def calibrate(self) -> None:
+        """
+        Estimate the offset and the RTT (Round Trip Time) using several requests
+        The "Date" header of the server has a resolution of one second, so each sample gives an interval containing the offset :
+        the samples are spread over one second and their intervals are intersected
+        """
+        lower, upper, rtts = [], [], []
+        for i in range(self.__samples):
+            if i > 0:
+                time.sleep(1 / self.__samples)
+            before = time.time()
+            serverTime = self.__getServerTime().replace(tzinfo=datetime.timezone.utc).timestamp()
+            after = time.time()
+            # The server time was in [serverTime, serverTime + 1[ at some point between before and after
+            lower.append(serverTime - after)
+            upper.append(serverTime + 1 - before)
+            rtts.append(after - before)
+
+        low, up = max(lower), min(upper)
+        if low > up:
+            # The samples are not consistent (the local clock jumped for example), we use the mean of the intervals
+            low, up = sum(lower) / len(lower), sum(upper) / len(upper)
+
+        with self.__lock:
+            self.__offset = (low + up) / 2
+            self.__rtt = sorted(rtts)[len(rtts) // 2]
+            self.__calibratedAt = time.monotonic()
+
+    def __ensureCalibrated(self) -> None:
+        if self.__calibratedAt is None or time.monotonic() - self.__calibratedAt > self.__recalibrationInterval:
+            self.calibrate()
+
+    def getOffset(self) -> float:
+        """
+        :return: The number of seconds to add to the local time to get the time of the server
+        :rtype: float
+        """
+        self.__ensureCalibrated()
+        return self.__offset
+
+    def getRTT(self) -> float:
+        """
+        :return: The median Round Trip Time of the calibration requests, in seconds
+        :rtype: float
+        """
+        self.__ensureCalibrated()
+        return self.__rtt
+
+    def time(self) -> float:
+        """
+        :return: The current time of the server in seconds since epoch
+        :rtype: float
+        """
+        return time.time() + self.getOffset()
+
+    def waitForSafeStep(self, guard: float = 2) -> float:
+        """
+        Wait for the next TOTP time step if the current one ends in less than guard seconds (plus the time needed for the request to reach the server)
+
+        :param guard: The minimum number of seconds the TOTP must still be valid when it reaches the server
+        :type guard: float
+        :return: The time of the server to use to generate the TOTP
+        :rtype: float
+        """
+        now = self.time()
+        # The app generates the TOTP with the time one second in advance (see getTOTPTimeStep)
+        remaining = TOTP_PERIOD - ((now + 1) % TOTP_PERIOD)
+        if remaining < guard + self.getRTT() / 2:
+            # We wait a little more to be sure to be in the next time step
+            time.sleep(remaining + 0.05)
+            now = self.time()
+        return now
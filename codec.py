@@ -0,0 +1,177 @@
+import codecs
+import json
+
+# orjson is much faster than the json module of the standard library, it is used if it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+WHITESPACES = " \t\n\r"
+
+
+def loads(data):
+    """
+    Decode a JSON document (with orjson if it is installed, with the json module otherwise)
+
+    :param data: The JSON document
+    :type data: bytes or str
+    :return: The decoded document
+    :rtype: dict or list
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> str:
+    """
+    Encode an object in JSON (with orjson if it is installed, with the json module otherwise)
+
+    :param obj: The object to encode
+    :type obj: dict or list
+    :return: The JSON document
+    :rtype: str
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+
+class JsonArrayParser():
+
+    def __init__(self, chunks, keys: tuple = None):
+        """
+        Decode the elements of a JSON array one by one while the document is received, so the whole document is never kept in memory
+        The array is either the document itself, or the value of one of the keys of the document (if it is an object)
+
+        :param chunks: An iterator of the chunks of the document (requests.Response.iter_content for example)
+        :type chunks: iterator
+        :param keys: The keys whose value is the array, if None the first array found in the document is used
+        :type keys: tuple
+        """
+        self.__chunks = iter(chunks)
+        self.__keys = keys
+        self.__decoder = codecs.getincrementaldecoder('utf-8')()
+        self.__jsonDecoder = json.JSONDecoder()
+        self.__buffer = ""
+        self.__pos = 0
+        self.__exhausted = False
+
+    def __read(self) -> bool:
+        """
+        Read the next chunk of the document
+
+        :return: False if the document was entirely read
+        :rtype: bool
+        """
+        if self.__exhausted:
+            return False
+        for chunk in self.__chunks:
+            if not chunk:
+                continue
+            text = self.__decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            # We drop what was already parsed
+            self.__buffer = self.__buffer[self.__pos:] + text
+            self.__pos = 0
+            return True
+        self.__buffer = self.__buffer[self.__pos:] + self.__decoder.decode(b"", final=True)
+        self.__pos = 0
+        self.__exhausted = True
+        return False
+
+    def __findArray(self) -> bool:
+        """
+        Move to the first element of the array
+
+        :return: False if there is no array in the document
+        :rtype: bool
+        """
+        depth = 0
+        inString = escape = False
+        key = []
+        lastKey = None
+        previous = None  # Last character outside of a string that is not a whitespace
+        while True:
+            if self.__pos >= len(self.__buffer):
+                if not self.__read():
+                    return False
+                continue
+            char = self.__buffer[self.__pos]
+            self.__pos += 1
+            if inString:
+                if escape:
+                    escape = False
+                elif char == "\\":
+                    escape = True
+                elif char == '"':
+                    inString = False
+                    if depth == 1:
+                        lastKey = "".join(key)
+                    continue
+                if depth == 1:
+                    key.append(char)
+                continue
+            if char in WHITESPACES:
+                continue
+            if char == '"':
+                inString = True
+                key = []
+            elif char == "[":
+                if depth == 0 or (depth == 1 and previous == ":" and (self.__keys is None or lastKey in self.__keys)):
+                    return True
+                depth += 1
+            elif char == "{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+            previous = char
+
+    def __iter__(self):
+        if not self.__findArray():
+            return
+        while True:
+            # We skip the whitespaces and the commas between the elements
+            while True:
+                if self.__pos >= len(self.__buffer):
+                    if not self.__read():
+                        raise ValueError("Unexpected end of the JSON document")
+                    continue
+                if self.__buffer[self.__pos] in WHITESPACES or self.__buffer[self.__pos] == ",":
+                    self.__pos += 1
+                    continue
+                break
+            if self.__buffer[self.__pos] == "]":
+                return
+            try:
+                element, end = self.__jsonDecoder.raw_decode(self.__buffer, self.__pos)
+            except json.JSONDecodeError:
+                # The element is not entirely received yet
+                if not self.__read():
+                    raise
+                continue
+            # The element must be followed by a "," or a "]", otherwise it could be cut ("12" of "125" or "1." of "1.5")
+            after = end
+            while after < len(self.__buffer) and self.__buffer[after] in WHITESPACES:
+                after += 1
+            if after == len(self.__buffer) or self.__buffer[after] not in ",]":
+                if self.__exhausted:
+                    raise ValueError("Invalid JSON array")
+                self.__read()
+                continue
+            self.__pos = end
+            yield element
+
+
+def iterJsonArray(chunks, keys: tuple = None):
+    """
+    Iterate over the elements of a JSON array while the document is received (see JsonArrayParser)
+
+    :param chunks: An iterator of the chunks of the document (requests.Response.iter_content for example)
+    :type chunks: iterator
+    :param keys: The keys whose value is the array, if None the first array found in the document is used
+    :type keys: tuple
+    :return: A generator of the elements of the array
+    :rtype: generator
+    """
+    return iter(JsonArrayParser(chunks, keys))
@@ -8,3 +8,60 @@ CLIENT_SECRET = "u9fpIZGaUiG5SXY0"
 BASIC_AUTH_KEY = "aEdNWHVDSlhaWEFwUURmSTNaQXlzUlVFVUE4S3JOMWM6elkzQjd6aGtoQzJ5TFM1RA=="
 
 VERSION = "v1/"
+
+# TTL in seconds of the responses of the read-only endpoints when the cache is enabled (see Aumax.enableCache)
+DEFAULT_CACHE_TTLS = {
+    "userInfo": 3600,
+    "cards": 600,
+    "maxCard": 600,
+    "accounts": 60,
+    "virtualCards": 60,
+}
+
+# Number of seconds before the expiry of the token at which a request refreshes it before being sent
+TOKEN_EXPIRY_MARGIN = 5
+
+# Number of seconds before the background refresh tries again after a failed connection (doubled at each failure up to the maximum),
+# see Aumax.enableAutoRefresh
+REFRESH_RETRY_DELAY = 5
+REFRESH_RETRY_MAX_DELAY = 5 * 60
+
+# Maximum number of virtual credit cards that can be created per day
+MAX_VIRTUAL_CARDS_PER_DAY = 11
+
+# (connect, read) timeouts in seconds of the requests, see Aumax.configureResilience
+DEFAULT_TIMEOUT = (3.05, 15)
+DEFAULT_TIMEOUTS = {
+    "token": (3.05, 20),
+    "transactions": (3.05, 30),
+    "virtualCardOperations": (3.05, 30),
+    "createVirtualCard": (3.05, 30),
+}
+
+# Size in bytes of the chunks read when a response is decoded while it is received
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Upper bounds in seconds of the buckets of the latency histograms, see metrics.py
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Number of iterations of PBKDF2 deriving the keys of the session files, see Aumax.saveSession
+SESSION_KDF_ITERATIONS = 100000
+
+# Maximum number of connections kept open to the API by a transport, see transport.py
+DEFAULT_POOL_SIZE = 10
+
+# Minimum and maximum number of seconds between two polls of the same target, and the factor applied to the interval
+# after a poll without changes, see watcher.py
+WATCH_MIN_INTERVAL = 15
+WATCH_MAX_INTERVAL = 15 * 60
+WATCH_BACKOFF = 2
+
+# Number of rows written at once by an export, and maximum number of chunks waiting to be written, see export.py
+EXPORT_CHUNK_SIZE = 500
+EXPORT_BUFFER_SIZE = 8
+
+# Requests per second allowed for an account, number of requests that can be sent at once, and maximum number of seconds
+# a request waits for the quota, see quota.py
+QUOTA_REQUESTS_PER_SECOND = 5
+QUOTA_BURST = 10
+QUOTA_MAX_WAIT = 10
@@ -0,0 +1,333 @@
+import argparse
+import datetime
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+
+# This module is also used by the thin client : Aumax (and requests) are only imported by the daemon, when it starts
+
+# Methods of Aumax that can be called through the daemon
+EXPOSED_METHODS = {
+    "getUserInfo", "getCards", "getMaxCard", "getAccouts", "getTransactions", "iterTransactions", "getVirtualCards",
+    "getVirtualCardOperations", "iterVirtualCardOperations", "getEnrollmentStatus", "getServerTimeForOTP", "getTokenExpiry",
+    "generateVirtualCard", "generateVirtualCards", "countVirtualCardsCreatedToday", "clearCache", "calibrateClock", "isConnected",
+    "getSnapshot", "getRemainingQuota",
+}
+
+
+def defaultSocketPath() -> str:
+    """
+    :return: The path of the socket used when none is given (one per user)
+    :rtype: str
+    """
+    return os.path.join(tempfile.gettempdir(), f"aumax-{os.getuid()}.sock")
+
+
+def encodeResult(value):
+    """
+    Make the result of a method JSON serializable (dates, models, generators)
+    """
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, "toDict"):
+        return value.toDict()
+    if hasattr(value, "__iter__") and not isinstance(value, (str, bytes, dict)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class AumaxDaemonHandler(socketserver.StreamRequestHandler):
+    """
+    Handle a client : each line it sends is a JSON request, each line sent back is the JSON response
+    """
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {"error": {"type": "InvalidRequest", "message": str(e)}}
+            else:
+                response = self.server.daemon.handleRequest(request)
+            self.wfile.write(json.dumps(response, default=encodeResult).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+
+class AumaxDaemon():
+
+    def __init__(self, config: dict, socketPath: str = None):
+        """
+        A long-lived process keeping connected Aumax accounts (and their HTTP connections) and answering the requests of AumaxClient over a Unix socket
+
+        :param config: The accounts and options, example :
+            {"accounts": {"main": {"email": "...", "password": "...", "sensibleOperations": {"deviceName": "...", ..., "mCode": "..."}}},
+             "baseUrl": "https://api.aumax.fr", "maxConnections": 10, "cache": true, "sessionDirectory": "~/.aumax", "transport": "httpx",
+             "quota": {"path": "...", "requestsPerSecond": 5, "burst": 10}}
+            ("transport" is "requests" by default, "httpx" uses HttpxTransport with HTTP/2, "quota" gives the parameters of a QuotaManager shared with the other processes)
+        :type config: dict
+        :param socketPath: The path of the Unix socket, see defaultSocketPath if None
+        :type socketPath: str
+        """
+        from AumaxPool import AumaxPool
+        from consts import BASE_URL
+
+        self.__socketPath = socketPath if socketPath is not None else defaultSocketPath()
+        transport = None
+        if config.get("transport") == "httpx":
+            from transport import HttpxTransport
+            transport = HttpxTransport(maxConnections=config.get("maxConnections", 10), maxKeepAliveConnections=config.get("maxConnections", 10))
+        self.__pool = AumaxPool(maxConnections=config.get("maxConnections", 10), baseUrl=config.get("baseUrl", BASE_URL), transport=transport)
+        quota = None
+        if config.get("quota") is not None:
+            from quota import QuotaManager
+            quota = QuotaManager(**config["quota"])
+        self.__defaultAccount = None
+        for name, account in config["accounts"].items():
+            api = self.__pool.addAccount(name, account["email"], account["password"])
+            if account.get("sensibleOperations"):
+                api.enableSensibleOperations(**account["sensibleOperations"])
+            if config.get("cache"):
+                api.enableCache()
+            if quota is not None:
+                api.enableQuota(quota)
+            if config.get("sessionDirectory"):
+                # A restarted daemon does not need to connect again (and an account without a saved session connects on first use)
+                directory = os.path.expanduser(config["sessionDirectory"])
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+                api.resumeSession(os.path.join(directory, f"{name}.session"), connect=False)
+            if self.__defaultAccount is None:
+                self.__defaultAccount = name
+        self.__server = None
+
+    def handleRequest(self, request: dict) -> dict:
+        """
+        :param request: A request : {"id": 1, "account": "main", "method": "getTransactions", "args": [...], "kwargs": {...}},
+            {"id": 2, "batch": [request, ...]} (the requests are run in order), {"command": "ping" | "accounts" | "shutdown"}
+        :type request: dict
+        :return: The response : {"id": 1, "result": ...} or {"id": 1, "error": {"type": ..., "message": ...}}
+        :rtype: dict
+        """
+        response = {"id": request.get("id")}
+        try:
+            if "batch" in request:
+                response["result"] = [self.handleRequest(item) for item in request["batch"]]
+            elif "command" in request:
+                response["result"] = self.__command(request["command"])
+            else:
+                response["result"] = self.__call(request)
+        except Exception as e:
+            response["error"] = {"type": type(e).__name__, "message": str(e)}
+        return response
+
+    def __command(self, command: str):
+        if command == "ping":
+            return "pong"
+        if command == "accounts":
+            return self.__pool.names()
+        if command == "shutdown":
+            # shutdown waits for serve_forever to return, it can not be called from the thread of a request
+            threading.Thread(target=self.stop, daemon=True).start()
+            return True
+        raise ValueError(f"Unknown command {command}")
+
+    def __call(self, request: dict):
+        method = request.get("method")
+        if method not in EXPOSED_METHODS:
+            raise ValueError(f"Unknown method {method}")
+        account = request.get("account") or self.__defaultAccount
+        result = getattr(self.__pool[account], method)(*request.get("args", []), **request.get("kwargs", {}))
+        # Generators must be consumed while the account is used
+        return encodeResult(result) if hasattr(result, "__next__") else result
+
+    def __removeStaleSocket(self) -> None:
+        """
+        Remove the socket left by a daemon that did not stop properly
+
+        :raises FileExistsError: If the path is not a socket, or if a daemon is listening on it
+        """
+        try:
+            mode = os.stat(self.__socketPath).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(f"{self.__socketPath} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.__socketPath)
+        except ConnectionRefusedError:
+            # Nobody listens on it anymore
+            os.remove(self.__socketPath)
+            return
+        finally:
+            probe.close()
+        raise FileExistsError(f"A daemon is already listening on {self.__socketPath}")
+
+    def serveForever(self) -> None:
+        """
+        :raises FileExistsError: If another daemon is already listening on the socket
+        """
+        self.__removeStaleSocket()
+        # Only the current user can connect to the socket
+        umask = os.umask(0o077)
+        try:
+            self.__server = socketserver.ThreadingUnixStreamServer(self.__socketPath, AumaxDaemonHandler)
+        finally:
+            os.umask(umask)
+        self.__server.daemon_threads = True
+        self.__server.daemon = self
+        try:
+            self.__server.serve_forever()
+        finally:
+            self.__server.server_close()
+            self.__pool.close()
+            if os.path.exists(self.__socketPath):
+                os.remove(self.__socketPath)
+
+    def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.shutdown()
+
+
+class AumaxDaemonError(Exception):
+    """
+    Exception raised by AumaxClient when the daemon returns an error
+    """
+
+    def __init__(self, errorType: str, message: str) -> None:
+        """
+        :param errorType: The name of the exception raised in the daemon
+        :param message: The message of the exception
+        """
+        self.type = errorType
+        super().__init__(f"{errorType}: {message}")
+
+
+class AumaxClient():
+
+    def __init__(self, socketPath: str = None, timeout: float = 60):
+        """
+        A thin client of AumaxDaemon (it does not import Aumax nor requests, so it starts quickly)
+
+        :param socketPath: The path of the Unix socket of the daemon, see defaultSocketPath if None
+        :type socketPath: str
+        :param timeout: The maximum time in seconds to wait for a response
+        :type timeout: float
+        """
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.settimeout(timeout)
+        self.__socket.connect(socketPath if socketPath is not None else defaultSocketPath())
+        self.__file = self.__socket.makefile("rb")
+        self.__nextId = 0
+
+    def __send(self, request: dict):
+        self.__nextId += 1
+        request["id"] = self.__nextId
+        self.__socket.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        line = self.__file.readline()
+        if not line:
+            raise ConnectionResetError("The daemon closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise AumaxDaemonError(response["error"]["type"], response["error"]["message"])
+        return response["result"]
+
+    def call(self, method: str, *args, account: str = None, **kwargs):
+        """
+        Call a method of an account of the daemon, example : client.call("getTransactions", accountId, 10, account="main")
+
+        :param method: The name of the method of Aumax (see EXPOSED_METHODS)
+        :type method: str
+        :param account: The name of the account in the configuration of the daemon, the first one if None
+        :type account: str
+        :return: The result of the method
+        """
+        return self.__send({"account": account, "method": method, "args": list(args), "kwargs": kwargs})
+
+    def batch(self, calls: list) -> list:
+        """
+        Run several calls in one round trip
+
+        :param calls: The calls : [{"method": "getAccouts"}, {"method": "getTransactions", "args": [accountId, 10], "account": "main"}, ...]
+        :type calls: list
+        :return: The responses, in the same order : [{"result": ...} or {"error": {"type": ..., "message": ...}}, ...]
+        :rtype: list
+        """
+        return self.__send({"batch": calls})
+
+    def ping(self) -> bool:
+        return self.__send({"command": "ping"}) == "pong"
+
+    def accounts(self) -> list:
+        return self.__send({"command": "accounts"})
+
+    def shutdown(self) -> None:
+        self.__send({"command": "shutdown"})
+
+    def close(self) -> None:
+        self.__file.close()
+        self.__socket.close()
+
+    def __enter__(self) -> "AumaxClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="aumax", description="Run a daemon keeping Aumax accounts connected, or query it")
+    parser.add_argument("--socket", help="Path of the Unix socket of the daemon")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the daemon")
+    serve.add_argument("config", help="JSON file of the accounts (see AumaxDaemon)")
+
+    call = commands.add_parser("call", help="Call a method, example : aumax call getTransactions '\"123\"' 10")
+    call.add_argument("method")
+    call.add_argument("args", nargs="*", help="Arguments of the method, in JSON")
+    call.add_argument("--account", help="Name of the account (the first one of the configuration by default)")
+
+    batch = commands.add_parser("batch", help="Run the calls of a JSON list read on the standard input")
+    batch.add_argument("--account", help="Account of the calls that do not give one")
+
+    commands.add_parser("ping", help="Check that the daemon is running")
+    commands.add_parser("accounts", help="List the accounts of the daemon")
+    commands.add_parser("shutdown", help="Stop the daemon")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        with open(args.config) as file:
+            config = json.load(file)
+        AumaxDaemon(config, args.socket).serveForever()
+        return
+
+    try:
+        client = AumaxClient(args.socket)
+    except OSError as e:
+        sys.exit(f"Unable to connect to the daemon : {e}")
+    with client:
+        try:
+            if args.command == "call":
+                result = client.call(args.method, *(json.loads(arg) for arg in args.args), account=args.account)
+            elif args.command == "batch":
+                calls = json.load(sys.stdin)
+                for item in calls:
+                    item.setdefault("account", args.account)
+                result = client.batch(calls)
+            else:
+                result = getattr(client, args.command)()
+        except AumaxDaemonError as e:
+            sys.exit(str(e))
+    if result is not None:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,3 +15,76 @@ class SensibleOperationsDisabledError(Exception):
 
     def __init__(self) -> None:
         super().__init__("Please first enable sensible operations using the 'enableSensibleOperations' method / Merci d'activer les operations sensibles d'abord en utilisant la méthode 'enableSensibleOperations'")
+
+
+class ClockCalibrationDisabledError(Exception):
+    """
+    Exception raised when the clock is calibrated while the clock calibration is disabled
+    """
+
+    def __init__(self) -> None:
+        super().__init__("Please first enable the clock calibration using the 'enableClockCalibration' method / Merci d'activer la calibration de l'horloge d'abord en utilisant la méthode 'enableClockCalibration'")
+
+
+class CircuitOpenError(Exception):
+    """
+    Exception raised when too many requests to the Aumax API failed in a row : requests are not sent until the API is considered available again
+    """
+
+    def __init__(self, retryAfter: float) -> None:
+        self.retryAfter = retryAfter
+        super().__init__(f"The Aumax API seems to be unavailable, retry in {retryAfter:.0f} seconds / L'API Aumax semble indisponible, réessayez dans {retryAfter:.0f} secondes")
+
+
+class SessionFileError(Exception):
+    """
+    Exception raised when a saved session can not be read (corrupted or modified file, or wrong passphrase)
+    """
+
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+        super().__init__(f"The session file can not be read ({reason}) / Le fichier de session ne peut pas être lu ({reason})")
+
+
+class QuotaExceededError(Exception):
+    """
+    Exception raised when a request or a virtual card would exceed the quota shared by the processes using the account (see QuotaManager)
+    """
+
+    NAMES = {"requests": ("requests", "requêtes"), "cards": ("virtual cards", "cartes virtuelles")}
+
+    def __init__(self, kind: str, retryAfter: float) -> None:
+        """
+        :param kind: "requests" (rate of the requests) or "cards" (virtual cards created per day)
+        :param retryAfter: The number of seconds after which the quota is available again
+        """
+        self.kind = kind
+        self.retryAfter = retryAfter
+        english, french = self.NAMES.get(kind, (kind, kind))
+        super().__init__(f"The quota of {english} is exceeded, retry in {retryAfter:.0f} seconds / Le quota de {french} est dépassé, réessayez dans {retryAfter:.0f} secondes")
+
+
+class CassetteMissError(Exception):
+    """
+    Exception raised by ReplayTransport when a request was not recorded in the cassette
+    """
+
+    def __init__(self, method: str, url: str) -> None:
+        self.method = method
+        self.url = url
+        super().__init__(f"No response recorded for {method} {url} / Aucune réponse enregistrée pour {method} {url}")
+
+
+class ResponseError(Exception):
+    """
+    Exception raised when the Aumax API answers with an error where data was expected (see the strict parameter of the getters, and the iter methods)
+    """
+
+    def __init__(self, statusCode: int, body: str = "") -> None:
+        """
+        :param statusCode: The status code of the response
+        :param body: The body of the response (the error sent by the API)
+        """
+        self.statusCode = statusCode
+        self.body = body
+        super().__init__(f"The Aumax API answered with an error ({statusCode}) : {body} / L'API Aumax a répondu par une erreur ({statusCode}) : {body}")
@@ -0,0 +1,347 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from Aumax import Aumax
+from codec import dumps
+from consts import BASE_URL, EXPORT_CHUNK_SIZE, EXPORT_BUFFER_SIZE
+from models import parseAmount, toDict
+from utils import extractItems
+
+# pyarrow is only needed to export to Parquet
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ("jsonl", "csv", "parquet")
+STATE_FILE = "export-state.json"
+
+
+# The columns of the CSV and Parquet files of each kind of file : "amount" columns are parsed as floats, the others are written as text
+# (the keys of a row that are not columns are kept in JSON in the "extra" column, the columns missing from a row are empty)
+COLUMNS = {
+    "accounts": {"id": "text", "libelle": "text", "numero": "text", "solde": "amount", "devise": "text"},
+    "virtualCards": {"num": "text", "dateCreation": "text", "duree": "text", "dateEch": "text", "mntSaisi": "amount",
+                     "mntRestant": "amount", "crypto": "text", "devise": "text"},
+    "transactions": {"accountId": "text", "id": "text", "date": "text", "montant": "amount", "libelle": "text", "type": "text"},
+    "virtualCardOperations": {"cardNum": "text", "id": "text", "date": "text", "montant": "amount", "libelle": "text", "commercant": "text"},
+}
+EXTRA_COLUMN = "extra"
+
+
+def tabulate(row: dict, columns: dict) -> dict:
+    """
+    Give a row the columns of its file
+
+    :param row: The row, as sent by the API
+    :type row: dict
+    :param columns: The columns of the file (see COLUMNS)
+    :type columns: dict
+    :return: The value of each column, and the other keys of the row encoded in JSON in the extra column (None if there are none)
+    :rtype: dict
+    :raises ValueError: If the value of an amount column is not an amount
+    """
+    table = {}
+    for column, kind in columns.items():
+        value = row.get(column)
+        if value is None or value == "":
+            table[column] = None
+        elif kind == "amount":
+            table[column] = parseAmount(value)
+            if table[column] is None:
+                raise ValueError(f"Invalid amount in the column {column} : {value!r}")
+        else:
+            table[column] = dumps(value) if isinstance(value, (dict, list)) else str(value)
+    extra = {key: value for key, value in row.items() if key not in columns}
+    table[EXTRA_COLUMN] = dumps(extra) if extra else None
+    return table
+
+
+class JsonlWriter():
+    extension = "jsonl"
+
+    def __init__(self, path: str, columns: dict):
+        """
+        The rows are written as sent by the API (the columns are not used)
+        """
+        self.__file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows: list) -> None:
+        self.__file.write("".join(dumps(row) + "\n" for row in rows))
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class CsvWriter():
+    extension = "csv"
+
+    def __init__(self, path: str, columns: dict):
+        """
+        The columns of the file are given (see tabulate), a key only found in some rows is kept in the extra column
+        """
+        self.__columns = columns
+        self.__file = open(path, "w", encoding="utf-8", newline="")
+        self.__writer = csv.DictWriter(self.__file, fieldnames=list(columns) + [EXTRA_COLUMN])
+        self.__writer.writeheader()
+
+    def write(self, rows: list) -> None:
+        self.__writer.writerows(tabulate(row, self.__columns) for row in rows)
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class ParquetWriter():
+    extension = "parquet"
+
+    def __init__(self, path: str, columns: dict):
+        """
+        Write a Parquet file one row group per chunk (pyarrow must be installed)
+        The schema is given by the columns (see tabulate) : the amounts are floats, the other columns are strings, so a column empty in the first chunk
+        or an amount sent as an integer does not change the schema
+        """
+        if pyarrow is None:
+            raise ImportError("The Parquet export needs pyarrow : pip install pyarrow")
+        self.__columns = columns
+        schema = [(column, pyarrow.float64() if kind == "amount" else pyarrow.string()) for column, kind in columns.items()]
+        self.__schema = pyarrow.schema(schema + [(EXTRA_COLUMN, pyarrow.string())])
+        self.__writer = pyarrow.parquet.ParquetWriter(path, self.__schema)
+
+    def write(self, rows: list) -> None:
+        self.__writer.write_table(pyarrow.Table.from_pylist([tabulate(row, self.__columns) for row in rows], schema=self.__schema))
+
+    def close(self) -> None:
+        self.__writer.close()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class Exporter():
+
+    def __init__(self, api: Aumax, directory: str, format: str = "jsonl", chunkSize: int = EXPORT_CHUNK_SIZE,
+                 bufferSize: int = EXPORT_BUFFER_SIZE, maxWorkers: int = 4, resume: bool = True):
+        """
+        Export the accounts, transactions, virtual cards and their operations to files, without keeping the history in memory :
+        the transactions and operations are decoded while they are received (see iterTransactions), grouped in chunks of chunkSize rows,
+        and written by one thread while the next ones are fetched by maxWorkers threads. At most bufferSize chunks wait to be written
+        (the threads fetching the data wait when the buffer is full), so the memory used does not depend on the size of the history.
+
+        Files written in the directory : accounts.<format>, virtualCards.<format>, transactions/<accountId>.<format> and virtualCardOperations/<cardNum>.<format>
+        The CSV and Parquet files have the columns of COLUMNS, the other keys of the rows are kept in JSON in their "extra" column
+        The files completely written are recorded in export-state.json : an interrupted export resumes with the files that were not finished
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :param directory: The directory of the files
+        :type directory: str
+        :param format: "jsonl", "csv" or "parquet" (pyarrow must be installed)
+        :type format: str
+        :param chunkSize: The number of rows written at once
+        :type chunkSize: int
+        :param bufferSize: The maximum number of chunks waiting to be written
+        :type bufferSize: int
+        :param maxWorkers: The maximum number of accounts and cards fetched at the same time
+        :type maxWorkers: int
+        :param resume: If True, the files written by a previous export in the same format are kept, otherwise all the files are written again
+        :type resume: bool
+        """
+        if format not in WRITERS:
+            raise ValueError(f"Unknown format {format}, expected one of {', '.join(FORMATS)}")
+        if format == "parquet" and pyarrow is None:
+            raise ImportError("The Parquet export needs pyarrow : pip install pyarrow")
+        self.__api = api
+        self.__directory = directory
+        self.__format = format
+        self.__writerClass = WRITERS[format]
+        self.__chunkSize = chunkSize
+        self.__bufferSize = bufferSize
+        self.__maxWorkers = maxWorkers
+        self.__statePath = os.path.join(directory, STATE_FILE)
+        self.__done = set()
+
+        os.makedirs(directory, exist_ok=True)
+        if resume:
+            state = self.__readState()
+            if state.get("format") == format:
+                self.__done = set(state.get("done", []))
+
+    def __readState(self) -> dict:
+        try:
+            with open(self.__statePath, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def __markDone(self, unit: str) -> None:
+        self.__done.add(unit)
+        temporaryPath = self.__statePath + ".tmp"
+        with open(temporaryPath, "w", encoding="utf-8") as file:
+            json.dump({"format": self.__format, "done": sorted(self.__done)}, file)
+        os.replace(temporaryPath, self.__statePath)
+
+    def __path(self, unit: str) -> str:
+        path = os.path.join(self.__directory, *unit.split("/")) + "." + self.__writerClass.extension
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def __openWriter(self, unit: str):
+        # The kind of the file is the first part of its unit ("transactions/<accountId>" -> "transactions")
+        return self.__writerClass(self.__path(unit), COLUMNS[unit.split("/")[0]])
+
+    def __writeAll(self, unit: str, rows: list) -> int:
+        if unit in self.__done:
+            return 0
+        writer = self.__openWriter(unit)
+        try:
+            for start in range(0, len(rows), self.__chunkSize):
+                writer.write(rows[start:start + self.__chunkSize])
+        finally:
+            writer.close()
+        self.__markDone(unit)
+        return len(rows)
+
+    def run(self, transactions: bool = True, virtualCardOperations: bool = True) -> dict:
+        """
+        :param transactions: If True, the transactions of the accounts are exported
+        :type transactions: bool
+        :param virtualCardOperations: If True, the operations of the virtual cards are exported
+        :type virtualCardOperations: bool
+        :return: The number of rows written in each file (the files already written by a previous export are not included)
+        :rtype: dict
+        :raises ResponseError: If the API answers with an error (the files already written are kept, the next export resumes with the others)
+        """
+        # The lists of the accounts and of the cards are small : they are fetched first, to know which files to write
+        # (strict : if the API answers with an error, the export fails instead of writing empty files recorded as done)
+        accounts = []
+        for tile in extractItems(self.__api.getAccouts(strict=True), ("tiles",)):
+            account = toDict(tile)
+            accounts.append(account.get("account", account))
+        cards = [toDict(card) for card in extractItems(self.__api.getVirtualCards(strict=True))]
+
+        counts = {"accounts": self.__writeAll("accounts", accounts), "virtualCards": self.__writeAll("virtualCards", cards)}
+        units = []
+        if transactions:
+            units += [(f"transactions/{account['id']}", self.__api.iterTransactions, account["id"], "accountId") for account in accounts]
+        if virtualCardOperations:
+            units += [(f"virtualCardOperations/{card['num']}", self.__api.iterVirtualCardOperations, card["num"], "cardNum") for card in cards]
+        units = [unit for unit in units if unit[0] not in self.__done]
+        if units:
+            counts.update(self.__stream(units))
+        return counts
+
+    def __stream(self, units: list) -> dict:
+        buffer = queue.Queue(self.__bufferSize)
+        cancelled = threading.Event()
+
+        def put(item: tuple) -> None:
+            while True:
+                if cancelled.is_set():
+                    raise ExportCancelled
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def fetch(unit: str, iterate, key: str, column: str) -> None:
+            try:
+                chunk = []
+                for row in iterate(key):
+                    row = dict(toDict(row))
+                    row[column] = key
+                    chunk.append(row)
+                    if len(chunk) >= self.__chunkSize:
+                        put((unit, chunk, None))
+                        chunk = []
+                if chunk:
+                    put((unit, chunk, None))
+                put((unit, None, None))
+            except ExportCancelled:
+                pass
+            except Exception as e:
+                try:
+                    put((unit, None, e))
+                except ExportCancelled:
+                    pass
+
+        counts = {}
+        writers = {}
+        errors = []
+        remaining = len(units)
+        executor = ThreadPoolExecutor(self.__maxWorkers)
+        try:
+            for unit in units:
+                executor.submit(fetch, *unit)
+            while remaining:
+                unit, rows, error = buffer.get()
+                if error is not None:
+                    # The file is written again by the next export
+                    remaining -= 1
+                    errors.append(error)
+                    if unit in writers:
+                        writers.pop(unit).close()
+                elif rows is None:
+                    remaining -= 1
+                    if unit in writers:
+                        writers.pop(unit).close()
+                    self.__markDone(unit)
+                    counts.setdefault(unit, 0)
+                else:
+                    if unit not in writers:
+                        writers[unit] = self.__openWriter(unit)
+                        counts[unit] = 0
+                    writers[unit].write(rows)
+                    counts[unit] += len(rows)
+        finally:
+            cancelled.set()
+            executor.shutdown(wait=True)
+            for writer in writers.values():
+                writer.close()
+
+        if errors:
+            raise errors[0]
+        return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the accounts, transactions, virtual cards and their operations to JSONL, CSV or Parquet files")
+    parser.add_argument("directory", help="Directory of the files (an interrupted export in it is resumed)")
+    parser.add_argument("--email", default=os.environ.get("AUMAX_EMAIL"), help="Email of the account (AUMAX_EMAIL by default)")
+    parser.add_argument("--password", default=os.environ.get("AUMAX_PASSWORD"), help="Password of the account (AUMAX_PASSWORD by default)")
+    parser.add_argument("--url", default=BASE_URL, help="Url of the API")
+    parser.add_argument("--session", help="Session file to resume (see Aumax.resumeSession)")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Number of rows written at once")
+    parser.add_argument("--buffer-size", type=int, default=EXPORT_BUFFER_SIZE, help="Maximum number of chunks waiting to be written")
+    parser.add_argument("--workers", type=int, default=4, help="Number of accounts and cards fetched at the same time")
+    parser.add_argument("--restart", action="store_true", help="Write all the files again instead of resuming the previous export")
+    parser.add_argument("--no-transactions", action="store_true", help="Do not export the transactions")
+    parser.add_argument("--no-operations", action="store_true", help="Do not export the operations of the virtual cards")
+    args = parser.parse_args()
+
+    if not args.email or not args.password:
+        sys.exit("The email and the password are needed (--email and --password, or AUMAX_EMAIL and AUMAX_PASSWORD)")
+    api = Aumax(args.email, args.password, baseUrl=args.url)
+    connected = api.resumeSession(args.session) if args.session else api.connect()
+    if not connected:
+        sys.exit(f"Unable to connect to {args.url}")
+
+    exporter = Exporter(api, args.directory, args.format, args.chunk_size, args.buffer_size, args.workers, resume=not args.restart)
+    counts = exporter.run(transactions=not args.no_transactions, virtualCardOperations=not args.no_operations)
+    print(f"{sum(counts.values())} rows written in {len(counts)} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import bisect
+import threading
+from consts import DEFAULT_LATENCY_BUCKETS
+
+
+class RequestEvent():
+    """
+    A request sent to the API (one event per attempt : a retried request gives several events)
+    """
+    __slots__ = ("endpoint", "method", "status", "latency", "requestBytes", "responseBytes", "attempt", "reused", "error")
+
+    def __init__(self, endpoint: str, method: str, status: int, latency: float, requestBytes: int, responseBytes: int,
+                 attempt: int, reused: bool, error: str):
+        """
+        :param endpoint: The name of the endpoint, example : "virtualCards"
+        :param method: The HTTP method
+        :param status: The status code of the response (None if no response was received)
+        :param latency: The time in seconds spent in the request (the body of a streamed response is not included)
+        :param requestBytes: The size of the body of the request
+        :param responseBytes: The size of the body of the response (its Content-Length for a streamed response, None if unknown)
+        :param attempt: 0 for the first attempt, 1 for the first retry...
+        :param reused: True if an already open connection was used, False if a new one was opened, None if unknown
+        :param error: The name of the exception raised by the request (None if a response was received)
+        """
+        self.endpoint = endpoint
+        self.method = method
+        self.status = status
+        self.latency = latency
+        self.requestBytes = requestBytes
+        self.responseBytes = responseBytes
+        self.attempt = attempt
+        self.reused = reused
+        self.error = error
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"RequestEvent({fields})"
+
+
+class EndpointStats():
+    __slots__ = ("count", "statuses", "errors", "retries", "reused", "newConnections", "latencySum", "buckets",
+                 "requestBytes", "responseBytes")
+
+    def __init__(self, bucketCount: int):
+        self.count = 0
+        self.statuses = {}
+        self.errors = {}
+        self.retries = 0
+        self.reused = 0
+        self.newConnections = 0
+        self.latencySum = 0.0
+        # Number of requests in each bucket (the last one is +Inf)
+        self.buckets = [0] * (bucketCount + 1)
+        self.requestBytes = 0
+        self.responseBytes = 0
+
+    def toDict(self, buckets: tuple) -> dict:
+        return {
+            "count": self.count,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "reusedConnections": self.reused,
+            "newConnections": self.newConnections,
+            "latencySum": self.latencySum,
+            "latencyBuckets": dict(zip(buckets + (float("inf"),), self.buckets)),
+            "requestBytes": self.requestBytes,
+            "responseBytes": self.responseBytes,
+        }
+
+
+class InMemorySink():
+
+    def __init__(self, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        """
+        Aggregate the requests per endpoint : count, status codes, errors, retries, connection reuse, latency histogram and sizes
+
+        :param buckets: The upper bounds in seconds of the buckets of the latency histogram
+        :type buckets: tuple
+        """
+        self._buckets = tuple(sorted(buckets))
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent) -> None:
+        with self._lock:
+            stats = self._endpoints.get(event.endpoint)
+            if stats is None:
+                stats = self._endpoints[event.endpoint] = EndpointStats(len(self._buckets))
+            stats.count += 1
+            if event.status is not None:
+                stats.statuses[event.status] = stats.statuses.get(event.status, 0) + 1
+            if event.error is not None:
+                stats.errors[event.error] = stats.errors.get(event.error, 0) + 1
+            if event.attempt:
+                stats.retries += 1
+            if event.reused:
+                stats.reused += 1
+            elif event.reused is not None:
+                stats.newConnections += 1
+            stats.latencySum += event.latency
+            stats.buckets[bisect.bisect_left(self._buckets, event.latency)] += 1
+            stats.requestBytes += event.requestBytes or 0
+            stats.responseBytes += event.responseBytes or 0
+
+    def snapshot(self) -> dict:
+        """
+        :return: The statistics of each endpoint, example : {"virtualCards": {"count": 3, "statuses": {200: 3}, "retries": 0, ...}}
+        (the latency buckets are not cumulative)
+        :rtype: dict
+        """
+        with self._lock:
+            return {endpoint: stats.toDict(self._buckets) for endpoint, stats in self._endpoints.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints = {}
+
+
+class PrometheusSink(InMemorySink):
+
+    def __init__(self, buckets: tuple = DEFAULT_LATENCY_BUCKETS, prefix: str = "aumax"):
+        """
+        An InMemorySink whose statistics can be exported in the Prometheus text format (see render)
+
+        :param buckets: The upper bounds in seconds of the buckets of the latency histogram
+        :type buckets: tuple
+        :param prefix: The prefix of the names of the metrics
+        :type prefix: str
+        """
+        super().__init__(buckets)
+        self.__prefix = prefix
+
+    def render(self) -> str:
+        """
+        :return: The metrics in the Prometheus text exposition format (to serve on a /metrics endpoint for example)
+        :rtype: str
+        """
+        p = self.__prefix
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {p}_requests_total Requests sent to the Aumax API, by endpoint and status code",
+            f"# TYPE {p}_requests_total counter",
+        ]
+        for endpoint, stats in snapshot.items():
+            for status, count in stats["statuses"].items():
+                lines.append(f'{p}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            for error, count in stats["errors"].items():
+                lines.append(f'{p}_requests_total{{endpoint="{endpoint}",status="error",error="{error}"}} {count}')
+
+        counters = [
+            ("retries_total", "Retries of requests", "retries"),
+            ("connections_reused_total", "Requests sent on an already open connection", "reusedConnections"),
+            ("connections_opened_total", "Requests that opened a new connection", "newConnections"),
+            ("request_bytes_total", "Size of the bodies of the requests", "requestBytes"),
+            ("response_bytes_total", "Size of the bodies of the responses", "responseBytes"),
+        ]
+        for name, description, key in counters:
+            lines.append(f"# HELP {p}_{name} {description}")
+            lines.append(f"# TYPE {p}_{name} counter")
+            for endpoint, stats in snapshot.items():
+                lines.append(f'{p}_{name}{{endpoint="{endpoint}"}} {stats[key]}')
+
+        lines.append(f"# HELP {p}_request_duration_seconds Duration of the requests")
+        lines.append(f"# TYPE {p}_request_duration_seconds histogram")
+        for endpoint, stats in snapshot.items():
+            cumulative = 0
+            for bound, count in stats["latencyBuckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{p}_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{le}"}} {cumulative}')
+            lines.append(f'{p}_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["latencySum"]}')
+            lines.append(f'{p}_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+class Metrics():
+
+    def __init__(self, sinks: list = None):
+        """
+        Send the events of the requests to sinks : an InMemorySink, a PrometheusSink, or any function taking a RequestEvent
+        It can be shared between several Aumax objects (the accounts of an AumaxPool for example)
+
+        :param sinks: The sinks, an InMemorySink is used if None
+        :type sinks: list
+        """
+        self.__sinks = list(sinks) if sinks is not None else [InMemorySink()]
+
+    def addSink(self, sink) -> None:
+        self.__sinks.append(sink)
+
+    def removeSink(self, sink) -> None:
+        self.__sinks.remove(sink)
+
+    @property
+    def sinks(self) -> list:
+        return list(self.__sinks)
+
+    def snapshot(self) -> dict:
+        """
+        :return: The snapshot of the first InMemorySink (or PrometheusSink), None if there is none
+        :rtype: dict
+        """
+        for sink in self.__sinks:
+            if isinstance(sink, InMemorySink):
+                return sink.snapshot()
+        return None
+
+    def record(self, event: RequestEvent) -> None:
+        for sink in self.__sinks:
+            sink(event)
+
+
+def bodySize(body) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return None
@@ -0,0 +1,254 @@
+import calendar
+import datetime
+import sys
+from utils import parseDate
+
+
+def parseAmount(value) -> float:
+    """
+    Parse an amount sent by the API (14.3, "14.3" or "14,30")
+
+    :param value: The amount to parse
+    :type value: float or str
+    :return: The amount, or None if it can not be parsed
+    :rtype: float
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(" ", "").replace(",", "."))
+        except ValueError:
+            return None
+    return None
+
+
+def parseDay(value) -> datetime.date:
+    date = parseDate(value)
+    return date.date() if date is not None else None
+
+
+def parseExpiry(value) -> datetime.date:
+    """
+    Parse the expiry date of a card ("09/21") into the last day of the month
+
+    :param value: The expiry date (MM/YY)
+    :type value: str
+    :return: The last day of validity of the card, or None if it can not be parsed
+    :rtype: datetime.date
+    """
+    try:
+        month, year = (int(part) for part in value.split("/"))
+        year += 2000
+        # An invalid month raises calendar.IllegalMonthError (a ValueError)
+        return datetime.date(year, month, calendar.monthrange(year, month)[1])
+    except (AttributeError, ValueError):
+        return None
+
+
+class LazyField():
+
+    def __init__(self, parser):
+        """
+        A field of a model whose raw value (as sent by the API) is parsed on first access only
+
+        :param parser: The function parsing the raw value
+        :type parser: function
+        """
+        self.__parser = parser
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.__raw = "_" + name
+        self.__cache = "_" + name + "Parsed"
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.__cache)
+        except AttributeError:
+            value = getattr(obj, self.__raw)
+            value = self.__parser(value) if value is not None else None
+            setattr(obj, self.__cache, value)
+            return value
+
+
+class Model():
+    """
+    Base class of the models : the fields are stored in __slots__ instead of a dictionnary, and the values of the fields that are not known are kept in a tuple
+    A model can still be read like the dictionnary sent by the API (model["mntSaisi"], model.get("num")), and toDict returns this dictionnary
+    """
+    __slots__ = ("_layout", "_extra")
+
+    # Name of the field -> keys that can contain it in the dictionnary sent by the API (the first one found is used)
+    FIELDS = {}
+    # Fields parsed lazily : their raw value is stored in "_" + name
+    LAZY = ()
+    # Field identifying the item, used as the hash of the model (the equal models have the same id)
+    KEY = "id"
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        # Layouts ((field, key used by the API), ..., and the keys of the unknown fields) are shared between all the models having the same keys
+        cls._layouts = {}
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "Model":
+        """
+        :param data: The dictionnary sent by the API
+        :type data: dict
+        :return: The model
+        :rtype: Model
+        """
+        obj = cls.__new__(cls)
+        layout = []
+        used = set()
+        for name, keys in cls.FIELDS.items():
+            lazy = name in cls.LAZY
+            slot = "_" + name if lazy else name
+            for key in keys:
+                if key in data:
+                    value = data[key]
+                    if lazy and isinstance(value, str):
+                        # Dates are often the same in a history, we keep only one copy of each
+                        value = sys.intern(value)
+                    setattr(obj, slot, value)
+                    layout.append((name, key))
+                    used.add(key)
+                    break
+            else:
+                setattr(obj, slot, None)
+        extraKeys = tuple(key for key in data if key not in used) if len(used) < len(data) else ()
+        layout = (tuple(layout), extraKeys)
+        obj._layout = cls._layouts.setdefault(layout, layout)
+        obj._extra = tuple(data[key] for key in extraKeys) if extraKeys else None
+        return obj
+
+    @property
+    def extra(self) -> dict:
+        """
+        :return: The fields sent by the API that are not known by the model
+        :rtype: dict
+        """
+        return dict(zip(self._layout[1], self._extra)) if self._extra else {}
+
+    def __raw(self, name: str):
+        return getattr(self, "_" + name if name in self.LAZY else name)
+
+    def toDict(self) -> dict:
+        """
+        :return: The dictionnary sent by the API
+        :rtype: dict
+        """
+        data = {key: self.__raw(name) for name, key in self._layout[0]}
+        if self._extra:
+            data.update(zip(self._layout[1], self._extra))
+        return data
+
+    def __getitem__(self, key: str):
+        fields, extraKeys = self._layout
+        for name, apiKey in fields:
+            if apiKey == key:
+                return self.__raw(name)
+        if key in extraKeys:
+            return self._extra[extraKeys.index(key)]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, _ in self._layout[0])
+        return f"{type(self).__name__}({fields})"
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.toDict() == other.toDict()
+
+    def __hash__(self) -> int:
+        # The models can be used in sets and as keys of dictionnaries : two versions of an item with the same id have the same hash, but they are only equal if all their fields are equal
+        return hash((type(self), getattr(self, self.KEY)))
+
+
+DATE_KEYS = ("date", "dateOperation", "dateComptable", "dateValeur")
+AMOUNT_KEYS = ("montant", "amount", "mnt", "value")
+LABEL_KEYS = ("libelle", "label", "wording", "description")
+
+
+class Account(Model):
+    __slots__ = ("id", "label", "number", "_balance", "_balanceParsed")
+    FIELDS = {
+        "id": ("id",),
+        "label": ("libelle", "label", "name"),
+        "number": ("numero", "number"),
+        "balance": ("solde", "balance"),
+    }
+    LAZY = ("balance",)
+    balance = LazyField(parseAmount)
+
+
+class Transaction(Model):
+    __slots__ = ("id", "label", "_date", "_dateParsed", "_amount", "_amountParsed")
+    FIELDS = {
+        "id": ("id",),
+        "label": LABEL_KEYS,
+        "date": DATE_KEYS,
+        "amount": AMOUNT_KEYS,
+    }
+    LAZY = ("date", "amount")
+    date = LazyField(parseDay)
+    amount = LazyField(parseAmount)
+
+
+class VirtualCard(Model):
+    __slots__ = ("num", "duree", "crypto", "devise",
+                 "_dateCreation", "_dateCreationParsed", "_dateEch", "_dateEchParsed",
+                 "_mntSaisi", "_mntSaisiParsed", "_mntRestant", "_mntRestantParsed")
+    FIELDS = {
+        "num": ("num",),
+        "dateCreation": ("dateCreation",),
+        "duree": ("duree",),
+        "dateEch": ("dateEch",),
+        "mntSaisi": ("mntSaisi",),
+        "mntRestant": ("mntRestant",),
+        "crypto": ("crypto",),
+        "devise": ("devise",),
+    }
+    LAZY = ("dateCreation", "dateEch", "mntSaisi", "mntRestant")
+    KEY = "num"
+    dateCreation = LazyField(parseDay)
+    dateEch = LazyField(parseExpiry)
+    mntSaisi = LazyField(parseAmount)
+    mntRestant = LazyField(parseAmount)
+
+
+class CardOperation(Model):
+    __slots__ = ("id", "label", "merchant", "_date", "_dateParsed", "_amount", "_amountParsed")
+    FIELDS = {
+        "id": ("id",),
+        "label": LABEL_KEYS,
+        "merchant": ("commercant", "merchant", "enseigne"),
+        "date": DATE_KEYS,
+        "amount": AMOUNT_KEYS,
+    }
+    LAZY = ("date", "amount")
+    date = LazyField(parseDay)
+    amount = LazyField(parseAmount)
+
+
+def toDict(item) -> dict:
+    """
+    :param item: A model or a dictionnary
+    :return: The dictionnary sent by the API
+    :rtype: dict
+    """
+    return item.toDict() if isinstance(item, Model) else item
@@ -0,0 +1,202 @@
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from consts import MAX_VIRTUAL_CARDS_PER_DAY, QUOTA_REQUESTS_PER_SECOND, QUOTA_BURST, QUOTA_MAX_WAIT
+from exceptions import QuotaExceededError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cards (
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (key, day)
+);
+"""
+
+
+def defaultQuotaPath() -> str:
+    """
+    :return: The path of the database used when none is given (one per user, so all the processes of a user share it)
+    :rtype: str
+    """
+    return os.path.join(tempfile.gettempdir(), f"aumax-quota-{os.getuid()}.db")
+
+
+def secondsUntilTomorrow() -> float:
+    tomorrow = datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time())
+    return (tomorrow - datetime.datetime.now()).total_seconds()
+
+
+class QuotaManager():
+
+    def __init__(self, path: str = None, requestsPerSecond: float = QUOTA_REQUESTS_PER_SECOND, burst: float = QUOTA_BURST,
+                 cardsPerDay: int = MAX_VIRTUAL_CARDS_PER_DAY, maxWait: float = QUOTA_MAX_WAIT):
+        """
+        Quotas of the accounts shared by all the processes of the host using the same SQLite database :
+        a token bucket limiting the requests per second, and the number of virtual cards created each day
+        Each quota is identified by a key (Aumax uses the email of the account)
+
+        :param path: The path of the database, see defaultQuotaPath if None
+        :type path: str
+        :param requestsPerSecond: The number of requests per second allowed (the rate at which the bucket is refilled)
+        :type requestsPerSecond: float
+        :param burst: The maximum number of requests sent at once (the size of the bucket)
+        :type burst: float
+        :param cardsPerDay: The maximum number of virtual cards created per day
+        :type cardsPerDay: int
+        :param maxWait: The maximum number of seconds a request waits for the quota, a QuotaExceededError is raised beyond it
+        :type maxWait: float
+        """
+        self.__path = path if path is not None else defaultQuotaPath()
+        self.__rate = requestsPerSecond
+        self.__burst = burst
+        self.__cardsPerDay = cardsPerDay
+        self.__maxWait = maxWait
+        # The connection is shared by the threads of the process, the other processes are synchronized by the locks of SQLite
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(self.__path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript(SCHEMA)
+
+    def __transaction(self, function, *args):
+        """
+        Run function in a write transaction : the other processes wait until it ends, so reading and updating a quota is atomic
+        """
+        with self.__lock:
+            self.__connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(*args)
+            except BaseException:
+                self.__connection.execute("ROLLBACK")
+                raise
+            self.__connection.execute("COMMIT")
+            return result
+
+    def __tokens(self, key: str, now: float) -> float:
+        row = self.__connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return self.__burst
+        tokens, updated = row
+        return min(self.__burst, tokens + max(now - updated, 0) * self.__rate)
+
+    def __take(self, key: str, cost: float, maxWait: float) -> float:
+        now = time.time()
+        tokens = self.__tokens(key, now)
+        wait = max(cost - tokens, 0) / self.__rate
+        if wait > maxWait:
+            raise QuotaExceededError("requests", wait)
+        # The tokens can go below 0 : the requests waiting for the quota are served in order
+        self.__connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens - cost, now))
+        return wait
+
+    def acquire(self, key: str, cost: float = 1, maxWait: float = None) -> float:
+        """
+        Take cost requests from the quota, waiting until they are available
+
+        :param key: The key of the quota
+        :type key: str
+        :param cost: The number of requests
+        :type cost: float
+        :param maxWait: The maximum number of seconds to wait (the maxWait of this object if None), a QuotaExceededError is raised if the wait would be longer
+        :type maxWait: float
+        :return: The number of seconds waited
+        :rtype: float
+        """
+        wait = self.__transaction(self.__take, key, cost, self.__maxWait if maxWait is None else maxWait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def __refund(self, key: str, cost: float) -> None:
+        now = time.time()
+        tokens = self.__tokens(key, now)
+        self.__connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, min(tokens + cost, self.__burst), now))
+
+    def refund(self, key: str, cost: float = 1) -> None:
+        """
+        Give back requests taken with acquire that were not sent (the circuit breaker was open, or the request failed before being sent)
+
+        :param key: The key of the quota
+        :type key: str
+        :param cost: The number of requests
+        :type cost: float
+        """
+        self.__transaction(self.__refund, key, cost)
+
+    def __reserveCard(self, key: str) -> int:
+        today = datetime.date.today().isoformat()
+        self.__connection.execute("DELETE FROM cards WHERE key = ? AND day < ?", (key, today))
+        row = self.__connection.execute("SELECT count FROM cards WHERE key = ? AND day = ?", (key, today)).fetchone()
+        count = row[0] if row is not None else 0
+        if count >= self.__cardsPerDay:
+            raise QuotaExceededError("cards", secondsUntilTomorrow())
+        self.__connection.execute("INSERT OR REPLACE INTO cards (key, day, count) VALUES (?, ?, ?)", (key, today, count + 1))
+        return self.__cardsPerDay - count - 1
+
+    def reserveCard(self, key: str) -> int:
+        """
+        Count a virtual card created today, or raise a QuotaExceededError if the daily limit is reached
+        (Call releaseCard if the card could not be created)
+
+        :param key: The key of the quota
+        :type key: str
+        :return: The number of cards that can still be created today
+        :rtype: int
+        """
+        return self.__transaction(self.__reserveCard, key)
+
+    def __releaseCard(self, key: str) -> None:
+        self.__connection.execute("UPDATE cards SET count = MAX(count - 1, 0) WHERE key = ? AND day = ?", (key, datetime.date.today().isoformat()))
+
+    def releaseCard(self, key: str) -> None:
+        """
+        Give back a card reserved with reserveCard that was not created
+        """
+        self.__transaction(self.__releaseCard, key)
+
+    def __syncCards(self, key: str, count: int) -> None:
+        today = datetime.date.today().isoformat()
+        self.__connection.execute("INSERT INTO cards (key, day, count) VALUES (?, ?, ?) ON CONFLICT (key, day) DO UPDATE SET count = MAX(count, excluded.count)",
+                                  (key, today, count))
+
+    def syncCards(self, key: str, count: int) -> None:
+        """
+        Take into account the cards created today by other means (another host, the application...)
+
+        :param key: The key of the quota
+        :type key: str
+        :param count: The number of cards created today according to the API (see Aumax.countVirtualCardsCreatedToday)
+        :type count: int
+        """
+        self.__transaction(self.__syncCards, key, count)
+
+    def remaining(self, key: str) -> dict:
+        """
+        Read the quota without changing it (no write transaction, so it does not wait for the other processes)
+
+        :param key: The key of the quota
+        :type key: str
+        :return: The requests that can be sent at once and the cards that can still be created today, example : {"requests": 7.5, "cards": 9}
+        :rtype: dict
+        """
+        with self.__lock:
+            tokens = self.__tokens(key, time.time())
+            row = self.__connection.execute("SELECT count FROM cards WHERE key = ? AND day = ?", (key, datetime.date.today().isoformat())).fetchone()
+        return {"requests": max(tokens, 0), "cards": max(self.__cardsPerDay - (row[0] if row is not None else 0), 0)}
+
+    def reset(self, key: str) -> None:
+        with self.__lock:
+            self.__connection.execute("DELETE FROM buckets WHERE key = ?", (key,))
+            self.__connection.execute("DELETE FROM cards WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
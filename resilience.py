@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from exceptions import CircuitOpenError
+
+
+class RetryPolicy():
+
+    def __init__(self, retries: int = 2, backoffBase: float = 0.25, backoffMax: float = 5, statuses: tuple = (500, 502, 503, 504)):
+        """
+        Define how the idempotent requests (GET) are retried when they fail (connection error, timeout, or one of the given status codes)
+
+        :param retries: The maximum number of retries of a request (0 disables the retries)
+        :type retries: int
+        :param backoffBase: The maximum delay in seconds before the first retry, it is doubled at each retry
+        :type backoffBase: float
+        :param backoffMax: The maximum delay in seconds before a retry
+        :type backoffMax: float
+        :param statuses: The HTTP status codes that are retried
+        :type statuses: tuple
+        """
+        self.retries = retries
+        self.backoffBase = backoffBase
+        self.backoffMax = backoffMax
+        self.statuses = statuses
+
+    def delay(self, attempt: int) -> float:
+        """
+        :param attempt: The number of the retry (starting at 0)
+        :type attempt: int
+        :return: A random delay in seconds before the retry (exponential backoff with "full jitter", so clients do not retry all at the same time)
+        :rtype: float
+        """
+        return random.uniform(0, min(self.backoffMax, self.backoffBase * 2 ** attempt))
+
+
+class CircuitBreaker():
+
+    def __init__(self, failureThreshold: int = 5, resetTimeout: float = 30):
+        """
+        Stop sending requests when the API fails too many times in a row, and send a single test request once resetTimeout seconds have passed
+
+        :param failureThreshold: The number of failures in a row (connection error, timeout or 5xx) after which the requests are not sent
+        :type failureThreshold: int
+        :param resetTimeout: The number of seconds after which a test request is allowed
+        :type resetTimeout: float
+        """
+        self.__failureThreshold = failureThreshold
+        self.__resetTimeout = resetTimeout
+        self.__failures = 0
+        self.__openedAt = None
+        self.__testing = False
+        self.__lock = threading.Lock()
+
+    def isOpen(self) -> bool:
+        """
+        :return: True if requests are currently not sent
+        :rtype: bool
+        """
+        return self.__openedAt is not None
+
+    def allow(self) -> bool:
+        """
+        Raise a CircuitOpenError if the request must not be sent
+
+        :return: True if the request is the one testing if the API is available again (see release)
+        :rtype: bool
+        """
+        with self.__lock:
+            if self.__openedAt is None:
+                return False
+            elapsed = time.monotonic() - self.__openedAt
+            if elapsed < self.__resetTimeout or self.__testing:
+                raise CircuitOpenError(max(self.__resetTimeout - elapsed, 0))
+            # Half open : we let one request test if the API is available again
+            self.__testing = True
+            return True
+
+    def release(self) -> None:
+        """
+        Give back the test request allowed by allow when it was not sent (or failed before getting an answer for another reason than the API) :
+        the next request tests the API instead
+        """
+        with self.__lock:
+            self.__testing = False
+
+    def recordSuccess(self) -> None:
+        with self.__lock:
+            self.__failures = 0
+            self.__openedAt = None
+            self.__testing = False
+
+    def recordFailure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            if self.__testing or self.__failures >= self.__failureThreshold:
+                self.__openedAt = time.monotonic()
+            self.__testing = False
@@ -0,0 +1,368 @@
+import datetime
+import re
+import sqlite3
+import unicodedata
+from AumaxStore import SCHEMA as STORE_SCHEMA
+from codec import loads
+from models import Transaction, CardOperation
+
+# Tables of AumaxStore that are indexed -> (code stored in the index, column of the owner of the items, model used to read the items)
+SOURCES = {
+    "transactions": (0, "accountId", Transaction),
+    "virtualCardOperations": (1, "cardNum", CardOperation),
+}
+SOURCE_NAMES = {code: name for name, (code, _, _) in SOURCES.items()}
+
+# Above this number of words starting with a word of a search, the word is searched as a range of the index instead of a list of words
+MAX_EXPANSIONS = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searchDocuments (
+    id INTEGER PRIMARY KEY,
+    source INTEGER NOT NULL,
+    itemId TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    date TEXT NOT NULL,
+    amount REAL,
+    UNIQUE (source, itemId)
+);
+-- The indexes contain all the columns of the searches, so the table itself is not read
+CREATE INDEX IF NOT EXISTS searchDocumentsDate ON searchDocuments (date, amount, source, owner);
+CREATE INDEX IF NOT EXISTS searchDocumentsAmount ON searchDocuments (amount, date, source, owner);
+CREATE INDEX IF NOT EXISTS searchDocumentsOwnerDate ON searchDocuments (source, owner, date, amount);
+CREATE TABLE IF NOT EXISTS searchPostings (
+    term TEXT NOT NULL,
+    date TEXT NOT NULL,
+    document INTEGER NOT NULL,
+    source INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    amount REAL,
+    PRIMARY KEY (term, date, document)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS searchPostingsDocument ON searchPostings (document, term);
+CREATE TABLE IF NOT EXISTS searchVocabulary (
+    term TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS searchQueue (
+    source TEXT NOT NULL,
+    itemId TEXT NOT NULL,
+    PRIMARY KEY (source, itemId)
+) WITHOUT ROWID;
+"""
+
+# The items written by AumaxStore are queued by triggers, so the index only processes what changed since its last update
+TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS search_{source}_insert AFTER INSERT ON {source} BEGIN
+    INSERT OR IGNORE INTO searchQueue (source, itemId) VALUES ('{source}', new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS search_{source}_update AFTER UPDATE ON {source} BEGIN
+    INSERT OR IGNORE INTO searchQueue (source, itemId) VALUES ('{source}', old.id);
+    INSERT OR IGNORE INTO searchQueue (source, itemId) VALUES ('{source}', new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS search_{source}_delete AFTER DELETE ON {source} BEGIN
+    INSERT OR IGNORE INTO searchQueue (source, itemId) VALUES ('{source}', old.id);
+END;
+"""
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """
+    Split a text into the terms of the index : lowercase words without accents ("Café Carrefour" -> ["cafe", "carrefour"])
+
+    :param text: The text
+    :type text: str
+    :return: The terms (each term once)
+    :rtype: list
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return list(dict.fromkeys(WORD.findall(text)))
+
+
+def isoDay(value) -> str:
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value.isoformat() if isinstance(value, datetime.date) else str(value)
+
+
+def placeholders(values: list) -> str:
+    return ", ".join("?" * len(values))
+
+
+class SearchIndex():
+
+    def __init__(self, path: str = "aumax.db"):
+        """
+        Index the transactions and the virtual card operations of an AumaxStore to search them quickly :
+        an inverted index of the words of their labels and merchants, whose postings are sorted by date and contain the amount and the account (or card) of the item,
+        so a search reads the most recent matching items first and stops at the limit, and sorted indexes of the dates, amounts and accounts (or cards) for the searches without words
+        The index is stored in the database of the store, and only the items written since the last update are indexed again (see update)
+
+        :param path: The path of the SQLite database of the AumaxStore
+        :type path: str
+        """
+        self.__db = sqlite3.connect(path)
+        self.__db.executescript(STORE_SCHEMA)
+        exists = self.__db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'searchDocuments'").fetchone() is not None
+        with self.__db:
+            self.__db.executescript(SCHEMA)
+            for source in SOURCES:
+                self.__db.executescript(TRIGGERS.format(source=source))
+            if not exists:
+                # The items stored before the index was created
+                for source in SOURCES:
+                    self.__db.execute(f"INSERT OR IGNORE INTO searchQueue (source, itemId) SELECT ?, id FROM {source}", (source,))
+
+    def close(self) -> None:
+        self.__db.close()
+
+    def __enter__(self) -> "SearchIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def pending(self) -> int:
+        """
+        :return: The number of items written in the store that are not indexed yet
+        :rtype: int
+        """
+        return self.__db.execute("SELECT COUNT(*) FROM searchQueue").fetchone()[0]
+
+    def update(self, batchSize: int = 10000) -> int:
+        """
+        Index the items added, changed or removed in the store since the last update (call it after AumaxStore.sync)
+
+        :param batchSize: The number of items indexed in each transaction
+        :type batchSize: int
+        :return: The number of items of the queue processed
+        :rtype: int
+        """
+        count = 0
+        while True:
+            with self.__db:
+                queued = self.__db.execute("SELECT source, itemId FROM searchQueue LIMIT ?", (batchSize,)).fetchall()
+                if not queued:
+                    break
+                for source, itemId in queued:
+                    if source not in SOURCES:
+                        # Queued by a trigger of a table that is not indexed anymore (created by another version) : the item is dropped from the queue
+                        continue
+                    self.__remove(source, itemId)
+                    owner = SOURCES[source][1]
+                    row = self.__db.execute(f"SELECT {owner}, date, data FROM {source} WHERE id = ?", (itemId,)).fetchone()
+                    if row is not None:
+                        self.__add(source, itemId, row[0], row[1], loads(row[2]))
+                self.__db.executemany("DELETE FROM searchQueue WHERE source = ? AND itemId = ?", queued)
+            count += len(queued)
+        if count:
+            # Statistics used by SQLite to choose the index of each query
+            self.__db.execute("PRAGMA optimize")
+        return count
+
+    def __add(self, source: str, itemId: str, owner: str, date: str, item: dict) -> None:
+        code, _, model = SOURCES[source]
+        item = model.fromDict(item)
+        text = " ".join(part for part in (item.label, getattr(item, "merchant", None)) if isinstance(part, str))
+        # The items without date are at the end of the results
+        date = date or ""
+        amount = item.amount
+        document = self.__db.execute("INSERT INTO searchDocuments (source, itemId, owner, date, amount) VALUES (?, ?, ?, ?, ?)",
+                                     (code, itemId, owner, date, amount)).lastrowid
+        terms = tokenize(text)
+        self.__db.executemany("INSERT INTO searchPostings (term, date, document, source, owner, amount) VALUES (?, ?, ?, ?, ?, ?)",
+                              ((term, date, document, code, owner, amount) for term in terms))
+        self.__db.executemany("INSERT INTO searchVocabulary (term, count) VALUES (?, 1) ON CONFLICT (term) DO UPDATE SET count = count + 1",
+                              ((term,) for term in terms))
+
+    def __remove(self, source: str, itemId: str) -> None:
+        row = self.__db.execute("SELECT id FROM searchDocuments WHERE source = ? AND itemId = ?", (SOURCES[source][0], itemId)).fetchone()
+        if row is None:
+            return
+        document = row[0]
+        terms = [term for term, in self.__db.execute("SELECT term FROM searchPostings WHERE document = ?", (document,))]
+        self.__db.executemany("UPDATE searchVocabulary SET count = count - 1 WHERE term = ?", ((term,) for term in terms))
+        self.__db.execute("DELETE FROM searchPostings WHERE document = ?", (document,))
+        self.__db.execute("DELETE FROM searchDocuments WHERE id = ?", (document,))
+
+    def __expand(self, word: str) -> tuple:
+        """
+        :return: The (terms starting with word, number of postings of these terms), the terms are None if there are too many of them
+        :rtype: tuple
+        """
+        rows = self.__db.execute("SELECT term, count FROM searchVocabulary WHERE term >= ? AND term < ? AND count > 0 LIMIT ?",
+                                 (word, word + "\uffff", MAX_EXPANSIONS + 1)).fetchall()
+        if len(rows) > MAX_EXPANSIONS:
+            return None, self.__db.execute("SELECT SUM(count) FROM searchVocabulary WHERE term >= ? AND term < ?", (word, word + "\uffff")).fetchone()[0]
+        return [term for term, _ in rows], sum(count for _, count in rows)
+
+    def search(self, text: str = None, minAmount: float = None, maxAmount: float = None, absolute: bool = False,
+               since: datetime.date = None, until: datetime.date = None, accounts: list = None, cards: list = None,
+               source: str = None, limit: int = 100, offset: int = 0) -> list:
+        """
+        Search the indexed items, from the most recent to the oldest, example : every operation of a virtual card of more than 50 EUR at Amazon in the last 6 months :
+        index.search("amazon", minAmount=50, absolute=True, since=datetime.date.today() - datetime.timedelta(days=183), source="virtualCardOperations")
+
+        :param text: The words that must all be in the label or the merchant of the items (each word matches the words starting with it, case and accents are ignored)
+        :type text: str
+        :param minAmount: The minimum amount
+        :type minAmount: float
+        :param maxAmount: The maximum amount
+        :type maxAmount: float
+        :param absolute: If True, minAmount and maxAmount apply to the absolute value of the amounts (the spendings are negative)
+        :type absolute: bool
+        :param since: The first day
+        :type since: datetime.date
+        :param until: The last day
+        :type until: datetime.date
+        :param accounts: The ids of the accounts whose transactions are searched
+        :type accounts: list
+        :param cards: The numbers of the virtual cards whose operations are searched
+        :type cards: list
+        :param source: "transactions" or "virtualCardOperations" to search only one kind of items (both by default)
+        :type source: str
+        :param limit: The maximum number of items returned
+        :type limit: int
+        :param offset: The number of items skipped (to get the next results)
+        :type offset: int
+        :return: The items : [{"source": "transactions", "owner": accountId (or cardNum), "date": "2021-03-26", "amount": -14.3, "item": {... as sent by the API}}, ...]
+        :rtype: list
+        """
+        query = self.__query(False, text, minAmount, maxAmount, absolute, since, until, accounts, cards, source)
+        if query is None:
+            return []
+        sql, parameters = query
+        rows = self.__db.execute(f"{sql} ORDER BY p.date DESC, p.document DESC LIMIT ? OFFSET ?", parameters + [limit, offset]).fetchall()
+
+        # The items are read with one query per table
+        items = {}
+        for code, name in SOURCE_NAMES.items():
+            documents = [row[0] for row in rows if row[1] == code]
+            if documents:
+                items.update(self.__db.execute(f"SELECT d.id, s.data FROM searchDocuments d JOIN {name} s ON s.id = d.itemId WHERE d.id IN ({placeholders(documents)})",
+                                               documents))
+        return [{"source": SOURCE_NAMES[code], "owner": owner, "date": date or None, "amount": amount,
+                 "item": loads(items[document]) if document in items else None} for document, code, owner, date, amount in rows]
+
+    def count(self, text: str = None, minAmount: float = None, maxAmount: float = None, absolute: bool = False,
+              since: datetime.date = None, until: datetime.date = None, accounts: list = None, cards: list = None, source: str = None) -> int:
+        """
+        :return: The number of items matching a search (see search for the parameters)
+        :rtype: int
+        """
+        query = self.__query(True, text, minAmount, maxAmount, absolute, since, until, accounts, cards, source)
+        if query is None:
+            return 0
+        sql, parameters = query
+        return self.__db.execute(sql, parameters).fetchone()[0]
+
+    def __query(self, counting: bool, text, minAmount, maxAmount, absolute, since, until, accounts, cards, source) -> tuple:
+        """
+        :param counting: If True, the query counts the documents, otherwise it selects their document, source, owner, date and amount
+        :return: The (SELECT ... FROM ... WHERE ..., parameters) of a search, the table (or the postings of the rarest word) read is named p, None if nothing can match
+        :rtype: tuple
+        """
+        words = []
+        for word in tokenize(text):
+            terms, count = self.__expand(word)
+            if not count:
+                return None
+            words.append((count, word, terms))
+        if text and not words:
+            return None
+        # The postings of the rarest word are read, the other words are checked for each of them
+        words.sort(key=lambda word: word[0])
+
+        owners = []
+        if accounts is not None:
+            owners.append((SOURCES["transactions"][0], [str(account) for account in accounts]))
+        if cards is not None:
+            owners.append((SOURCES["virtualCardOperations"][0], [str(card) for card in cards]))
+        if source is not None:
+            code = SOURCES[source][0]
+            if owners:
+                owners = [owner for owner in owners if owner[0] == code]
+                if not owners:
+                    return None
+
+        conditions = []
+        parameters = []
+        if owners:
+            ownerConditions = []
+            for code, values in owners:
+                ownerConditions.append(f"(p.source = ? AND p.owner IN ({placeholders(values)}))")
+                parameters += [code] + values
+            conditions.append("(" + " OR ".join(ownerConditions) + ")")
+        elif source is not None:
+            conditions.append("p.source = ?")
+            parameters.append(SOURCES[source][0])
+
+        if minAmount is not None or maxAmount is not None:
+            low = minAmount if minAmount is not None else float("-inf")
+            high = maxAmount if maxAmount is not None else float("inf")
+            if absolute:
+                low = max(low, 0)
+                conditions.append("(p.amount BETWEEN ? AND ? OR p.amount BETWEEN ? AND ?)")
+                parameters += [low, high, -high, -low]
+            else:
+                conditions.append("p.amount BETWEEN ? AND ?")
+                parameters += [low, high]
+        if since is not None:
+            conditions.append("p.date >= ?")
+            parameters.append(isoDay(since))
+        if until is not None:
+            conditions.append("p.date <= ? AND p.date != ''")
+            parameters.append(isoDay(until))
+
+        # A few accounts or cards can have less items than the rarest word : their items are read instead of its postings
+        driveByOwners = False
+        if words and owners:
+            ownerCount = 0
+            for code, values in owners:
+                ownerCount += self.__db.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM searchDocuments WHERE source = ? AND owner IN ({placeholders(values)}) LIMIT ?)",
+                                                [code] + values + [words[0][0]]).fetchone()[0]
+            driveByOwners = ownerCount < words[0][0]
+
+        termConditions = []
+        termParameters = []
+        # A document has one posting for each of its terms : it is read several times if it has several of the terms read
+        duplicates = False
+        if words and not driveByOwners:
+            _, word, terms = words[0]
+            duplicates = terms is None or len(terms) > 1
+            if terms is None:
+                termConditions.append("p.term >= ? AND p.term < ?")
+                termParameters += [word, word + "\uffff"]
+            elif len(terms) == 1:
+                # The postings of one term are read in the order of the dates : the search stops at the limit
+                termConditions.append("p.term = ?")
+                termParameters += terms
+            else:
+                termConditions.append(f"p.term IN ({placeholders(terms)})")
+                termParameters += terms
+            words = words[1:]
+        for _, word, terms in words:
+            if terms is None:
+                termConditions.append("EXISTS (SELECT 1 FROM searchPostings q WHERE q.document = p.document AND q.term >= ? AND q.term < ?)")
+                termParameters += [word, word + "\uffff"]
+            else:
+                termConditions.append(f"EXISTS (SELECT 1 FROM searchPostings q WHERE q.document = p.document AND q.term IN ({placeholders(terms)}))")
+                termParameters += terms
+
+        if termConditions and not driveByOwners:
+            table = "searchPostings p"
+        else:
+            # The postings are named p.document in the conditions, the documents have an id
+            table = "(SELECT id AS document, source, owner, date, amount FROM searchDocuments) p"
+        if counting:
+            columns = "COUNT(DISTINCT p.document)" if duplicates else "COUNT(*)"
+        else:
+            # The other columns are the same for all the postings of a document
+            columns = ("DISTINCT " if duplicates else "") + "p.document, p.source, p.owner, p.date, p.amount"
+        where = " AND ".join(termConditions + conditions) or "1"
+        return f"SELECT {columns} FROM {table} WHERE {where}", termParameters + parameters
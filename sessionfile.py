@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import os
+import secrets
+import threading
+from codec import loads, dumps
+from consts import SESSION_KDF_ITERATIONS
+from exceptions import SessionFileError
+
+# cryptography is only needed to save and resume sessions
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
+# Header of the session files : a magic string and the version of the format (authenticated with the encrypted state)
+FORMAT_MAGIC = b"AUMAX"
+FORMAT_VERSION = 2
+HEADER = FORMAT_MAGIC + bytes([FORMAT_VERSION])
+SALT_SIZE = 16
+NONCE_SIZE = 12
+
+
+def requireCryptography() -> None:
+    """
+    :raises ImportError: If cryptography is not installed
+    """
+    if AESGCM is None:
+        raise ImportError("The session files need cryptography : pip install cryptography")
+
+
+def deriveKey(passphrase: str, salt: bytes, iterations: int = SESSION_KDF_ITERATIONS) -> bytes:
+    """
+    Derive the AES-256 key of a session file from a passphrase (PBKDF2-HMAC-SHA256)
+
+    :return: The key
+    :rtype: bytes
+    """
+    return hashlib.pbkdf2_hmac("sha256", passphrase.encode('utf-8'), salt, iterations, dklen=32)
+
+
+class SessionKeys():
+
+    def __init__(self):
+        """
+        The keys of the session files derived by an object (see Aumax.resumeSession), so PBKDF2 runs once per passphrase and salt instead of at each read and write
+        The files written with the same passphrase reuse the salt of the last file read or written (each file still has its own random nonce)
+        """
+        self.__keys = {}  # (passphrase, salt) -> key
+        self.__salts = {}  # passphrase -> salt of the files written
+        self.__lock = threading.Lock()
+
+    def key(self, passphrase: str, salt: bytes) -> bytes:
+        """
+        :return: The key derived from the passphrase and the salt
+        :rtype: bytes
+        """
+        with self.__lock:
+            key = self.__keys.get((passphrase, salt))
+            if key is None:
+                key = self.__keys[(passphrase, salt)] = deriveKey(passphrase, salt)
+            return key
+
+    def salt(self, passphrase: str) -> bytes:
+        """
+        :return: The salt to use to write a file with the passphrase
+        :rtype: bytes
+        """
+        with self.__lock:
+            return self.__salts.setdefault(passphrase, secrets.token_bytes(SALT_SIZE))
+
+    def useSalt(self, passphrase: str, salt: bytes) -> None:
+        """
+        Write the next files with the salt of a file that was read (its key is already derived)
+        """
+        with self.__lock:
+            self.__salts[passphrase] = salt
+
+
+def encryptSession(state: dict, passphrase: str, keys: SessionKeys = None) -> bytes:
+    """
+    Encrypt the state of a session with AES-256-GCM (key derived from the passphrase), the header and the salt are authenticated with it
+
+    :param state: The state to encrypt (it must be JSON serializable)
+    :type state: dict
+    :param passphrase: The passphrase protecting the file
+    :type passphrase: str
+    :param keys: The keys already derived, if None a new salt and key are derived
+    :type keys: SessionKeys
+    :return: The content of the session file (base64)
+    :rtype: bytes
+    """
+    requireCryptography()
+    if keys is not None:
+        salt = keys.salt(passphrase)
+        key = keys.key(passphrase, salt)
+    else:
+        salt = secrets.token_bytes(SALT_SIZE)
+        key = deriveKey(passphrase, salt)
+    nonce = secrets.token_bytes(NONCE_SIZE)
+    associatedData = HEADER + salt
+    ciphertext = AESGCM(key).encrypt(nonce, dumps(state).encode('utf-8'), associatedData)
+    return base64.b64encode(associatedData + nonce + ciphertext)
+
+
+def decryptSession(content: bytes, passphrase: str, keys: SessionKeys = None) -> dict:
+    """
+    Decrypt the content of a session file
+
+    :param content: The content of the file written by encryptSession
+    :type content: bytes
+    :param passphrase: The passphrase given to encryptSession
+    :type passphrase: str
+    :param keys: The keys already derived, if None the key is derived
+    :type keys: SessionKeys
+    :return: The state of the session
+    :rtype: dict
+    :raises SessionFileError: If the file is corrupted, was modified, was written by another version, or if the passphrase is wrong
+    """
+    requireCryptography()
+    try:
+        data = base64.b64decode(content, validate=True)
+    except ValueError:
+        raise SessionFileError("invalid encoding")
+    header = len(HEADER) + SALT_SIZE
+    if not data.startswith(FORMAT_MAGIC):
+        raise SessionFileError("unknown format")
+    if not data.startswith(HEADER):
+        raise SessionFileError("unsupported version")
+    if len(data) < header + NONCE_SIZE:
+        raise SessionFileError("truncated file")
+
+    associatedData = data[:header]
+    salt = associatedData[len(HEADER):]
+    nonce = data[header:header + NONCE_SIZE]
+    key = keys.key(passphrase, salt) if keys is not None else deriveKey(passphrase, salt)
+    try:
+        plaintext = AESGCM(key).decrypt(nonce, data[header + NONCE_SIZE:], associatedData)
+    except InvalidTag:
+        raise SessionFileError("wrong passphrase or modified file")
+    if keys is not None:
+        keys.useSalt(passphrase, salt)
+    return loads(plaintext)
+
+
+def writeSessionFile(path: str, state: dict, passphrase: str, keys: SessionKeys = None) -> None:
+    """
+    Encrypt the state of a session and write it in a file only readable by the current user (the file is replaced atomically)
+    """
+    content = encryptSession(state, passphrase, keys)
+    temporaryPath = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(temporaryPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.replace(temporaryPath, path)
+    except BaseException:
+        if os.path.exists(temporaryPath):
+            os.remove(temporaryPath)
+        raise
+
+
+def readSessionFile(path: str, passphrase: str, keys: SessionKeys = None) -> dict:
+    """
+    :return: The state of the session saved in the file
+    :rtype: dict
+    :raises FileNotFoundError: If the file does not exist
+    :raises SessionFileError: If the file is corrupted, was modified, or if the passphrase is wrong
+    """
+    with open(path, "rb") as file:
+        return decryptSession(file.read(), passphrase, keys)
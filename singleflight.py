@@ -0,0 +1,61 @@
+import threading
+
+
+class Flight():
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight():
+
+    def __init__(self):
+        """
+        Coalesce identical calls made at the same time by several threads : the first one runs the call, the others wait for its result
+        """
+        self.__lock = threading.Lock()
+        self.__flights = {}
+
+    def do(self, key, function) -> tuple:
+        """
+        Run function, unless a call with the same key is already running : then wait for it and return its result (or raise its exception)
+
+        :param key: The key identifying identical calls (it must be hashable)
+        :param function: The function to call (without arguments)
+        :type function: function
+        :return: The (result, leader) : leader is True if this thread ran the call, False if the result is shared with another thread
+        :rtype: tuple
+        """
+        with self.__lock:
+            flight = self.__flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.__flights[key] = Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, False
+
+        try:
+            flight.value = function()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            # The next calls run again : only the calls made while this one was running share its result
+            with self.__lock:
+                del self.__flights[key]
+            flight.done.set()
+        return flight.value, True
+
+    def inFlight(self) -> int:
+        """
+        :return: The number of calls currently running
+        :rtype: int
+        """
+        return len(self.__flights)
@@ -0,0 +1,55 @@
+import os
+import sys
+import pytest
+from urllib.parse import urlparse, parse_qs
+
+# The modules of the project are at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Aumax import Aumax  # noqa: E402
+from AumaxServer import AumaxServer  # noqa: E402
+from transport import RequestsTransport  # noqa: E402
+
+EMAIL = "user@example.com"
+PASSWORD = "password"
+
+
+@pytest.fixture
+def server():
+    server = AumaxServer(transactionCount=30, virtualCardCount=3, operationsPerCard=5)
+    server.addUser(EMAIL, PASSWORD)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def api(server):
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url)
+    assert api.connect()
+    return api
+
+
+class UrlRecordingTransport(RequestsTransport):
+    """
+    Keep the urls of the requests sent
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def request(self, method: str, url: str, **kwargs):
+        self.urls.append(url)
+        return super().request(method, url, **kwargs)
+
+    def transactionCounts(self) -> list:
+        return [int(parse_qs(urlparse(url).query)["count"][0]) for url in self.urls if "/transactions" in url]
+
+
+@pytest.fixture
+def recordedApi(server):
+    transport = UrlRecordingTransport()
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    assert api.connect()
+    return api, transport
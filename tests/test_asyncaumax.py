@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from exceptions import ResponseError
+from conftest import EMAIL, PASSWORD
+
+pytest.importorskip("aiohttp")
+from AsyncAumax import AsyncAumax  # noqa: E402
+
+
+def run(server, function):
+    async def main():
+        async with AsyncAumax(EMAIL, PASSWORD, baseUrl=server.url) as api:
+            assert await api.connect()
+            return await function(api)
+    return asyncio.run(main())
+
+
+def test_errorsAreRaised(server):
+    async def function(api):
+        with pytest.raises(ResponseError) as error:
+            await api.getVirtualCardOperations("unknown")
+        return error.value.statusCode
+    assert run(server, function) == 404
+
+
+def test_expiredTokenIsRefreshed(server):
+    async def function(api):
+        server.expireTokens()
+        return await api.getVirtualCards()
+    assert len(run(server, function)) == 3
+
+
+def test_oneCardFailingDoesNotLoseTheOthers(server):
+    async def function(api):
+        cards = [card["num"] for card in await api.getVirtualCards()]
+        return cards, await api.getAllVirtualCardOperations(cards + ["unknown"])
+    cards, operations = run(server, function)
+    assert isinstance(operations["unknown"], ResponseError)
+    assert all(len(operations[card]) == 5 for card in cards)
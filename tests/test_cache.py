@@ -0,0 +1,36 @@
+from cache import ResponseCache
+
+
+def test_responsesAreKeptPerUrl():
+    cache = ResponseCache({"transactions": 60}, maxEntries=2)
+    cache.put("transactions", "/a?count=10", [1])
+    cache.put("transactions", "/a?count=20", [2])
+    assert cache.getValue(cache.get("transactions", "/a?count=10")) == [1]
+    assert cache.getValue(cache.get("transactions", "/a?count=20")) == [2]
+
+    # /a?count=10 was used last : /a?count=20 is removed first
+    cache.get("transactions", "/a?count=10")
+    cache.put("transactions", "/b?count=10", [3])
+    assert cache.get("transactions", "/a?count=20") is None
+    assert cache.get("transactions", "/a?count=10") is not None
+
+    cache.invalidate("transactions")
+    assert cache.get("transactions", "/a?count=10") is None
+    assert cache.get("transactions", "/b?count=10") is None
+
+
+def test_responseRequestedBeforeInvalidationIsDiscarded():
+    cache = ResponseCache({"virtualCards": 60, "accounts": 60})
+    generation = cache.generation("virtualCards")
+    accountsGeneration = cache.generation("accounts")
+    cache.invalidate("virtualCards")
+
+    assert not cache.put("virtualCards", "/cards", ["old"], generation=generation)
+    assert cache.get("virtualCards", "/cards") is None
+    # The other endpoints are not affected
+    assert cache.put("accounts", "/accounts", ["accounts"], generation=accountsGeneration)
+
+    generation = cache.generation("accounts")
+    cache.invalidate()
+    assert not cache.put("accounts", "/accounts", ["old"], generation=generation)
+    assert cache.put("virtualCards", "/cards", ["new"], generation=cache.generation("virtualCards"))
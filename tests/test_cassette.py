@@ -0,0 +1,36 @@
+import gzip
+from Aumax import Aumax
+from cassette import ReplayTransport
+from conftest import EMAIL, PASSWORD
+
+
+def test_cassetteRedactsTheFieldsAndReplaysTheCards(server, tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    user = server.user(EMAIL)
+    card = user.virtualCards[0]
+    # The secrets are redacted by field : a text containing the password is recorded as received
+    user.operations[card["num"]][0]["libelle"] = f"PAIEMENT {PASSWORD}"
+
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url)
+    api.enableRecording(path)
+    assert api.connect()
+    api.getUserInfo()
+    api.getVirtualCards()
+    # A streamed response read partially is recorded completely
+    for _ in api.iterVirtualCardOperations(card["num"]):
+        break
+    api.disableRecording()
+
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        cassette = file.read()
+    assert EMAIL not in cassette
+    assert all(recorded["num"] not in cassette and recorded["dateEch"] not in cassette for recorded in user.virtualCards)
+    assert f"PAIEMENT {PASSWORD}" in cassette
+
+    replayed = Aumax(EMAIL, PASSWORD, transport=ReplayTransport(path))
+    assert replayed.connect()
+    cards = replayed.getVirtualCards()
+    pseudonym = cards[0]["num"]
+    assert pseudonym != card["num"] and pseudonym[-4:] == card["num"][-4:]
+    assert cards[0]["mntRestant"] == card["mntRestant"]
+    assert list(replayed.iterVirtualCardOperations(pseudonym)) == user.operations[card["num"]]
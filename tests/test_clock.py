@@ -0,0 +1,15 @@
+import pytest
+from exceptions import ClockCalibrationDisabledError
+
+
+def test_calibrateClockWithoutCalibrationEnabled(api):
+    with pytest.raises(ClockCalibrationDisabledError):
+        api.calibrateClock()
+
+
+def test_calibrateClock(api):
+    api.enableClockCalibration(samples=2)
+    assert abs(api.calibrateClock()) < 5
+    api.disableClockCalibration()
+    with pytest.raises(ClockCalibrationDisabledError):
+        api.calibrateClock()
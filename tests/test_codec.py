@@ -0,0 +1,26 @@
+import json
+import pytest
+from codec import iterJsonArray
+
+
+def byteChunks(document) -> list:
+    return [bytes([byte]) for byte in json.dumps(document, ensure_ascii=False).encode('utf-8')]
+
+
+def test_oneByteChunks():
+    transactions = [{"id": "1", "libelle": "CB CAFÉ DES ARTS", "montant": -12.5, "tags": ["a", "b"]},
+                    {"id": "2", "libelle": "VIR \"LOYER\" [mars]", "montant": 125, "tags": []},
+                    {"id": "3", "libelle": "PRLV €", "montant": -1.5e2, "tags": None}]
+    document = {"meta": {"items": [0]}, "transactions": transactions}
+
+    assert list(iterJsonArray(byteChunks(document), ("transactions",))) == transactions
+    assert list(iterJsonArray(byteChunks(transactions))) == transactions
+    # A number cut between two chunks is not returned before its end
+    assert list(iterJsonArray(byteChunks([125, 1.5, 100000]))) == [125, 1.5, 100000]
+
+
+def test_emptyAndTruncatedArrays():
+    assert list(iterJsonArray(byteChunks([]))) == []
+    assert list(iterJsonArray(byteChunks({"code": "NOT_FOUND"}))) == []
+    with pytest.raises(ValueError):
+        list(iterJsonArray([b'[{"id": 1}, {"id"']))
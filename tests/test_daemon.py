@@ -0,0 +1,99 @@
+import os
+import socket
+import tempfile
+import threading
+import pytest
+from daemon import AumaxDaemon, AumaxClient, AumaxDaemonError
+from conftest import EMAIL, PASSWORD
+
+
+@pytest.fixture
+def socketPath():
+    # The path of a Unix socket is limited to about 100 characters
+    directory = tempfile.mkdtemp(prefix="aumax")
+    yield os.path.join(directory, "daemon.sock")
+    if os.path.exists(os.path.join(directory, "daemon.sock")):
+        os.remove(os.path.join(directory, "daemon.sock"))
+    os.rmdir(directory)
+
+
+@pytest.fixture
+def logins(server, monkeypatch):
+    calls = []
+    login = server.login
+
+    def countingLogin(email: str, password: str) -> tuple:
+        calls.append(email)
+        return login(email, password)
+
+    monkeypatch.setattr(server, "login", countingLogin)
+    return calls
+
+
+def startDaemon(daemon: AumaxDaemon) -> threading.Thread:
+    thread = threading.Thread(target=daemon.serveForever, daemon=True)
+    thread.start()
+    return thread
+
+
+def connectClient(socketPath: str) -> AumaxClient:
+    for _ in range(100):
+        try:
+            return AumaxClient(socketPath)
+        except OSError:
+            threading.Event().wait(0.02)
+    raise TimeoutError
+
+
+def test_accountsConnectOnFirstUse(server, socketPath, tmp_path, logins):
+    pytest.importorskip("cryptography")
+    config = {"accounts": {"main": {"email": EMAIL, "password": PASSWORD}}, "baseUrl": server.url, "sessionDirectory": str(tmp_path)}
+    daemon = AumaxDaemon(config, socketPath)
+    # No saved session : the account is not connected before it is used
+    assert logins == []
+
+    thread = startDaemon(daemon)
+    with connectClient(socketPath) as client:
+        assert not client.call("isConnected")
+        assert client.call("getUserInfo")["email"] == EMAIL
+        assert logins == [EMAIL]
+        with pytest.raises(AumaxDaemonError) as error:
+            client.call("unknownMethod")
+        assert error.value.type == "ValueError"
+        client.shutdown()
+    thread.join(5)
+
+    # The restarted daemon uses the saved session
+    daemon = AumaxDaemon(config, socketPath)
+    thread = startDaemon(daemon)
+    with connectClient(socketPath) as client:
+        assert client.call("isConnected")
+        client.call("getUserInfo")
+        client.shutdown()
+    thread.join(5)
+    assert logins == [EMAIL]
+
+
+def test_socketOfARunningDaemonIsKept(server, socketPath):
+    config = {"accounts": {"main": {"email": EMAIL, "password": PASSWORD}}, "baseUrl": server.url}
+    thread = startDaemon(AumaxDaemon(config, socketPath))
+    with connectClient(socketPath) as client:
+        with pytest.raises(FileExistsError):
+            AumaxDaemon(config, socketPath).serveForever()
+        assert client.ping()
+        client.shutdown()
+    thread.join(5)
+
+
+def test_staleSocketIsReplaced(server, socketPath):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socketPath)
+    stale.close()
+
+    config = {"accounts": {"main": {"email": EMAIL, "password": PASSWORD}}, "baseUrl": server.url}
+    thread = startDaemon(AumaxDaemon(config, socketPath))
+    with connectClient(socketPath) as client:
+        assert client.ping()
+        client.shutdown()
+    thread.join(5)
+    assert not os.path.exists(socketPath)
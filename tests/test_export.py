@@ -0,0 +1,108 @@
+import csv
+import json
+import os
+import pytest
+from Aumax import Aumax
+from cassette import CassetteResponse
+from exceptions import ResponseError
+from export import Exporter
+from resilience import RetryPolicy
+from transport import RequestsTransport
+from conftest import EMAIL, PASSWORD
+
+
+class FailingTransport(RequestsTransport):
+    """
+    Answer the requests whose url contains one of the failing strings with a 503 error
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.failing = set()
+
+    def request(self, method: str, url: str, **kwargs):
+        if any(part in url for part in self.failing):
+            return CassetteResponse(503, {"Content-Type": "application/json"}, b'{"code": "SERVICE_UNAVAILABLE"}')
+        return super().request(method, url, **kwargs)
+
+
+@pytest.fixture
+def failingApi(server):
+    transport = FailingTransport()
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    api.configureResilience(retryPolicy=RetryPolicy(retries=0))
+    assert api.connect()
+    return api, transport
+
+
+def readState(directory) -> dict:
+    with open(os.path.join(directory, "export-state.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def countLines(path) -> int:
+    with open(path, encoding="utf-8") as file:
+        return sum(1 for _ in file)
+
+
+def test_exportResumesTheUnitsThatFailed(failingApi, tmp_path):
+    api, transport = failingApi
+    transport.failing = {"/transactions"}
+    with pytest.raises(ResponseError):
+        Exporter(api, str(tmp_path)).run()
+    done = readState(tmp_path)["done"]
+    assert "accounts" in done and "virtualCards" in done
+    assert not any(unit.startswith("transactions/") for unit in done)
+
+    transport.failing = set()
+    counts = Exporter(api, str(tmp_path)).run()
+    transactionUnits = [unit for unit in counts if unit.startswith("transactions/")]
+    assert transactionUnits and all(counts[unit] == 30 for unit in transactionUnits)
+    # The files written by the first export are not written again
+    assert counts["accounts"] == 0 and counts["virtualCards"] == 0
+    assert not any(unit.startswith("virtualCardOperations/") for unit in counts)
+    for unit in transactionUnits:
+        assert countLines(os.path.join(tmp_path, *unit.split("/")) + ".jsonl") == 30
+
+
+def test_exportDoesNotRecordTheListsDuringAnOutage(failingApi, tmp_path):
+    api, transport = failingApi
+    transport.failing = {"/nvvirtualisapi/"}
+    with pytest.raises(ResponseError):
+        Exporter(api, str(tmp_path)).run()
+    assert not os.path.exists(os.path.join(tmp_path, "export-state.json"))
+
+    transport.failing = set()
+    counts = Exporter(api, str(tmp_path)).run()
+    assert counts["virtualCards"] == 3 and counts["accounts"] > 0
+
+
+def test_csvKeepsTheKeysOfEveryRow(api, server, tmp_path):
+    user = server.user(EMAIL)
+    card = user.virtualCards[0]
+    # An operation with a key that the first rows do not have, and one without amount
+    user.operations[card["num"]].append({"date": "01/01/2020", "montant": None, "libelle": "OLD", "commercant": "OLD", "categorie": "misc"})
+
+    Exporter(api, str(tmp_path), format="csv", chunkSize=2).run(transactions=False)
+
+    with open(os.path.join(tmp_path, "virtualCardOperations", card["num"] + ".csv"), encoding="utf-8", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert list(rows[0]) == ["cardNum", "id", "date", "montant", "libelle", "commercant", "extra"]
+    assert rows[0]["extra"] == "" and rows[0]["cardNum"] == card["num"]
+    assert rows[-1]["montant"] == ""
+    assert json.loads(rows[-1]["extra"]) == {"categorie": "misc"}
+
+
+def test_parquetSchemaDoesNotDependOnTheFirstChunk(api, server, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    user = server.user(EMAIL)
+    card = user.virtualCards[0]
+    for operation in user.operations[card["num"]][:2]:
+        operation["montant"] = None
+    user.operations[card["num"]][-1]["montant"] = 3
+
+    Exporter(api, str(tmp_path), format="parquet", chunkSize=2).run(transactions=False)
+
+    table = parquet.read_table(os.path.join(tmp_path, "virtualCardOperations", card["num"] + ".parquet"))
+    assert str(table.schema.field("montant").type) == "double"
+    assert table.column("montant").to_pylist()[-1] == 3.0
@@ -0,0 +1,49 @@
+import datetime
+import pytest
+from Aumax import Aumax
+from exceptions import ResponseError
+
+
+def accountId(api: Aumax) -> str:
+    return api.getAccouts()["tiles"][0]["account"]["id"]
+
+
+def test_iterTransactionsDoublesTheCount(recordedApi):
+    api, transport = recordedApi
+    transactions = list(api.iterTransactions(accountId(api), pageSize=8))
+
+    # The server has 30 transactions : the last page (32) is not full
+    assert transport.transactionCounts() == [8, 16, 32]
+    ids = [transaction["id"] for transaction in transactions]
+    assert len(ids) == 30
+    assert len(set(ids)) == 30
+
+
+def test_iterTransactionsStopsAtId(recordedApi):
+    api, transport = recordedApi
+    account = accountId(api)
+    until = api.getTransactions(account, 30)["transactions"][9]["id"]
+
+    transactions = list(api.iterTransactions(account, pageSize=8, until=until))
+
+    assert len(transactions) == 9
+    # The transaction was found in the second page, no other page is asked
+    assert transport.transactionCounts()[-2:] == [8, 16]
+
+
+def test_iterTransactionsStopsAtDate(recordedApi):
+    api, transport = recordedApi
+    until = datetime.date.today() - datetime.timedelta(days=2)
+
+    transactions = list(api.iterTransactions(accountId(api), pageSize=8, until=until))
+
+    # 3 transactions a day
+    assert len(transactions) == 9
+    assert transport.transactionCounts() == [8, 16]
+
+
+def test_iterTransactionsRaisesOnError(recordedApi):
+    api, transport = recordedApi
+    with pytest.raises(ResponseError) as error:
+        list(api.iterTransactions("unknown"))
+    assert error.value.statusCode == 404
@@ -0,0 +1,59 @@
+import requests
+import pytest
+from Aumax import Aumax
+from metrics import Metrics, PrometheusSink, RequestEvent
+from resilience import RetryPolicy, CircuitBreaker
+from conftest import EMAIL, PASSWORD
+
+
+def test_sinksReceiveEachAttempt(api, server):
+    sink = PrometheusSink(buckets=(0.5, 10))
+    events = []
+    api.enableMetrics(Metrics([sink, events.append]))
+    api.configureResilience(retryPolicy=RetryPolicy(retries=1, backoffBase=0.001), circuitBreaker=CircuitBreaker(failureThreshold=10))
+
+    api.getUserInfo()
+    api.getUserInfo()
+    server.errorRate = 1
+    api.getCards()
+
+    assert [(event.endpoint, event.status, event.attempt) for event in events] == \
+        [("userInfo", 200, 0), ("userInfo", 200, 0), ("cards", 503, 0), ("cards", 503, 1)]
+    assert all(event.responseBytes > 0 and event.requestBytes == 0 for event in events)
+
+    snapshot = sink.snapshot()
+    assert snapshot["userInfo"]["count"] == 2
+    assert snapshot["userInfo"]["statuses"] == {200: 2}
+    assert snapshot["userInfo"]["reusedConnections"] + snapshot["userInfo"]["newConnections"] == 2
+    assert snapshot["cards"]["statuses"] == {503: 2}
+    assert snapshot["cards"]["retries"] == 1
+    assert sum(snapshot["cards"]["latencyBuckets"].values()) == 2
+
+    text = sink.render()
+    assert 'aumax_requests_total{endpoint="userInfo",status="200"} 2' in text
+    assert 'aumax_retries_total{endpoint="cards"} 1' in text
+    assert 'aumax_request_duration_seconds_bucket{endpoint="cards",le="+Inf"} 2' in text
+    assert 'aumax_request_duration_seconds_count{endpoint="userInfo"} 2' in text
+
+
+def test_errorsAreRecorded():
+    events = []
+    # Nothing listens on this port
+    api = Aumax(EMAIL, PASSWORD, baseUrl="http://127.0.0.1:1")
+    api.enableMetrics(Metrics([events.append]))
+
+    with pytest.raises(requests.ConnectionError):
+        api.connect()
+
+    assert len(events) == 1
+    assert (events[0].endpoint, events[0].status, events[0].error) == ("token", None, "ConnectionError")
+
+
+def test_snapshotBuckets():
+    metrics = Metrics()
+    for latency in (0.001, 0.2, 20):
+        metrics.record(RequestEvent("accounts", "GET", 200, latency, 0, 10, 0, None, None))
+    buckets = metrics.snapshot()["accounts"]["latencyBuckets"]
+    assert buckets[0.005] == 1
+    assert buckets[0.25] == 1
+    assert buckets[float("inf")] == 1
@@ -0,0 +1,32 @@
+import datetime
+from models import Transaction, VirtualCard, CardOperation, parseExpiry
+
+
+def test_modelsAreHashable():
+    transaction = Transaction.fromDict({"id": "t1", "libelle": "CB CARREFOUR", "date": "2026-10-17", "montant": -12.5})
+    same = Transaction.fromDict({"id": "t1", "libelle": "CB CARREFOUR", "date": "2026-10-17", "montant": -12.5})
+    changed = Transaction.fromDict({"id": "t1", "libelle": "CB CARREFOUR", "date": "2026-10-17", "montant": -13})
+    assert transaction == same and hash(transaction) == hash(same)
+    assert transaction != changed
+    assert len({transaction, same, changed}) == 2
+    assert {transaction: 1}[same] == 1
+
+
+def test_modelHashUsesTheKeyOfTheModel():
+    card = VirtualCard.fromDict({"num": "5372040132406814000", "mntRestant": 10})
+    assert hash(card) == hash(VirtualCard.fromDict({"num": "5372040132406814000", "mntRestant": 5}))
+    assert len({card, VirtualCard.fromDict({"num": "5372040132406814001", "mntRestant": 10})}) == 2
+
+
+def test_modelsWithoutId():
+    operation = CardOperation.fromDict({"libelle": "AMAZON", "montant": -5})
+    assert operation in {CardOperation.fromDict({"libelle": "AMAZON", "montant": -5})}
+    assert Transaction.fromDict({"id": "1"}) != CardOperation.fromDict({"id": "1"})
+
+
+def test_parseExpiry():
+    assert parseExpiry("02/28") == datetime.date(2028, 2, 29)
+    assert parseExpiry("13/25") is None
+    assert parseExpiry("00/25") is None
+    assert parseExpiry("09") is None
+    assert parseExpiry(None) is None
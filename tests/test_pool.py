@@ -0,0 +1,69 @@
+import threading
+import time
+from AumaxPool import AumaxPool
+from transport import RequestsTransport, LimitedTransport
+from conftest import EMAIL, PASSWORD
+
+
+class CountingTransport(RequestsTransport):
+    """
+    Record the highest number of requests sent at the same time
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.highest = 0
+
+    def request(self, method: str, url: str, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.highest = max(self.highest, self.running)
+        try:
+            time.sleep(0.01)
+            return super().request(method, url, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_snapshotThreadsRespectAccountLimit(server):
+    transport = CountingTransport()
+    pool = AumaxPool(maxConcurrencyPerAccount=2, baseUrl=server.url, transport=transport)
+    account = pool.addAccount("main", EMAIL, PASSWORD)
+    assert not account.isConnected()
+
+    snapshot = account.getSnapshot(maxWorkers=8)
+
+    assert account.isConnected()
+    assert len(snapshot["virtualCardOperations"]) == 3
+    assert transport.highest <= 2
+
+
+def test_iteratorHoldsItsSlotUntilFinished(server):
+    pool = AumaxPool(maxConcurrencyPerAccount=1, baseUrl=server.url)
+    account = pool.addAccount("main", EMAIL, PASSWORD)
+    cardNum = account.getVirtualCards()[0]["num"]
+
+    operations = account.iterVirtualCardOperations(cardNum)
+    next(operations)
+    other = threading.Thread(target=account.getUserInfo)
+    other.start()
+    other.join(0.3)
+    # The response of the iterator is still being read : the other request waits for the slot of the account
+    assert other.is_alive()
+
+    assert len(list(operations)) == 4
+    other.join(5)
+    assert not other.is_alive()
+
+
+def test_limitedTransportReleasesOnError():
+    semaphore = threading.BoundedSemaphore(1)
+    limited = LimitedTransport(RequestsTransport(), semaphore)
+    try:
+        limited.request("GET", "http://127.0.0.1:1/", timeout=(0.5, 0.5))
+    except limited.transientErrors:
+        pass
+    assert semaphore.acquire(blocking=False)
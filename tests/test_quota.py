@@ -0,0 +1,45 @@
+import time
+import pytest
+from exceptions import CircuitOpenError, QuotaExceededError
+from quota import QuotaManager
+from resilience import CircuitBreaker, RetryPolicy
+from conftest import EMAIL
+
+
+@pytest.fixture
+def quota(tmp_path):
+    quota = QuotaManager(str(tmp_path / "quota.db"), requestsPerSecond=20, burst=2, maxWait=0)
+    yield quota
+    quota.close()
+
+
+def openBreaker(api, server, resetTimeout: float) -> CircuitBreaker:
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=resetTimeout)
+    api.configureResilience(retryPolicy=RetryPolicy(retries=0), circuitBreaker=breaker)
+    server.errorRate = 1
+    api.getVirtualCardOperations("1")
+    server.errorRate = 0
+    assert breaker.isOpen()
+    return breaker
+
+
+def test_quotaExceededDuringTheTestRequestDoesNotKeepTheBreakerOpen(api, server, quota):
+    openBreaker(api, server, resetTimeout=0.1)
+    time.sleep(0.15)
+    api.enableQuota(quota)
+    quota.acquire(EMAIL, cost=2)
+    with pytest.raises(QuotaExceededError):
+        api.getVirtualCardOperations("1")
+    time.sleep(0.2)
+    # The test request was not taken by the request refused by the quota
+    api.getVirtualCardOperations("1")
+
+
+def test_requestsNotSentDoNotUseTheQuota(api, server, quota):
+    openBreaker(api, server, resetTimeout=60)
+    api.enableQuota(quota)
+    before = quota.remaining(EMAIL)["requests"]
+    for _ in range(5):
+        with pytest.raises(CircuitOpenError):
+            api.getVirtualCardOperations("1")
+    assert quota.remaining(EMAIL)["requests"] >= before
@@ -0,0 +1,61 @@
+import time
+import requests
+import Aumax as aumaxModule
+from Aumax import Aumax
+from transport import RequestsTransport
+from conftest import EMAIL, PASSWORD
+
+
+class FlakyTokenTransport(RequestsTransport):
+    """
+    Fail the first connection requests after arming it, like a network outage during the background refresh
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 0
+
+    def request(self, method: str, url: str, **kwargs):
+        if self.failures > 0 and url.endswith("/token"):
+            self.failures -= 1
+            raise requests.ConnectionError("network down")
+        return super().request(method, url, **kwargs)
+
+
+def test_refreshRetriesAfterAFailedConnection(server, monkeypatch):
+    monkeypatch.setattr(aumaxModule, "REFRESH_RETRY_DELAY", 0.05)
+    server.tokenLifetime = 2
+    transport = FlakyTokenTransport()
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    assert api.connect()
+    expiry = api.getTokenExpiry()
+
+    transport.failures = 2
+    # The token is refreshed 1 second before its expiry (half of its lifetime)
+    api.enableAutoRefresh()
+    deadline = time.monotonic() + 5
+    while api.getTokenExpiry() == expiry and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert transport.failures == 0
+    assert api.getTokenExpiry() > expiry
+    api.disableAutoRefresh()
+
+
+def test_disabledRefreshIsNotRetried(server, monkeypatch):
+    monkeypatch.setattr(aumaxModule, "REFRESH_RETRY_DELAY", 0.05)
+    server.tokenLifetime = 2
+    transport = FlakyTokenTransport()
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    assert api.connect()
+
+    transport.failures = 100
+    api.enableAutoRefresh()
+    time.sleep(1.2)
+    api.disableAutoRefresh()
+    # A timer that fired just before may still be connecting
+    time.sleep(0.1)
+    failures = transport.failures
+    time.sleep(0.3)
+    assert 0 < 100 - failures
+    assert transport.failures == failures
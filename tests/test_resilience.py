@@ -0,0 +1,72 @@
+import time
+import pytest
+from Aumax import Aumax
+from exceptions import CircuitOpenError
+from resilience import RetryPolicy, CircuitBreaker
+from conftest import EMAIL, PASSWORD, UrlRecordingTransport
+
+
+def userInfoRequests(transport: UrlRecordingTransport) -> int:
+    return sum("/person/me" in url for url in transport.urls)
+
+
+@pytest.fixture
+def resilientApi(server):
+    transport = UrlRecordingTransport()
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    assert api.connect()
+    return api, transport
+
+
+def test_getIsRetried(server, resilientApi):
+    api, transport = resilientApi
+    api.configureResilience(retryPolicy=RetryPolicy(retries=2, backoffBase=0.001), circuitBreaker=CircuitBreaker(failureThreshold=10))
+    server.errorRate = 1
+
+    api.getUserInfo()
+
+    # The first request and 2 retries
+    assert userInfoRequests(transport) == 3
+
+
+def test_breakerOpensAndCloses(server, resilientApi):
+    api, transport = resilientApi
+    breaker = CircuitBreaker(failureThreshold=3, resetTimeout=0.2)
+    api.configureResilience(retryPolicy=RetryPolicy(retries=0), circuitBreaker=breaker)
+    server.errorRate = 1
+
+    for _ in range(3):
+        api.getUserInfo()
+    assert breaker.isOpen()
+    with pytest.raises(CircuitOpenError):
+        api.getUserInfo()
+    assert userInfoRequests(transport) == 3
+
+    # Half open : one test request is sent, it fails and the breaker opens again
+    time.sleep(0.25)
+    api.getUserInfo()
+    assert userInfoRequests(transport) == 4
+    with pytest.raises(CircuitOpenError):
+        api.getUserInfo()
+
+    # The test request succeeds : the breaker closes
+    server.errorRate = 0
+    time.sleep(0.25)
+    api.getUserInfo()
+    assert not breaker.isOpen()
+    api.getUserInfo()
+    assert userInfoRequests(transport) == 6
+
+
+def test_halfOpenBreakerAllowsOneTestRequest():
+    breaker = CircuitBreaker(failureThreshold=1, resetTimeout=0)
+    breaker.recordFailure()
+
+    assert breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    # The test request was not sent : another request can test the API
+    breaker.release()
+    assert breaker.allow()
+    breaker.recordSuccess()
+    assert not breaker.allow()
@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import pytest
+from search import SearchIndex, MAX_EXPANSIONS
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "aumax.db")
+    index = SearchIndex(path)
+    db = sqlite3.connect(path)
+    with db:
+        rows = [
+            ("t1", "2026-10-01", {"id": "t1", "libelle": "AMAZON MARKETPLACE AMAZONIE", "montant": -60, "date": "2026-10-01"}),
+            ("t2", "2026-10-02", {"id": "t2", "libelle": "AMAZON PRIME", "montant": -6.99, "date": "2026-10-02"}),
+            ("t3", "2026-10-03", {"id": "t3", "libelle": "CARREFOUR", "montant": -80, "date": "2026-10-03"}),
+        ]
+        db.executemany("INSERT INTO transactions (id, accountId, date, data) VALUES (?, 'a1', ?, ?)",
+                       [(itemId, date, json.dumps(data)) for itemId, date, data in rows])
+    db.close()
+    index.update()
+    yield index
+    index.close()
+
+
+def ids(results: list) -> list:
+    return [result["item"]["id"] for result in results]
+
+
+def test_documentMatchingSeveralExpandedTermsIsReturnedOnce(index):
+    # "ama" and "amazon" expand to "amazon" and "amazonie", which are both terms of t1
+    assert ids(index.search("amazon", minAmount=50, absolute=True)) == ["t1"]
+    assert ids(index.search("ama")) == ["t2", "t1"]
+    assert index.count("ama") == 2
+    assert ids(index.search("ama", limit=1, offset=1)) == ["t1"]
+
+
+def test_documentMatchingSeveralTermsOfARangeIsReturnedOnce(index, monkeypatch):
+    # Above MAX_EXPANSIONS terms, a word is searched as a range of terms
+    monkeypatch.setattr("search.MAX_EXPANSIONS", 1)
+    assert ids(index.search("amazon")) == ["t2", "t1"]
+    assert index.count("amazon") == 2
+    assert MAX_EXPANSIONS > 1
+
+
+@pytest.fixture
+def store(tmp_path, index):
+    db = sqlite3.connect(str(tmp_path / "aumax.db"))
+    yield db
+    db.close()
+
+
+def test_updateIndexesTheChangesOfTheStore(index, store):
+    with store:
+        store.execute("INSERT INTO transactions (id, accountId, date, data) VALUES ('t4', 'a2', '2026-10-04', ?)",
+                      (json.dumps({"id": "t4", "libelle": "AMAZON EU", "montant": -12, "date": "2026-10-04"}),))
+        store.execute("UPDATE transactions SET data = ? WHERE id = 't3'",
+                      (json.dumps({"id": "t3", "libelle": "LECLERC", "montant": -80, "date": "2026-10-03"}),))
+        store.execute("DELETE FROM transactions WHERE id = 't2'")
+        store.execute("INSERT INTO virtualCardOperations (id, cardNum, date, data) VALUES ('o1', 'c1', '2026-10-05', ?)",
+                      (json.dumps({"id": "o1", "libelle": "PAIEMENT", "commercant": "Amazon", "montant": -20}),))
+    assert index.pending() == 4
+    # Not indexed before the update
+    assert ids(index.search("leclerc")) == []
+
+    assert index.update() == 4
+    assert index.pending() == 0
+    assert ids(index.search("amazon")) == ["o1", "t4", "t1"]
+    assert ids(index.search("amazon", source="transactions", accounts=["a2"])) == ["t4"]
+    assert ids(index.search("leclerc")) == ["t3"]
+    assert ids(index.search("carrefour")) == [] and ids(index.search("prime")) == []
+    assert index.count() == 4
+    assert index.update() == 0
+
+
+def test_updateSkipsTheUnknownSources(index, store):
+    with store:
+        store.execute("INSERT INTO searchQueue (source, itemId) VALUES ('accounts', 'a1')")
+        store.execute("DELETE FROM transactions WHERE id = 't1'")
+    assert index.update() == 2
+    assert index.pending() == 0
+    assert ids(index.search("amazon")) == ["t2"]
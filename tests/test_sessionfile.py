@@ -0,0 +1,45 @@
+import logging
+import pytest
+import sessionfile
+from Aumax import Aumax
+from conftest import EMAIL, PASSWORD
+
+pytest.importorskip("cryptography")
+
+
+@pytest.fixture
+def derivations(monkeypatch):
+    calls = []
+    deriveKey = sessionfile.deriveKey
+
+    def countingDeriveKey(passphrase: str, salt: bytes, *args) -> bytes:
+        calls.append(salt)
+        return deriveKey(passphrase, salt, *args)
+
+    monkeypatch.setattr(sessionfile, "deriveKey", countingDeriveKey)
+    return calls
+
+
+def test_keyIsDerivedOncePerPassphraseAndSalt(server, tmp_path, derivations):
+    path = str(tmp_path / "user.session")
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url)
+    assert api.resumeSession(path)
+    server.expireTokens()
+    # The token is rejected : the client connects again and saves the new session
+    api.getUserInfo()
+    api.saveSession()
+    assert len(derivations) == 1
+
+    other = Aumax(EMAIL, PASSWORD, baseUrl=server.url)
+    assert other.resumeSession(path)
+    other.saveSession()
+    assert len(derivations) == 2
+    assert other.isConnected()
+
+
+def test_sessionNotSavedIsLogged(server, tmp_path, caplog):
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url)
+    with caplog.at_level(logging.WARNING, logger="Aumax"):
+        assert api.resumeSession(str(tmp_path / "missing" / "user.session"))
+    assert api.isConnected()
+    assert "Unable to save the session" in caplog.text
@@ -0,0 +1,94 @@
+import threading
+from Aumax import Aumax
+from singleflight import SingleFlight
+from conftest import EMAIL, PASSWORD, UrlRecordingTransport
+
+
+def runThreads(count: int, target) -> list:
+    results = [None] * count
+
+    def run(index: int) -> None:
+        try:
+            results[index] = target()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_identicalCallsShareOneCall():
+    singleFlight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return {"value": 1}
+
+    def waitingCall():
+        return singleFlight.do("key", call)
+
+    threading.Timer(0.2, release.set).start()
+    results = runThreads(8, waitingCall)
+
+    assert len(calls) == 1
+    assert [leader for value, leader in results].count(True) == 1
+    assert all(value == {"value": 1} for value, leader in results)
+    assert singleFlight.inFlight() == 0
+    # The calls made afterwards run again
+    release.set()
+    singleFlight.do("key", call)
+    assert len(calls) == 2
+
+
+def test_errorIsSharedWithTheWaitingCalls():
+    singleFlight = SingleFlight()
+    release = threading.Event()
+
+    def call():
+        release.wait(5)
+        raise ValueError("failed")
+
+    threading.Timer(0.2, release.set).start()
+    results = runThreads(4, lambda: singleFlight.do("key", call))
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert singleFlight.inFlight() == 0
+
+
+def test_concurrentRequestsAreCoalesced(server):
+    server.latency = 0.2
+    transport = UrlRecordingTransport()
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    assert api.connect()
+    api.enableRequestCoalescing()
+
+    results = runThreads(8, api.getUserInfo)
+
+    assert sum("/person/me" in url for url in transport.urls) == 1
+    assert all(result["email"] == EMAIL for result in results)
+    # Each thread has its own copy of the result
+    assert len({id(result) for result in results}) == 8
+
+
+def test_expiredTokenIsRefreshedOnce(server, monkeypatch):
+    logins = []
+    login = server.login
+    monkeypatch.setattr(server, "login", lambda email, password: logins.append(email) or login(email, password))
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url)
+    assert api.connect()
+    server.expireTokens()
+    server.latency = 0.1
+
+    results = runThreads(8, api.getCards)
+
+    assert not any(isinstance(result, Exception) for result in results)
+    # The first connection and a single reconnection for the 8 threads rejected with a 401
+    assert len(logins) == 2
+
@@ -0,0 +1,60 @@
+import time
+import requests
+from Aumax import Aumax
+from resilience import RetryPolicy
+from transport import RequestsTransport
+from conftest import EMAIL, PASSWORD
+
+
+class SlowTransport(RequestsTransport):
+    """
+    Delay the requests whose url contains one of the slow strings, and fail the ones containing one of the failing strings
+    """
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.slow = set()
+        self.failing = set()
+
+    def request(self, method: str, url: str, **kwargs):
+        if any(part in url for part in self.failing):
+            raise requests.ConnectionError("network down")
+        if any(part in url for part in self.slow):
+            time.sleep(self.delay)
+        return super().request(method, url, **kwargs)
+
+
+def test_completeSnapshot(api):
+    snapshot = api.getSnapshot(transactionCount=5)
+
+    assert snapshot["complete"]
+    assert snapshot["userInfo"]["email"] == EMAIL
+    assert len(snapshot["virtualCardOperations"]) == 3
+    assert all(len(transactions["transactions"]) == 5 for transactions in snapshot["transactions"].values())
+    assert len(snapshot["transactions"]) == 2
+    assert set(snapshot["status"].values()) == {"ok"}
+
+
+def test_deadlineReturnsThePartsReceived(server):
+    transport = SlowTransport(2)
+    api = Aumax(EMAIL, PASSWORD, baseUrl=server.url, transport=transport)
+    api.configureResilience(retryPolicy=RetryPolicy(retries=0))
+    assert api.connect()
+    transport.slow.add("/operation")
+    transport.failing.add("/cards/max")
+
+    snapshot = api.getSnapshot(deadline=0.5)
+
+    assert snapshot["elapsed"] < 1.5
+    assert not snapshot["complete"]
+    assert snapshot["userInfo"]["email"] == EMAIL
+    assert len(snapshot["virtualCards"]) == 3
+    assert snapshot["virtualCardOperations"] == {}
+    operations = [name for name in snapshot["status"] if name.startswith("virtualCardOperations:")]
+    assert len(operations) == 3
+    assert all(snapshot["status"][name] == "timeout" for name in operations)
+    # A part that failed does not stop the others
+    assert snapshot["maxCard"] is None
+    assert snapshot["status"]["maxCard"] == "error"
+    assert snapshot["errors"]["maxCard"].startswith("ConnectionError")
@@ -0,0 +1,46 @@
+import datetime
+import pytest
+from AumaxStore import AumaxStore
+from conftest import EMAIL
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AumaxStore(str(tmp_path / "aumax.db"))
+    yield store
+    store.close()
+
+
+def test_firstSyncSavesEverything(recordedApi, store):
+    api, transport = recordedApi
+    stats = store.sync(api)
+
+    assert stats == {"accounts": 2, "transactions": 60, "virtualCards": 3, "virtualCardOperations": 15}
+    accountId = store.getAccounts()[0]["id"]
+    assert len(store.getTransactions(accountId)) == 30
+
+
+def test_secondSyncStopsAtTheWatermark(server, recordedApi, store):
+    api, transport = recordedApi
+    store.sync(api)
+    transport.urls.clear()
+
+    assert store.sync(api) == {"accounts": 2, "transactions": 0, "virtualCards": 0, "virtualCardOperations": 0}
+    # Only the first page of each account is read (the watermark is in it), and the operations of the unchanged cards are not asked
+    assert transport.transactionCounts() == [50, 50]
+    assert not any("/operation" in url for url in transport.urls)
+
+
+def test_syncSavesNewTransactions(server, recordedApi, store):
+    api, transport = recordedApi
+    store.sync(api)
+
+    user = server.user(EMAIL)
+    accountId = user.accounts[0]["id"]
+    user.transactions[accountId].insert(0, {"id": f"{accountId}-new", "date": datetime.date.today().strftime("%d/%m/%Y"),
+                                            "montant": -12.5, "libelle": "CB NEW", "type": "CB"})
+
+    assert store.sync(api)["transactions"] == 1
+    transactions = store.getTransactions(accountId)
+    assert len(transactions) == 31
+    assert f"{accountId}-new" in [transaction["id"] for transaction in transactions]
@@ -0,0 +1,40 @@
+import types
+import pytest
+import requests
+from transport import Transport, TunedHTTPAdapter, RequestsTransport
+
+
+def test_transportIsAbstract():
+    with pytest.raises(TypeError):
+        Transport()
+
+    class NoRequest(Transport):
+        pass
+
+    with pytest.raises(TypeError):
+        NoRequest()
+
+
+def test_sharedContextIsNotReloaded(tmp_path):
+    bundle = requests.utils.DEFAULT_CA_BUNDLE_PATH
+    adapter = TunedHTTPAdapter(object(), bundle)
+    for verify in (True, bundle):
+        conn = types.SimpleNamespace(cert_reqs=None, ca_certs=None, ca_cert_dir=None)
+        adapter.cert_verify(conn, "https://api.aumax.fr", verify, None)
+        assert conn.cert_reqs == "CERT_REQUIRED"
+        assert conn.ca_certs is None and conn.ca_cert_dir is None
+
+    # Another bundle is not in the shared context : urllib3 loads it
+    conn = types.SimpleNamespace(cert_reqs=None, ca_certs=None, ca_cert_dir=None)
+    other = tmp_path / "other.pem"
+    other.write_text("")
+    adapter.cert_verify(conn, "https://api.aumax.fr", str(other), None)
+    assert conn.ca_certs == str(other)
+
+
+def test_requestsTransportSendsRequests(server):
+    transport = RequestsTransport(poolSize=2)
+    r = transport.request("GET", f"{server.url}/unknown")
+    assert r.status_code == 404
+    assert transport.connectionCount() == 1
+    transport.close()
@@ -0,0 +1,52 @@
+import datetime
+from watcher import Watcher, AccountBalanceChanged, CardBalanceChanged, CardCreated, OperationAdded
+from conftest import EMAIL
+
+
+def test_changesAreSentToTheSubscribers(api, server):
+    watcher = Watcher(api)
+    received = []
+    watcher.subscribe(received.append, (OperationAdded, CardCreated))
+    # The first poll of each target only records its state (the operations of the cards are polled once the cards are known)
+    assert watcher.poll(force=True) == []
+    assert watcher.poll(force=True) == []
+
+    user = server.user(EMAIL)
+    user.accounts[0]["solde"] += 10
+    card = user.virtualCards[0]
+    card["mntRestant"] = round(card["mntRestant"] - 5, 2)
+    user.operations[card["num"]].insert(0, {"date": datetime.date.today().strftime("%d/%m/%Y"), "montant": -5,
+                                            "libelle": "PAIEMENT NEW", "commercant": "NEW"})
+    created = user.createCard(1, 20.0)
+
+    events = watcher.poll(force=True)
+
+    kinds = {type(event) for event in events}
+    assert kinds == {AccountBalanceChanged, CardBalanceChanged, CardCreated, OperationAdded}
+    balance = next(event for event in events if isinstance(event, AccountBalanceChanged))
+    assert balance.accountId == user.accounts[0]["id"]
+    assert round(balance.current - balance.previous, 2) == 10
+    added = [event for event in events if isinstance(event, OperationAdded)]
+    assert [(event.cardNum, event.operation["libelle"]) for event in added] == [(card["num"], "PAIEMENT NEW")]
+    # The subscriber only receives the kinds it asked for
+    assert {type(event) for event in received} == {OperationAdded, CardCreated}
+    assert next(event for event in received if isinstance(event, CardCreated)).card["num"] == created["num"]
+
+    assert watcher.poll(force=True) == []
+
+
+def test_intervalBacksOffWhileNothingChanges(api, server):
+    watcher = Watcher(api, minInterval=10, maxInterval=40, backoff=2, virtualCards=False)
+
+    intervals = []
+    for _ in range(4):
+        watcher.poll(force=True)
+        intervals.append(watcher.intervals()[("accounts",)])
+    assert intervals == [20, 40, 40, 40]
+    assert 30 < watcher.nextPoll() <= 40
+
+    server.user(EMAIL).accounts[0]["solde"] += 1
+    watcher.poll(force=True)
+    assert watcher.intervals()[("accounts",)] == 10
+    # Nothing is due before the interval
+    assert watcher.poll() == []
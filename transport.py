@@ -0,0 +1,323 @@
+import abc
+import os
+import ssl
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+# The encodings urllib3 can decode (br and zstd are included when their packages are installed)
+from urllib3.util.request import ACCEPT_ENCODING
+from consts import DEFAULT_POOL_SIZE
+
+# httpx is only needed by HttpxTransport (and h2 for HTTP/2)
+try:
+    import httpx
+except ImportError:
+    httpx = None
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+class Transport(abc.ABC):
+    """
+    The HTTP layer used by Aumax : it sends the requests and manages the connections
+    The responses must behave like requests.Response (status_code, headers, content, text, json, iter_content, close, and request.body)
+    A transport can be shared between several Aumax objects (see AumaxPool)
+    """
+    # The exceptions raised when a request fails because of the network (the requests failing with them are retried)
+    transientErrors = ()
+
+    @abc.abstractmethod
+    def request(self, method: str, url: str, headers: dict = None, data=None, params: dict = None, timeout=None, stream: bool = False):
+        """
+        :param method: The HTTP method
+        :type method: str
+        :param url: The url to request
+        :type url: str
+        :param headers: The headers of the request
+        :type headers: dict
+        :param data: The body of the request (a dictionnary is sent as a form)
+        :type data: str or bytes or dict
+        :param params: The parameters added to the query string
+        :type params: dict
+        :param timeout: The (connect, read) timeouts in seconds
+        :type timeout: tuple
+        :param stream: If True, the body is read when iter_content is called instead of being read before returning
+        :type stream: bool
+        :return: The response
+        """
+
+    def connectionCount(self) -> int:
+        """
+        :return: The number of connections opened so far (used to know if a request reused a connection, see metrics.py), None if it is not known
+        :rtype: int
+        """
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class TunedHTTPAdapter(HTTPAdapter):
+
+    def __init__(self, sslContext: ssl.SSLContext = None, caBundle: str = None, **kwargs):
+        """
+        An HTTPAdapter whose connections share the same SSL context (the CA certificates are loaded once, not for each new connection)
+
+        :param sslContext: The SSL context shared by the connections
+        :type sslContext: ssl.SSLContext
+        :param caBundle: The CA bundle loaded in sslContext (the requests verifying the certificates with it do not load it again)
+        :type caBundle: str
+        """
+        self.__sslContext = sslContext
+        self.__caBundle = caBundle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        if self.__sslContext is not None:
+            kwargs["ssl_context"] = self.__sslContext
+        super().init_poolmanager(*args, **kwargs)
+
+    def cert_verify(self, conn, url: str, verify, cert) -> None:
+        super().cert_verify(conn, url, verify, cert)
+        if self.__sslContext is not None and (verify is True or verify == self.__caBundle):
+            # requests gives the CA bundle to the connection pool, and urllib3 would load it again in the shared context
+            # for each new connection : the shared context already has it (and still verifies the certificates)
+            conn.ca_certs = None
+            conn.ca_cert_dir = None
+
+
+class RequestsTransport(Transport):
+    transientErrors = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+    def __init__(self, session: requests.Session = None, poolSize: int = DEFAULT_POOL_SIZE, poolHosts: int = 1, poolBlock: bool = False,
+                 compression: bool = True, shareSSLContext: bool = True):
+        """
+        A transport using a requests session (urllib3 connection pool, HTTP/1.1 with keep-alive)
+
+        :param session: The session to use as it is, a new one is created if None (configured with the following parameters)
+        :type session: requests.Session
+        :param poolSize: The maximum number of connections kept open to a host (more connections are opened when needed but closed after use, unless poolBlock is True)
+        :type poolSize: int
+        :param poolHosts: The number of hosts whose connection pools are kept
+        :type poolHosts: int
+        :param poolBlock: If True, a request waits for a free connection when poolSize connections are used, instead of opening a new one that will be closed after use
+        :type poolBlock: bool
+        :param compression: If True, compressed responses are asked (gzip and deflate, and br or zstd if urllib3 can decode them)
+        :type compression: bool
+        :param shareSSLContext: If True, all the connections share one SSL context (loaded once) instead of creating one per connection
+        :type shareSSLContext: bool
+        """
+        self.__session = session
+        if session is None:
+            self.__session = requests.Session()
+            sslContext = caBundle = None
+            if shareSSLContext:
+                # The bundle requests would use (the environment variables override the one of certifi)
+                caBundle = os.environ.get("REQUESTS_CA_BUNDLE") or os.environ.get("CURL_CA_BUNDLE") or requests.utils.DEFAULT_CA_BUNDLE_PATH
+                sslContext = ssl.create_default_context(cafile=caBundle)
+            adapter = TunedHTTPAdapter(sslContext, caBundle, pool_connections=poolHosts, pool_maxsize=poolSize, pool_block=poolBlock)
+            self.__session.mount("https://", adapter)
+            self.__session.mount("http://", adapter)
+            self.__session.headers["Accept-Encoding"] = ACCEPT_ENCODING if compression else "identity"
+
+    @property
+    def session(self) -> requests.Session:
+        return self.__session
+
+    def request(self, method: str, url: str, headers: dict = None, data=None, params: dict = None, timeout=None, stream: bool = False) -> requests.Response:
+        return self.__session.request(method, url, headers=headers, data=data, params=params, timeout=timeout, stream=stream)
+
+    def connectionCount(self) -> int:
+        count = 0
+        try:
+            # The same adapter is mounted for http and https
+            for adapter in {id(adapter): adapter for adapter in self.__session.adapters.values()}.values():
+                pools = adapter.poolmanager.pools
+                count += sum(pools[key].num_connections for key in pools.keys())
+        except (AttributeError, KeyError):
+            return None
+        return count
+
+    def close(self) -> None:
+        self.__session.close()
+
+
+class HttpxResponse():
+
+    def __init__(self, response):
+        """
+        Wrap an httpx.Response so it can be used like a requests.Response
+        """
+        self.__response = response
+        self.request = HttpxRequest(response.request)
+
+    @property
+    def status_code(self) -> int:
+        return self.__response.status_code
+
+    @property
+    def headers(self):
+        return self.__response.headers
+
+    @property
+    def content(self) -> bytes:
+        return self.__response.read()
+
+    @property
+    def text(self) -> str:
+        self.__response.read()
+        return self.__response.text
+
+    def json(self):
+        self.__response.read()
+        return self.__response.json()
+
+    def iter_content(self, chunk_size: int = None):
+        return self.__response.iter_bytes(chunk_size)
+
+    def close(self) -> None:
+        self.__response.close()
+
+    def __enter__(self) -> "HttpxResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"<Response [{self.status_code}]>"
+
+
+class HttpxRequest():
+
+    def __init__(self, request):
+        self.__request = request
+
+    @property
+    def body(self) -> bytes:
+        try:
+            return self.__request.content
+        except Exception:
+            # The body of a streamed request is not known
+            return None
+
+
+class HttpxTransport(Transport):
+
+    def __init__(self, maxConnections: int = DEFAULT_POOL_SIZE, maxKeepAliveConnections: int = DEFAULT_POOL_SIZE, keepAliveExpiry: float = 30,
+                 http2: bool = True, compression: bool = True):
+        """
+        A transport using httpx : HTTP/2 (many concurrent requests multiplexed on one connection) and a bounded connection pool
+        httpx must be installed (and h2 for HTTP/2 : pip install httpx[http2], HTTP/1.1 is used without it)
+
+        :param maxConnections: The maximum number of connections open at the same time (a request waits for a free connection above it)
+        :type maxConnections: int
+        :param maxKeepAliveConnections: The maximum number of idle connections kept open
+        :type maxKeepAliveConnections: int
+        :param keepAliveExpiry: The number of seconds after which an idle connection is closed
+        :type keepAliveExpiry: float
+        :param http2: If True, HTTP/2 is used when the server supports it and h2 is installed
+        :type http2: bool
+        :param compression: If True, compressed responses are asked
+        :type compression: bool
+        """
+        if httpx is None:
+            raise ImportError("HttpxTransport needs httpx : pip install httpx[http2]")
+        self.transientErrors = (httpx.TransportError,)
+        limits = httpx.Limits(max_connections=maxConnections, max_keepalive_connections=maxKeepAliveConnections, keepalive_expiry=keepAliveExpiry)
+        # httpx asks for the encodings it can decode by default
+        headers = {} if compression else {"Accept-Encoding": "identity"}
+        # The client keeps one SSL context for all its connections
+        self.__client = httpx.Client(http2=http2 and h2 is not None, limits=limits, headers=headers)
+
+    def request(self, method: str, url: str, headers: dict = None, data=None, params: dict = None, timeout=None, stream: bool = False) -> HttpxResponse:
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        kwargs = {"data": data} if isinstance(data, dict) else {"content": data}
+        request = self.__client.build_request(method, url, headers=headers, params=params, timeout=timeout, **kwargs)
+        return HttpxResponse(self.__client.send(request, stream=stream))
+
+    def close(self) -> None:
+        self.__client.close()
+
+
+class LimitedResponse():
+
+    def __init__(self, response, release):
+        """
+        A streamed response holding the slots of a LimitedTransport until it is closed (the body is still being read from the connection)
+        """
+        self.__response = response
+        self.__release = release
+
+    def close(self) -> None:
+        try:
+            self.__response.close()
+        finally:
+            release, self.__release = self.__release, None
+            if release is not None:
+                release()
+
+    def __enter__(self) -> "LimitedResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getattr__(self, name: str):
+        return getattr(self.__response, name)
+
+    def __repr__(self) -> str:
+        return repr(self.__response)
+
+
+class LimitedTransport(Transport):
+
+    def __init__(self, transport: Transport, *semaphores: threading.Semaphore):
+        """
+        Wrap a transport to limit the number of requests sent at the same time : each request holds a slot of every semaphore while it is sent
+        A streamed response holds its slots until it is closed, so the limits also apply to the bodies read by the iterators (see Aumax.iterTransactions)
+
+        :param transport: The transport sending the requests
+        :type transport: Transport
+        :param semaphores: The semaphores limiting the requests, acquired in this order (the most specific first, so a request waiting for it does not hold the others)
+        :type semaphores: threading.Semaphore
+        """
+        self.transport = transport
+        self.transientErrors = transport.transientErrors
+        self.__semaphores = semaphores
+
+    def __acquire(self) -> None:
+        acquired = []
+        try:
+            for semaphore in self.__semaphores:
+                semaphore.acquire()
+                acquired.append(semaphore)
+        except BaseException:
+            self.__release(acquired)
+            raise
+
+    def __release(self, semaphores=None) -> None:
+        for semaphore in reversed(semaphores if semaphores is not None else self.__semaphores):
+            semaphore.release()
+
+    def request(self, method: str, url: str, headers: dict = None, data=None, params: dict = None, timeout=None, stream: bool = False):
+        self.__acquire()
+        try:
+            r = self.transport.request(method, url, headers=headers, data=data, params=params, timeout=timeout, stream=stream)
+        except BaseException:
+            self.__release()
+            raise
+        if not stream:
+            self.__release()
+            return r
+        return LimitedResponse(r, self.__release)
+
+    def connectionCount(self) -> int:
+        return self.transport.connectionCount()
+
+    def close(self) -> None:
+        self.transport.close()
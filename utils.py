@@ -3,7 +3,9 @@ import hmac
 import requests
 import hashlib
 import base64
+import json
 import time
+from codec import loads
 
 
 def printResponse(r: requests.models.Response) -> None:
@@ -34,6 +36,134 @@ def addPaddingToBase64String(base64String: str) -> str:
     return base64String + '=' * (-len(base64String) % 4)  # Padding with "="
 
 
+def decodeJWT(jwt: str) -> dict:
+    """
+    Decode the data contained in a JWT (the header and the payload, the signature is ignored)
+
+    :param jwt: The JWT (base64 string separated by a '.')
+    :type jwt: str
+    :return: A dictionnary merging the header and the payload of the JWT
+    :rtype: dict
+    """
+    data = {}
+    # Only the two first part of the JWT contains relevant data
+    for jsonBase64String in jwt.split('.')[:2]:
+        jsonBase64String = addPaddingToBase64String(jsonBase64String)
+        jsonStr = base64.b64decode(jsonBase64String).decode('utf-8')
+        data.update(loads(jsonStr))
+    return data
+
+
+def extractItems(response, keys: tuple = ("transactions", "operations", "items")) -> list:
+    """
+    Return the list of items contained in a response of the API (the response can be the list itself or a dictionnary containing the list)
+
+    :param response: The decoded JSON of the response
+    :type response: dict or list
+    :param keys: The keys where the list is usually found if the response is a dictionnary
+    :type keys: tuple
+    :return: The list of items (empty if there is none)
+    :rtype: list
+    """
+    if isinstance(response, list):
+        return response
+    if not isinstance(response, dict):
+        return []
+    for key in keys:
+        if isinstance(response.get(key), list):
+            return response[key]
+    # Otherwise we take the first list we find
+    for value in response.values():
+        if isinstance(value, list):
+            return value
+    return []
+
+
+def parseDate(value) -> datetime:
+    """
+    Parse a date sent by the API ("26/03/2021", "2021-03-26", "2021-03-26T10:00:00" or a timestamp in milliseconds)
+
+    :param value: The date to parse
+    :type value: str or int
+    :return: The parsed date, or None if the date can not be parsed
+    :rtype: datetime
+    """
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000)
+    if not isinstance(value, str):
+        return None
+    for dateFormat in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, dateFormat)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(value[:19])
+    except ValueError:
+        return None
+
+
+def getItemDate(item: dict, keys: tuple = ("date", "dateOperation", "dateComptable", "dateValeur", "dateCreation")) -> datetime:
+    """
+    Return the date of an item (a transaction or an operation) using the first date field found in it
+
+    :param item: The item (a transaction or an operation)
+    :type item: dict
+    :param keys: The fields that can contain the date of the item
+    :type keys: tuple
+    :return: The date of the item, or None if it has no date
+    :rtype: datetime
+    """
+    for key in keys:
+        if key in item:
+            return parseDate(item[key])
+    return None
+
+
+def itemId(item: dict, prefix: str = "", occurrence: int = 0) -> str:
+    """
+    Return the id of an item (a transaction or an operation), or a hash of its content if it has no id
+
+    :param item: The item
+    :type item: dict
+    :param prefix: A prefix added to the hash (the number of the card for example, so two identical operations on two cards are different)
+    :type prefix: str
+    :param occurrence: The number of identical items before this one in the same response (see itemIds), added to the hash if it is not 0
+    :type occurrence: int
+    :return: The id of the item
+    :rtype: str
+    """
+    if item.get("id") is not None:
+        return str(item["id"])
+    content = prefix + json.dumps(item, sort_keys=True)
+    if occurrence:
+        content += f"#{occurrence}"
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def itemIds(items, prefix: str = ""):
+    """
+    Iterate over items with their ids (see itemId) : identical items without id (two identical card payments on the same day for example)
+    are numbered in the order they are received, so each one has its own id (the first one keeps the id returned by itemId)
+
+    :param items: The items, in the order sent by the API
+    :type items: iterable
+    :param prefix: A prefix added to the hashes (see itemId)
+    :type prefix: str
+    :return: A generator of (id, item)
+    :rtype: generator
+    """
+    occurrences = {}
+    for item in items:
+        key = itemId(item, prefix)
+        if item.get("id") is None:
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            if occurrence:
+                key = itemId(item, prefix, occurrence)
+        yield key, item
+
+
 def hashMCode(mCode: str) -> str:
     """
     Function to hash the mCode
@@ -193,7 +323,43 @@ def hexStr2Bytes(hexStr: str) -> bytes:
     return bytes.fromhex(hexStr)
 
 
-def generateTOTP(seedDevice: str, mCode: str, seedOperation: str) -> str:
+def getTOTPTimeStep(timestamp: float = None) -> int:
+    """
+    Return the time step (number of periods of 30 seconds since epoch) used to generate a TOTP
+
+    :param timestamp: The time in seconds since epoch, the current time if None
+    :type timestamp: float
+    :return: The time step
+    :rtype: int
+    """
+    if timestamp is None:
+        timestamp = current_milli_time() / 1000
+    # The app uses the time one second in advance
+    j = -1
+    return (int(timestamp) - j) // 30
+
+
+def truncateTOTP(hmacSHA1: bytes) -> str:
+    """
+    Turn the HMAC-SHA1 of a time step into a TOTP of 6 digits (dynamic truncation)
+
+    :param hmacSHA1: The HMAC-SHA1 of the time step
+    :type hmacSHA1: bytes
+    :return: The TOTP (6 digits)
+    :rtype: str
+    """
+    DIGITS_POWER = [1, 10, 100, 1000, 10000,
+                    100000, 1000000, 10000000, 100000000]
+    MAX_VALUE = 127
+    CAN = 24
+
+    b = hmacSHA1[-1] & 15
+    i = ((hmacSHA1[b + 3] & 255) | ((((hmacSHA1[b] & MAX_VALUE) << CAN) |
+                                     ((hmacSHA1[b + 1] & 255) << 16)) | ((hmacSHA1[b + 2] & 255) << 8))) % DIGITS_POWER[6]
+    return str(i).zfill(6)
+
+
+def generateTOTP(seedDevice: str, mCode: str, seedOperation: str, timestamp: float = None) -> str:
     """
     Generate a Time One Time Password (TOPT) based on the current time
 
@@ -203,6 +369,8 @@ def generateTOTP(seedDevice: str, mCode: str, seedOperation: str) -> str:
     :type mCode: str
     :param seedOperation: seedOperation is a string returned when calling the API (path : /nvsecurityapi/rest/enrollments/operation/generateSeed)
     :type seedOperation: str
+    :param timestamp: The time in seconds since epoch used to generate the TOTP, the current time if None
+    :type timestamp: float
     :return: A Time One Time Password (TOPT) based on the current time needed to generate a virtual credit card
     :rtype: str
     """
@@ -210,28 +378,89 @@ def generateTOTP(seedDevice: str, mCode: str, seedOperation: str) -> str:
     seedOperationBytes = base64.b32decode(seedOperation.upper())
     key = getHmacKeyFromSeedDevice(seedDevice, mCode, seedOperationBytes)
 
-    j = -1
-    currentTimeMilli = (current_milli_time() // 1000) - j
-    timeInHex = hex((currentTimeMilli) // 30)[2:].upper()
+    timeInHex = hex(getTOTPTimeStep(timestamp))[2:].upper()
     res = ""
     for i in range(len(timeInHex), 16):
         res += '0'
     res += timeInHex
     resBytes = hexStr2Bytes(res)
     # Now we will HmacSHA1 resBytes using key
-    resHmacSHA1 = bytearray(hMacSHA1(key, resBytes))
-
-    DIGITS_POWER = [1, 10, 100, 1000, 10000,
-                    100000, 1000000, 10000000, 100000000]
-    MAX_VALUE = 127
-    CAN = 24
-
-    b = resHmacSHA1[-1] & 15
-    i = ((resHmacSHA1[b + 3] & 255) | ((((resHmacSHA1[b] & MAX_VALUE) << CAN) |
-                                        ((resHmacSHA1[b + 1] & 255) << 16)) | ((resHmacSHA1[b + 2] & 255) << 8))) % DIGITS_POWER[6]
-    final = ""
-    for j in range(len(str(i)), 6):
-        final += '0'
-    final += str(i)
-
-    return final
+    return truncateTOTP(bytearray(hMacSHA1(key, resBytes)))
+
+
+class AumaxCryptoContext():
+
+    def __init__(self, seedDevice: str, mCode: str):
+        """
+        Precompute the key material derived from the seedDevice and the mCode, to generate digests and TOTPs faster than generateDigest and generateTOTP
+
+        :param seedDevice: seedDevice is the code you receive by SMS when adding your phone as "the trusted phone" (the last one if you received severals)
+        :type seedDevice: str
+        :param mCode: mCode is the 6 digits code you set to protect sensible actions such as creating a virtual credit card
+        :type mCode: str
+        """
+        # Same key as getHmacKeyFromSeedDevice(seedDevice, mCode, None)
+        self.__key = base64.b32decode(hashMCode(mCode).upper()) + base64.b32decode(seedDevice.upper())
+        # HMAC already keyed with the key, it is copied for each digest
+        self.__digestHmac = hmac.new(self.__key, digestmod=hashlib.sha256)
+
+    def generateDigest(self, length: int, amount: float) -> str:
+        """
+        Same as generateDigest(seedDevice, mCode, length, amount)
+
+        :param length: The duration of the virtual credit card in months
+        :type length: int
+        :param amount: The amount in Euros contained in the virtual credit card
+        :type amount: float
+        :return: The string of the digest of the operation
+        :rtype: str
+        """
+        h = self.__digestHmac.copy()
+        h.update(generateOperation(length, amount).encode('utf-8'))
+        return base64.b64encode(h.digest()).decode('utf-8')
+
+    def generateDigests(self, operations: list) -> list:
+        """
+        Generate the digests of several operations
+
+        :param operations: A list of (length, amount) tuples
+        :type operations: list
+        :return: The digests, in the same order as the operations
+        :rtype: list
+        """
+        return [self.generateDigest(length, amount) for length, amount in operations]
+
+    def __totpHmac(self, seedOperation: str) -> hmac.HMAC:
+        return hmac.new(self.__key + base64.b32decode(seedOperation.upper()), digestmod=hashlib.sha1)
+
+    def generateTOTP(self, seedOperation: str, timestamp: float = None) -> str:
+        """
+        Same as generateTOTP(seedDevice, mCode, seedOperation, timestamp)
+
+        :param seedOperation: seedOperation is a string returned when calling the API (path : /nvsecurityapi/rest/enrollments/operation/generateSeed)
+        :type seedOperation: str
+        :param timestamp: The time in seconds since epoch used to generate the TOTP, the current time if None
+        :type timestamp: float
+        :return: A Time One Time Password (TOPT)
+        :rtype: str
+        """
+        return self.generateTOTPs(seedOperation, [getTOTPTimeStep(timestamp)])[0]
+
+    def generateTOTPs(self, seedOperation: str, steps) -> list:
+        """
+        Generate the TOTPs of several time steps for the same seedOperation (to check a code across a window of time steps for example)
+
+        :param seedOperation: seedOperation is a string returned when calling the API (path : /nvsecurityapi/rest/enrollments/operation/generateSeed)
+        :type seedOperation: str
+        :param steps: The time steps (see getTOTPTimeStep), example : range(step - 1, step + 2)
+        :type steps: iterable
+        :return: The TOTPs, in the same order as the time steps
+        :rtype: list
+        """
+        keyedHmac = self.__totpHmac(seedOperation)
+        totps = []
+        for step in steps:
+            h = keyedHmac.copy()
+            h.update(step.to_bytes(8, 'big'))
+            totps.append(truncateTOTP(h.digest()))
+        return totps
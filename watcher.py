@@ -0,0 +1,349 @@
+import datetime
+import threading
+import time
+from Aumax import Aumax
+from consts import WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL, WATCH_BACKOFF
+from models import toDict, parseAmount, parseExpiry
+from utils import extractItems, itemIds
+
+
+class WatchEvent():
+    """
+    A change seen by a Watcher
+    """
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class OperationAdded(WatchEvent):
+    __slots__ = ("cardNum", "operation")
+
+    def __init__(self, cardNum: str, operation: dict):
+        """
+        :param cardNum: The number of the virtual card
+        :param operation: The new operation, as sent by the API
+        """
+        self.cardNum = cardNum
+        self.operation = operation
+
+
+class CardBalanceChanged(WatchEvent):
+    __slots__ = ("cardNum", "previous", "current")
+
+    def __init__(self, cardNum: str, previous: float, current: float):
+        """
+        :param cardNum: The number of the virtual card
+        :param previous: The previous remaining amount of the card (mntRestant)
+        :param current: The new remaining amount of the card
+        """
+        self.cardNum = cardNum
+        self.previous = previous
+        self.current = current
+
+
+class AccountBalanceChanged(WatchEvent):
+    __slots__ = ("accountId", "previous", "current")
+
+    def __init__(self, accountId: str, previous: float, current: float):
+        """
+        :param accountId: The id of the account
+        :param previous: The previous balance of the account (solde)
+        :param current: The new balance of the account
+        """
+        self.accountId = accountId
+        self.previous = previous
+        self.current = current
+
+
+class CardCreated(WatchEvent):
+    __slots__ = ("card",)
+
+    def __init__(self, card: dict):
+        """
+        :param card: The new virtual card, as sent by the API
+        """
+        self.card = card
+
+
+class CardExpired(WatchEvent):
+    __slots__ = ("card",)
+
+    def __init__(self, card: dict):
+        """
+        :param card: The virtual card, as last seen (it is expired or it is no longer sent by the API)
+        """
+        self.card = card
+
+
+class PollFailed(WatchEvent):
+    __slots__ = ("target", "error")
+
+    def __init__(self, target: tuple, error: Exception):
+        """
+        :param target: The target whose poll failed : ("accounts",), ("virtualCards",) or ("operations", cardNum)
+        :param error: The exception raised by the request (the target is polled again after its current interval)
+        """
+        self.target = target
+        self.error = error
+
+
+class PollTarget():
+    """
+    Something polled by a Watcher, with its own adaptive interval
+    """
+    __slots__ = ("key", "interval", "due")
+
+    def __init__(self, key: tuple, interval: float, due: float):
+        self.key = key
+        self.interval = interval
+        self.due = due
+
+    def schedule(self, now: float, changed: bool, minInterval: float, maxInterval: float, backoff: float) -> None:
+        """
+        Schedule the next poll : as soon as possible after a change, less and less often while nothing changes
+        """
+        self.interval = minInterval if changed else min(self.interval * backoff, maxInterval)
+        self.due = now + self.interval
+
+
+class Watcher():
+
+    def __init__(self, api: Aumax, minInterval: float = WATCH_MIN_INTERVAL, maxInterval: float = WATCH_MAX_INTERVAL,
+                 backoff: float = WATCH_BACKOFF, accounts: bool = True, virtualCards: bool = True):
+        """
+        Poll the accounts and the virtual cards, compare each response with the last one and send the changes to the subscribers
+        Each target (the accounts, the list of the virtual cards, the operations of each card) has its own interval :
+        it is reset to minInterval when the target changes and multiplied by backoff at each poll without changes, up to maxInterval.
+        The operations of a card are polled again at once when its remaining amount changes, and no longer polled once it is expired.
+        The first poll of each target only records its state (no event is sent for what already exists when the watcher starts)
+
+        :param api: A connected Aumax object
+        :type api: Aumax
+        :param minInterval: The minimum number of seconds between two polls of the same target
+        :type minInterval: float
+        :param maxInterval: The maximum number of seconds between two polls of the same target
+        :type maxInterval: float
+        :param backoff: The factor applied to the interval of a target after a poll without changes
+        :type backoff: float
+        :param accounts: If True, the balances of the accounts are watched
+        :type accounts: bool
+        :param virtualCards: If True, the virtual cards and their operations are watched
+        :type virtualCards: bool
+        """
+        self.__api = api
+        self.__minInterval = minInterval
+        self.__maxInterval = maxInterval
+        self.__backoff = backoff
+        self.__lock = threading.RLock()
+        self.__subscribers = []
+        self.__targets = {}
+        self.__balances = None  # account id -> solde
+        self.__cards = None  # card num -> card
+        self.__operations = {}  # card num -> ids of the operations
+        self.__createdCards = set()  # cards created since the watcher started (all their operations are new)
+        self.__thread = None
+        self.__stopEvent = threading.Event()
+
+        now = time.monotonic()
+        if accounts:
+            self.__addTarget(("accounts",), now)
+        if virtualCards:
+            self.__addTarget(("virtualCards",), now)
+
+    def subscribe(self, callback, kinds: tuple = None) -> None:
+        """
+        :param callback: The function called with each event (from the thread polling the API)
+        :type callback: function
+        :param kinds: The classes of the events sent to the callback, example : (OperationAdded, CardCreated), all the events if None
+        :type kinds: tuple
+        """
+        with self.__lock:
+            self.__subscribers.append((callback, tuple(kinds) if kinds is not None else (WatchEvent,)))
+
+    def unsubscribe(self, callback) -> None:
+        with self.__lock:
+            self.__subscribers = [subscriber for subscriber in self.__subscribers if subscriber[0] != callback]
+
+    def intervals(self) -> dict:
+        """
+        :return: The current interval in seconds of each target, example : {("virtualCards",): 60, ("operations", "5372..."): 15}
+        :rtype: dict
+        """
+        with self.__lock:
+            return {key: target.interval for key, target in self.__targets.items()}
+
+    def nextPoll(self) -> float:
+        """
+        :return: The number of seconds before the next target is due (0 if one is already due, None if there is nothing to poll)
+        :rtype: float
+        """
+        with self.__lock:
+            if not self.__targets:
+                return None
+            return max(0, min(target.due for target in self.__targets.values()) - time.monotonic())
+
+    def poll(self, force: bool = False) -> list:
+        """
+        Poll the targets that are due and send the events to the subscribers
+
+        :param force: If True, all the targets are polled, even if they are not due
+        :type force: bool
+        :return: The events
+        :rtype: list
+        """
+        events = []
+        with self.__lock:
+            now = time.monotonic()
+            # The list of the cards first : it schedules the operations of the cards whose amount changed
+            for key in sorted((key for key, target in self.__targets.items() if force or target.due <= now), key=len):
+                target = self.__targets.get(key)
+                if target is None:
+                    continue
+                try:
+                    changes = self.__pollTarget(key)
+                except Exception as e:
+                    target.due = time.monotonic() + target.interval
+                    events.append(PollFailed(key, e))
+                    continue
+                target.schedule(time.monotonic(), bool(changes), self.__minInterval, self.__maxInterval, self.__backoff)
+                events.extend(changes)
+            subscribers = list(self.__subscribers)
+
+        for event in events:
+            for callback, kinds in subscribers:
+                if isinstance(event, kinds):
+                    callback(event)
+        return events
+
+    def __addTarget(self, key: tuple, due: float) -> None:
+        self.__targets[key] = PollTarget(key, self.__minInterval, due)
+
+    def __pollTarget(self, key: tuple) -> list:
+        if key[0] == "accounts":
+            return self.__pollAccounts()
+        if key[0] == "virtualCards":
+            return self.__pollVirtualCards()
+        return self.__pollOperations(key[1])
+
+    def __pollAccounts(self) -> list:
+        balances = {}
+        for tile in extractItems(self.__api.getAccouts(strict=True), ("tiles",)):
+            account = toDict(tile)
+            account = account.get("account", account)
+            balances[str(account.get("id"))] = parseAmount(account.get("solde"))
+
+        events = []
+        if self.__balances is not None:
+            for accountId, balance in balances.items():
+                previous = self.__balances.get(accountId, balance)
+                if balance != previous:
+                    events.append(AccountBalanceChanged(accountId, previous, balance))
+        self.__balances = balances
+        return events
+
+    def __pollVirtualCards(self) -> list:
+        cards = {}
+        for card in extractItems(self.__api.getVirtualCards(strict=True)):
+            card = toDict(card)
+            cards[str(card.get("num"))] = card
+
+        today = datetime.date.today()
+        baseline = self.__cards is None
+        previousCards = self.__cards or {}
+        events = []
+        now = time.monotonic()
+        for num, card in cards.items():
+            expiry = parseExpiry(card.get("dateEch"))
+            expired = expiry is not None and expiry < today
+            previous = previousCards.get(num)
+            if previous is None:
+                if not baseline:
+                    events.append(CardCreated(card))
+                    self.__createdCards.add(num)
+                if not expired:
+                    self.__addTarget(("operations", num), now)
+            else:
+                amount, previousAmount = parseAmount(card.get("mntRestant")), parseAmount(previous.get("mntRestant"))
+                if amount != previousAmount:
+                    events.append(CardBalanceChanged(num, previousAmount, amount))
+                    # The new operations are fetched at once
+                    target = self.__targets.get(("operations", num))
+                    if target is not None:
+                        target.interval = self.__minInterval
+                        target.due = now
+            if expired and ("operations", num) in self.__targets:
+                # Its last operations are fetched at the end of this poll, then it is no longer polled
+                if not baseline:
+                    events.append(CardExpired(card))
+                    self.__pollOperationsOnce(num, events)
+                self.__forgetCard(num)
+
+        for num, card in previousCards.items():
+            if num not in cards:
+                if ("operations", num) in self.__targets:
+                    events.append(CardExpired(card))
+                self.__forgetCard(num)
+
+        self.__cards = cards
+        return events
+
+    def __pollOperationsOnce(self, num: str, events: list) -> None:
+        try:
+            events.extend(self.__pollOperations(num))
+        except Exception as e:
+            events.append(PollFailed(("operations", num), e))
+
+    def __forgetCard(self, num: str) -> None:
+        self.__targets.pop(("operations", num), None)
+        self.__operations.pop(num, None)
+        self.__createdCards.discard(num)
+
+    def __pollOperations(self, num: str) -> list:
+        operations = [toDict(operation) for operation in extractItems(self.__api.getVirtualCardOperations(num, strict=True))]
+        ids = [operationId for operationId, _ in itemIds(operations, num)]
+
+        events = []
+        seen = self.__operations.get(num)
+        if seen is not None or num in self.__createdCards:
+            seen = seen or set()
+            # The API sends the most recent operations first : the events are sent in chronological order
+            for operationId, operation in reversed(list(zip(ids, operations))):
+                if operationId not in seen:
+                    events.append(OperationAdded(num, operation))
+        self.__operations[num] = set(ids)
+        return events
+
+    def run(self) -> None:
+        """
+        Poll until stop is called (each target when it is due)
+        """
+        while not self.__stopEvent.is_set():
+            self.poll()
+            delay = self.nextPoll()
+            self.__stopEvent.wait(delay if delay is not None else self.__maxInterval)
+
+    def start(self) -> None:
+        """
+        Poll in a background thread
+        """
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stopEvent.clear()
+        self.__thread = threading.Thread(target=self.run, name="AumaxWatcher", daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        self.__stopEvent.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def __enter__(self) -> "Watcher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()